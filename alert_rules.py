@@ -0,0 +1,272 @@
+"""
+Declarative alert rules.
+
+Rules live in a JSON config file (see alert_rules.json) and are compiled
+once at startup into plain predicate closures. A compiled rule set is then
+evaluated over the whole candidate list in a single pass:
+
+    rules = load_rules("alerts")
+    for candidate, window, fired in evaluate(rules, candidates, today):
+        ...
+
+A candidate is a dict with at least 'end_date' (a date) and 'gmps'
+(GMP samples, most recent first). Everything else is passed through.
+Windows count trading days (see trading_calendar), not calendar days.
+
+Delivery profiles ("profiles" in the config) let one run serve several
+audiences, each with its own rules, channels, windows and filters:
+
+    {"name": "sme", "rules": [...], "channels": ["telegram:@IPO_SME"], "filters": ["sme"]}
+
+load_profiles() compiles every profile into one RuleSet whose rules carry
+the profile's channels and filters, so all profiles share one candidate
+load and one evaluation pass with metric values computed once per IPO.
+"""
+import os
+import json
+import operator
+import ranking
+import trading_calendar
+
+RULES_FILE = os.getenv("ALERT_RULES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "alert_rules.json"))
+
+OPERATORS = {
+    ">=": operator.ge,
+    ">": operator.gt,
+    "<=": operator.le,
+    "<": operator.lt,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+# Window name -> trading days until end_date. None matches every candidate.
+WINDOWS = {
+    "closing_today": 0,
+    "closing_tomorrow": 1,
+    "any": None,
+}
+
+
+def _mean(values):
+    return sum(values) / len(values)
+
+
+# Profile filter name -> predicate over a candidate
+FILTERS = {
+    "sme": lambda candidate: ranking.is_sme_name(candidate.get("name") or ""),
+    "main": lambda candidate: not ranking.is_sme_name(candidate.get("name") or ""),
+}
+
+
+# Metric name -> aggregate over the most recent N samples
+METRICS = {
+    "latest_gmp": lambda gmps: gmps[0],
+    "avg_gmp": _mean,
+    "min_gmp": min,
+    "max_gmp": max,
+}
+
+
+class Condition:
+    """A single compiled `metric(last N samples) <op> value` check"""
+    __slots__ = ("metric", "samples", "min_samples", "op", "value", "key", "_aggregate", "_compare")
+
+    def __init__(self, metric, op, value, samples=1, min_samples=1):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}' (expected one of {sorted(METRICS)})")
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator '{op}' (expected one of {sorted(OPERATORS)})")
+        self.metric = metric
+        self.samples = int(samples)
+        self.min_samples = int(min_samples)
+        self.op = op
+        self.value = float(value)
+        # min_samples is part of the key: the shared cache holds None for a window that is too short
+        self.key = (metric, self.samples, self.min_samples)
+        self._aggregate = METRICS[metric]
+        self._compare = OPERATORS[op]
+
+    def measure(self, gmps):
+        """Return the metric value, or None if there are too few samples"""
+        window = gmps[:self.samples]
+        if len(window) < self.min_samples:
+            return None
+        return self._aggregate(window)
+
+    def check(self, measured):
+        return measured is not None and self._compare(measured, self.value)
+
+
+class Rule:
+    """A named rule: a window plus one or more conditions that must all pass"""
+    __slots__ = ("name", "window", "days_to_close", "conditions", "channels", "filters", "profile")
+
+    def __init__(self, name, window, conditions, channels, filters=(), profile=None):
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown window '{window}' in rule '{name}'")
+        self.name = name
+        self.window = window
+        self.days_to_close = WINDOWS[window]
+        self.conditions = conditions
+        self.channels = tuple(channels)
+        self.filters = tuple(filters)
+        self.profile = profile
+
+    def accepts(self, candidate):
+        """Check the profile filters (name, listing type) before any metric"""
+        return all(check(candidate) for check in self.filters)
+
+    def matches(self, gmps, cache=None):
+        """Check all conditions; `cache` shares metric values between rules"""
+        if cache is None:
+            cache = {}
+        for condition in self.conditions:
+            if condition.key not in cache:
+                cache[condition.key] = condition.measure(gmps)
+            if not condition.check(cache[condition.key]):
+                return False
+        return True
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, window={self.window!r})"
+
+
+class RuleSet:
+    """Compiled rules bucketed by window so each candidate only sees its own"""
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self.by_days = {}
+        self.any_window = []
+        for rule in self.rules:
+            if rule.days_to_close is None:
+                self.any_window.append(rule)
+            else:
+                self.by_days.setdefault(rule.days_to_close, []).append(rule)
+        self.max_samples = max((c.samples for r in self.rules for c in r.conditions), default=1)
+
+    def windows(self):
+        """Return the distinct days-to-close offsets the rules care about"""
+        return sorted(self.by_days)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+
+def compile_rule(spec, channels=None, filters=(), profile=None):
+    """Compile one rule spec from the config file; a profile may override channels and add filters"""
+    name = spec["name"]
+    if "conditions" in spec:
+        condition_specs = spec["conditions"]
+    else:
+        condition_specs = [spec]
+
+    conditions = []
+    for c in condition_specs:
+        samples = c.get("samples", 1)
+        conditions.append(Condition(
+            metric=c.get("metric", "latest_gmp"),
+            op=c.get("op", ">="),
+            value=c["value"],
+            samples=samples,
+            min_samples=c.get("min_samples", samples),
+        ))
+
+    if profile:
+        name = f"{profile}/{name}"
+    return Rule(name, spec.get("window", "any"), conditions, channels or spec.get("channels", ["telegram"]),
+                filters, profile)
+
+
+def compile_rules(specs):
+    """Compile a list of rule specs into a RuleSet"""
+    return RuleSet(compile_rule(spec) for spec in specs)
+
+
+def load_config(path=None):
+    """Load the raw rules config file"""
+    with open(path or RULES_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_rules(section, path=None):
+    """Load and compile one named rule set from the config file"""
+    config = load_config(path)
+    if section not in config:
+        raise KeyError(f"Rule set '{section}' not found in {path or RULES_FILE}")
+    return compile_rules(config[section])
+
+
+def compile_profile(spec, config):
+    """Compile one delivery profile into its rules"""
+    name = spec["name"]
+    rule_specs = spec.get("rules", "alerts")
+    if isinstance(rule_specs, str):
+        if rule_specs not in config:
+            raise KeyError(f"Rule set '{rule_specs}' for profile '{name}' not found")
+        rule_specs = config[rule_specs]
+    unknown = [f for f in spec.get("filters", []) if f not in FILTERS]
+    if unknown:
+        raise ValueError(f"Unknown filter(s) {unknown} in profile '{name}' (expected {sorted(FILTERS)})")
+
+    filters = [FILTERS[f] for f in spec.get("filters", [])]
+    windows = spec.get("windows")
+    return [
+        compile_rule(rule_spec, spec.get("channels"), filters, name)
+        for rule_spec in rule_specs
+        if windows is None or rule_spec.get("window", "any") in windows
+    ]
+
+
+def load_profiles(names=None, path=None):
+    """
+    Compile the delivery profiles (all enabled ones, or just `names`) into a
+    single RuleSet. Without a "profiles" section this is the "alerts" rule set.
+    """
+    config = load_config(path)
+    if "profiles" not in config:
+        return compile_rules(config["alerts"])
+
+    profiles = {spec["name"]: spec for spec in config["profiles"]}
+    unknown = set(names or ()) - set(profiles)
+    if unknown:
+        raise KeyError(f"Unknown alert profile(s) {sorted(unknown)} in {path or RULES_FILE}")
+    selected = [profiles[n] for n in names] if names else [p for p in profiles.values() if p.get("enabled", True)]
+    return RuleSet(rule for spec in selected for rule in compile_profile(spec, config))
+
+
+def window_name(days_to_close):
+    """Map a days-to-close offset back to its window name"""
+    for name, days in WINDOWS.items():
+        if days == days_to_close:
+            return name
+    return None
+
+
+def evaluate(rules, candidates, today, calendar=None):
+    """
+    Evaluate a RuleSet over all candidates in one pass.
+
+    Yields (candidate, window, fired_rules) for every candidate that falls in
+    at least one rule window. Metric values are computed once per candidate
+    and shared between rules.
+    """
+    calendar = calendar or trading_calendar.get_calendar()
+    for candidate in candidates:
+        end_date = candidate.get("end_date")
+        if not end_date:
+            continue
+        days = calendar.trading_days_between(today, end_date)
+        bucket = rules.by_days.get(days)
+        if not bucket and not rules.any_window:
+            continue
+
+        gmps = candidate.get("gmps") or []
+        cache = {}
+        fired = [rule for rule in (bucket or []) if rule.accepts(candidate) and rule.matches(gmps, cache)]
+        fired.extend(rule for rule in rules.any_window if rule.accepts(candidate) and rule.matches(gmps, cache))
+        candidate["metrics"] = cache
+        yield candidate, window_name(days), fired
@@ -1,8 +1,18 @@
 import os
+import zlib
+import socket
+import asyncio
 import logging
-import requests
-from datetime import datetime, timedelta
-from supabase import create_client, Client
+import argparse
+from datetime import datetime
+import profiling
+import notifiers
+import alert_rules
+import trading_calendar
+import alert_templates
+import subscriptions
+from db import IpoRepository
+from stages import stage, log_summary
 
 # Setup logging
 logging.basicConfig(
@@ -12,243 +22,338 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Config
-SUPABASE_URL = os.getenv("SUPABASE_URL", "https://ofcngucvrrmzvihjgjvz.supabase.co")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-TG_BOT_TOKEN = os.getenv("TG_BOT_TOKEN")
-TG_CHANNEL_ID = os.getenv("TG_CHANNEL_ID")  # e.g., "@IPO_GMB_Tracker"
-N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL", "https://n8n-n1cx.onrender.com/webhook/e19013f2-871d-497f-9446-733282cfbb7c")
-
-def get_supabase() -> Client:
-    """Get Supabase client"""
-    if not SUPABASE_KEY:
-        raise ValueError("SUPABASE_KEY environment variable not set!")
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
-
-
-def send_telegram_message(message):
-    """Send message to Telegram channel"""
-    if not TG_BOT_TOKEN or not TG_CHANNEL_ID:
-        logger.error("TG_BOT_TOKEN or TG_CHANNEL_ID not set!")
-        return False
-    
-    url = f"https://api.telegram.org/bot{TG_BOT_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": TG_CHANNEL_ID,
-        "text": message,
-        "parse_mode": "Markdown"
-    }
-    
-    try:
-        response = requests.post(url, data=payload, timeout=10)
-        if response.status_code == 200:
-            logger.info("Message sent to Telegram channel successfully")
-            return True
-        else:
-            logger.error(f"Telegram API error: {response.text}")
-            return False
-    except Exception as e:
-        logger.error(f"Failed to send Telegram message: {e}")
-        return False
-
-
-def send_n8n_webhook(ipo_data, alert_type):
-    """Send IPO alert data to N8N webhook for WhatsApp - to multiple numbers"""
-    if not N8N_WEBHOOK_URL:
-        logger.warning("N8N_WEBHOOK_URL not set, skipping webhook")
-        return False
-    
-    # Phone numbers to send alerts to
-    phone_numbers = [
-        "919884872483",
-        "917604925112",
-        "919884972483"  # Add more numbers here
-        # "917604925112",
-        # "919884972483",
-    ]
-    
-    success_count = 0
-    for phone in phone_numbers:
-        payload = {
-            "alert_type": alert_type,  # "closing_tomorrow" or "closing_today"
-            "phone": phone,  # Phone number for this message
-            "ipo_name": ipo_data.get("name"),
-            "price": ipo_data.get("price"),
-            "subscription": ipo_data.get("subscription"),
-            "start_date": ipo_data.get("start_date"),
-            "end_date": ipo_data.get("end_date"),
-            "avg_gmp": ipo_data.get("avg_gmp"),
-            "gmp_history": ipo_data.get("gmp_history"),
-            "recommendation": "PROCEED"
-        }
-        
-        try:
-            response = requests.post(N8N_WEBHOOK_URL, json=payload, timeout=15)
-            if response.status_code == 200:
-                logger.info(f"Webhook sent to N8N for phone {phone}")
-                success_count += 1
-            else:
-                logger.error(f"N8N webhook error for {phone}: {response.status_code}")
-        except Exception as e:
-            logger.error(f"Failed to send webhook for {phone}: {e}")
-    
-    logger.info(f"Sent {success_count}/{len(phone_numbers)} webhooks successfully")
-    return success_count > 0
-
-
-def get_working_days_before(end_date, num_days=2):
-    """Get the last N working days before end_date (excluding weekends)"""
-    working_days = []
-    current = end_date - timedelta(days=1)
-    
-    while len(working_days) < num_days:
-        # 0=Monday, 5=Saturday, 6=Sunday
-        if current.weekday() < 5:  # Monday to Friday
-            working_days.append(current)
-        current -= timedelta(days=1)
-    
-    return working_days
-
-
-def check_and_send_alerts():
+ALERT_WORKERS = int(os.getenv("ALERT_WORKERS", "4"))
+CLAIM_TIMEOUT = int(os.getenv("ALERT_CLAIM_TIMEOUT", "900"))  # seconds before a stuck claim can be taken over
+DIGEST_MODE = os.getenv("ALERT_DIGEST", "").lower() in ("1", "true", "yes")
+# Comma-separated delivery profiles to run (alert_rules.json "profiles"); empty = every enabled one
+ALERT_PROFILES = [p.strip() for p in os.getenv("ALERT_PROFILES", "").split(",") if p.strip()]
+HISTORY_SESSIONS = 21  # trading days of GMP history read per run; an IPO is tracked for well under a month
+
+
+# Window -> (statuses eligible for an alert, status after alerting)
+WINDOW_STATUS = {
+    'closing_tomorrow': (('tracking',), 'alerted_tomorrow'),
+    'closing_today': (('tracking', 'alerted_tomorrow'), 'alerted_today'),
+}
+
+
+async def load_candidates(repo, rules, today):
+    """Load every IPO in a rule window plus its recent GMP history in two queries"""
+    calendar = trading_calendar.get_calendar()
+    end_dates = [day for offset in rules.windows() for day in calendar.window_dates(today, offset)]
+    statuses = sorted({s for eligible, _ in WINDOW_STATUS.values() for s in eligible} | {'alerting'})
+
+    ipos = await repo.window_candidates(end_dates, statuses)
+    if not ipos:
+        return []
+
+    # Bounded by date so only the latest gmp_history partitions are scanned
+    since = calendar.previous_trading_day(today, HISTORY_SESSIONS)
+    history = await repo.recent_gmp_history([ipo['id'] for ipo in ipos], since=since)
+
+    # Group history per IPO, keeping only the most recent samples the rules need
+    by_ipo = {}
+    for record in history:
+        records = by_ipo.setdefault(record['ipo_id'], [])
+        if len(records) < rules.max_samples:
+            records.append(record)
+
+    for ipo in ipos:
+        ipo['history'] = by_ipo.get(ipo['id'], [])
+        ipo['gmps'] = [record['gmp'] for record in ipo['history']]
+        ipo['end_date'] = datetime.strptime(ipo['end_date'], '%Y-%m-%d').date()
+    return ipos
+
+
+async def load_subscribers(repo):
+    """Build the subscriber index from all active subscriptions"""
+    index = subscriptions.SubscriberIndex(await repo.active_subscriptions())
+    logger.info(f"Loaded {len(index)} active subscriptions")
+    return index
+
+
+def in_shard(ipo_id, shard):
+    """Stable split of IPOs across `count` worker processes"""
+    index, count = shard
+    return zlib.crc32(str(ipo_id).encode()) % count == index
+
+
+async def claim(repo, evaluated, worker):
     """
-    Check IPOs and send alerts:
+    Claim the evaluated IPOs window by window; only rows this worker won are
+    returned, so concurrent runs never alert the same IPO twice.
+    """
+    by_window = {}
+    for item in evaluated:
+        by_window.setdefault(item[1], []).append(item)
+
+    claims = await asyncio.gather(*(
+        repo.claim_ipos([ipo['id'] for ipo, _, _ in items], WINDOW_STATUS[window][0], worker, CLAIM_TIMEOUT)
+        for window, items in by_window.items()
+    ))
+    won = {row['id']: row for rows in claims for row in rows}
+
+    claimed = []
+    for ipo, window, fired in evaluated:
+        row = won.get(ipo['id'])
+        if row:
+            ipo['claimed_from'] = row['claimed_from']
+            claimed.append((ipo, window, fired))
+    logger.info(f"Claimed {len(claimed)}/{len(evaluated)} IPOs as {worker}")
+    return claimed
+
+
+async def check_and_send_alerts(repo, today=None, digest=DIGEST_MODE, shard=(0, 1), workers=ALERT_WORKERS,
+                                profiles=ALERT_PROFILES, client=None):
+    """
+    Check IPOs against the configured alert rules and send alerts:
     - Day before closing: Send 'Closing Tomorrow' alert, mark status='alerted_tomorrow'
     - On closing day: Send 'Closing Today' alert, mark status='alerted_today'
+    With `digest`, all alerts of the run go out as one consolidated message per channel.
+    Every delivery profile is evaluated in the same pass over one candidate
+    load; an IPO goes to the channels of each profile whose rules fired.
+    IPOs are claimed first and up to `workers` are sent at once; `shard` (index, count)
+    splits the candidates between processes. Every send goes through one HTTP
+    `client`, opened here for the run if not given.
+    """
+    if client is None:
+        async with notifiers.open_client() as client:
+            return await check_and_send_alerts(repo, today, digest, shard, workers, profiles, client)
+
+    rules = alert_rules.load_profiles(profiles)
+    today = today or datetime.today().date()
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+
+    profile_names = sorted({rule.profile for rule in rules if rule.profile})
+    logger.info(f"Checking {len(rules)} alert rules{f' across profiles {profile_names}' if profile_names else ''} "
+                f"for IPOs closing in {rules.windows()} days")
+
+    # Candidates and subscribers are independent - load them together
+    with stage("alerts.load"):
+        candidates, subscribers = await asyncio.gather(load_candidates(repo, rules, today), load_subscribers(repo))
+    logger.info(f"Found {len(candidates)} IPOs in alert windows")
+
+    # Rows left 'alerting' by a crashed worker are offered to the claim again
+    evaluated = [
+        (ipo, window, fired)
+        for ipo, window, fired in alert_rules.evaluate(rules, candidates, today)
+        if in_shard(ipo['id'], shard) and (ipo['status'] in WINDOW_STATUS[window][0] or ipo['status'] == 'alerting')
+    ]
+    with stage("alerts.claim"):
+        claimed = await claim(repo, evaluated, worker)
+
+    # Status writes run in the background and only touch rows this worker still owns
+    writes = []
+    dead_chats = []
+    due = []
+    sends = asyncio.Semaphore(workers)
+    # Parallel senders share the subscriber fan-out budget
+    rate = subscriptions.FANOUT_RATE / workers
+
+    async def alert(ipo, window, fired, avg_gmp, new_status):
+        async with sends:
+            dead = await send_alert(ipo, window, fired, avg_gmp, client, subscribers, rate)
+        dead_chats.extend(dead)
+        writes.append(asyncio.create_task(repo.apply_statuses({ipo['id']: new_status}, worker)))
+
+    with stage("alerts.send"):
+        tasks = []
+        for ipo, window, fired in claimed:
+            avg_gmp, new_status = assess(ipo, window, fired)
+            if avg_gmp is None:
+                # Nothing to send: record the outcome or hand the IPO back unchanged
+                release = {ipo['id']: new_status or ipo['claimed_from']}
+                writes.append(asyncio.create_task(repo.apply_statuses(release, worker)))
+            elif digest:
+                due.append((ipo, window, fired, avg_gmp))
+            else:
+                tasks.append(alert(ipo, window, fired, avg_gmp, new_status))
+        await asyncio.gather(*tasks)
+
+        if due:
+            statuses, dead = await send_digest(due, subscribers, today, client)
+            dead_chats.extend(dead)
+            # Delivered IPOs advance, the rest are released, all in one transaction
+            for ipo, _, _, _ in due:
+                statuses.setdefault(ipo['id'], ipo['claimed_from'])
+            writes.append(asyncio.create_task(repo.apply_statuses(statuses, worker)))
+
+    with stage("alerts.update"):
+        writes.append(asyncio.create_task(repo.deactivate_chats(dead_chats)))
+        await asyncio.gather(*writes)
+
+
+def assess(ipo, window, fired):
+    """
+    Decide what happens to a single IPO.
+    Returns (average GMP if an alert is due else None, new status or None).
     """
-    supabase = get_supabase()
-    today = datetime.today().date()
-    tomorrow = today + timedelta(days=1)
-    
-    logger.info(f"Checking for IPOs closing on {today} or {tomorrow}")
-    
-    # === PART 1: Send "Closing Tomorrow" alerts ===
-    # Get IPOs closing tomorrow that haven't been alerted yet
-    result_tomorrow = supabase.table('ipos').select('*').eq('end_date', str(tomorrow)).eq('status', 'tracking').execute()
-    
-    if result_tomorrow.data:
-        logger.info(f"Found {len(result_tomorrow.data)} IPOs closing tomorrow")
-        for ipo in result_tomorrow.data:
-            process_and_alert(supabase, ipo, today, is_closing_today=False)
-    
-    # === PART 2: Send "Closing Today" alerts ===
-    # Get IPOs closing today that were alerted yesterday (status='alerted_tomorrow')
-    result_today = supabase.table('ipos').select('*').eq('end_date', str(today)).eq('status', 'alerted_tomorrow').execute()
-    
-    if result_today.data:
-        logger.info(f"Found {len(result_today.data)} IPOs closing today")
-        for ipo in result_today.data:
-            process_and_alert(supabase, ipo, today, is_closing_today=True)
-    
-    # Also check tracking IPOs closing today (in case they weren't caught yesterday)
-    result_today_new = supabase.table('ipos').select('*').eq('end_date', str(today)).eq('status', 'tracking').execute()
-    
-    if result_today_new.data:
-        logger.info(f"Found {len(result_today_new.data)} new IPOs closing today")
-        for ipo in result_today_new.data:
-            process_and_alert(supabase, ipo, today, is_closing_today=True)
-
-
-def process_and_alert(supabase, ipo, today, is_closing_today):
-    """Process a single IPO and send alert if avg GMP >= 0%"""
-    ipo_id = ipo['id']
     ipo_name = ipo['name']
-    end_date = datetime.strptime(ipo['end_date'], '%Y-%m-%d').date()
-    
-    logger.info(f"Processing IPO: {ipo_name} (ends {end_date})")
-    
-    # Get last 4 GMP records (2 days x 2 collections per day)
-    # Order by recorded_at descending to get most recent first
-    gmp_result = supabase.table('gmp_history').select('gmp, recorded_at').eq('ipo_id', ipo_id).order('recorded_at', desc=True).limit(4).execute()
-    
-    if not gmp_result.data:
+    is_closing_today = window == 'closing_today'
+
+    logger.info(f"Processing IPO: {ipo_name} (ends {ipo['end_date']})")
+
+    if not ipo['gmps']:
         logger.warning(f"No GMP history found for {ipo_name}")
-        if is_closing_today:
-            supabase.table('ipos').update({'status': 'expired'}).eq('id', ipo_id).execute()
-        return
-    
-    # Require minimum 2 GMP records to calculate average
-    if len(gmp_result.data) < 2:
-        logger.warning(f"Insufficient GMP data for {ipo_name} (need 2, have {len(gmp_result.data)})")
-        return
-    
-    # Calculate average GMP from available records
-    gmps = [record['gmp'] for record in gmp_result.data]
-    avg_gmp = sum(gmps) / len(gmps)
-    
-    logger.info(f"IPO: {ipo_name}, GMP values: {gmps}, Average: {avg_gmp:.2f}% (from {len(gmps)} records)")
-    
-    # Check threshold
-    if avg_gmp >= 0:
-        gmp_history_text = "\n".join([f"  • {r['recorded_at']}: {r['gmp']}%" for r in gmp_result.data])
-        
-        if is_closing_today:
-            # Closing Today alert
-            message = (
-                f"🔴 *IPO ALERT - CLOSING TODAY*\n\n"
-                f"📌 *{ipo_name}*\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"💰 Price: {ipo['price']}\n"
-                f"📊 Subscription: {ipo['subscription']}\n"
-                f"📅 Start: {ipo['start_date']}\n"
-                f"📅 End: {ipo['end_date']}\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"📈 *GMP History (Last 3 days):*\n{gmp_history_text}\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"⭐ *Average GMP: {avg_gmp:.2f}%*\n\n"
-                f"🚨 *LAST CHANCE - Closing Today!*\n\n"
-                f"✅ *Recommendation: PROCEED*"
-            )
-            new_status = 'alerted_today'
-        else:
-            # Closing Tomorrow alert
-            message = (
-                f"🟡 *IPO ALERT - CLOSING TOMORROW*\n\n"
-                f"📌 *{ipo_name}*\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"💰 Price: {ipo['price']}\n"
-                f"📊 Subscription: {ipo['subscription']}\n"
-                f"📅 Start: {ipo['start_date']}\n"
-                f"📅 End: {ipo['end_date']}\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"📈 *GMP History (Last 3 days):*\n{gmp_history_text}\n"
-                f"━━━━━━━━━━━━━━━━\n"
-                f"⭐ *Average GMP: {avg_gmp:.2f}%*\n\n"
-                f"⏰ *Closing Tomorrow - Apply Today!*\n\n"
-                f"✅ *Recommendation: PROCEED*"
-            )
-            new_status = 'alerted_tomorrow'
-        
-        # Send to Telegram
-        if send_telegram_message(message):
-            logger.info(f"Telegram alert sent for {ipo_name}")
-        
-        # Send to N8N webhook (for WhatsApp) - DISABLED FOR NOW
-        # ipo_data = {
-        #     "name": ipo_name,
-        #     "price": ipo['price'],
-        #     "subscription": ipo['subscription'],
-        #     "start_date": ipo['start_date'],
-        #     "end_date": ipo['end_date'],
-        #     "avg_gmp": round(avg_gmp, 2),
-        #     "gmp_history": [{"date": r['recorded_at'], "gmp": r['gmp']} for r in gmp_result.data]
-        # }
-        # alert_type = "closing_today" if is_closing_today else "closing_tomorrow"
-        # send_n8n_webhook(ipo_data, alert_type)
-        
-        # Update status
-        supabase.table('ipos').update({'status': new_status}).eq('id', ipo_id).execute()
-        logger.info(f"Alert sent for {ipo_name} (status: {new_status})")
-        
-    else:
-        logger.info(f"Skipping {ipo_name} - average GMP {avg_gmp:.2f}% is below threshold")
-        if is_closing_today:
-            supabase.table('ipos').update({'status': 'expired'}).eq('id', ipo_id).execute()
+        return None, ('expired' if is_closing_today else None)
+
+    # A metric without enough samples is left for the next run
+    if not fired and None in ipo['metrics'].values():
+        logger.warning(f"Insufficient GMP data for {ipo_name} (have {len(ipo['gmps'])})")
+        return None, None
+
+    avg_gmp = sum(ipo['gmps']) / len(ipo['gmps'])
+    logger.info(f"IPO: {ipo_name}, GMP values: {ipo['gmps']}, Average: {avg_gmp:.2f}% (from {len(ipo['gmps'])} records)")
+
+    if not fired:
+        logger.info(f"Skipping {ipo_name} - no alert rule matched (average GMP {avg_gmp:.2f}%)")
+        return None, ('expired' if is_closing_today else None)
+
+    _, new_status = WINDOW_STATUS[window]
+    return avg_gmp, new_status
+
+
+def rule_channels(fired):
+    """Channels named by the fired rules, each once, in rule order"""
+    channels = []
+    for rule in fired:
+        channels.extend(c for c in rule.channels if c not in channels)
+    return channels
+
+
+def webhook_data(ipo, avg_gmp):
+    return {
+        "name": ipo['name'],
+        "price": ipo['price'],
+        "subscription": ipo['subscription'],
+        "start_date": ipo['start_date'],
+        "end_date": str(ipo['end_date']),
+        "avg_gmp": round(avg_gmp, 2),
+        "gmp_history": [{"date": r['recorded_at'], "gmp": r['gmp']} for r in ipo['history']]
+    }
+
+
+async def send_to_channels(channels, message, ipo, window, avg_gmp, client):
+    """Send one IPO alert to all given channels at once; returns the DeliveryReport"""
+    alert = notifiers.Alert(message, webhook_data(ipo, avg_gmp), window)
+    report = await notifiers.dispatch(channels, alert, ipo['name'], client)
+    if report.deliveries:
+        logger.info(f"Channels for {ipo['name']}: {report.summary()}")
+    return report
+
+
+async def send_alert(ipo, window, fired, avg_gmp, client, subscribers=None, rate=subscriptions.FANOUT_RATE):
+    """Send one IPO's alert to its channels and subscribers; returns dead chat ids"""
+    message = alert_templates.render_alert(ipo, window, avg_gmp, ipo['history'])
+    channels = asyncio.create_task(send_to_channels(rule_channels(fired), message, ipo, window, avg_gmp, client))
+
+    # Personal alerts for users whose own threshold is met, alongside the channels
+    dead = []
+    if subscribers is not None:
+        chat_ids = subscribers.matching(window, avg_gmp)
+        if chat_ids:
+            logger.info(f"Fanning out {ipo['name']} to {len(chat_ids)} subscribers")
+            _, dead = await asyncio.to_thread(subscriptions.fan_out, chat_ids, message, rate)
+
+    await channels
+    logger.info(f"Alert sent for {ipo['name']} (rules: {[r.name for r in fired]})")
+    return dead
+
+
+async def send_digest(due, subscribers, today, client):
+    """
+    Send all due alerts as one digest per Telegram channel (split at the
+    message limit) and one personal digest per subscriber group. An IPO
+    counts as delivered once any of its channels got it.
+    Returns ({ipo_id: new_status} for delivered IPOs, dead chat ids).
+    """
+    delivered = set()
+    entries = []
+    by_chat = {}
+    structured = []
+    for ipo, window, fired, avg_gmp in due:
+        entries.append((window, ipo, avg_gmp))
+        channels = rule_channels(fired)
+        for channel in filter(notifiers.is_text_channel, channels):
+            by_chat.setdefault(channel, []).append((window, ipo, avg_gmp))
+        # Structured channels (e.g. n8n) still get one payload per IPO
+        others = [c for c in channels if not notifiers.is_text_channel(c)]
+        if others:
+            structured.append((ipo, send_to_channels(others, None, ipo, window, avg_gmp, client)))
+
+    digests = []
+    for channel, chat_entries in by_chat.items():
+        parts = alert_templates.render_digest(chat_entries, today)
+        digests.extend((channel, i, len(parts), ids, message) for i, (message, ids) in enumerate(parts, 1))
+    reports = await asyncio.gather(
+        *(send for _, send in structured),
+        *(notifiers.dispatch([channel], notifiers.Alert(message), f"{channel} digest part {i}/{count}", client)
+          for channel, i, count, _, message in digests),
+    )
+
+    for (ipo, _), report in zip(structured, reports):
+        if report.ok:
+            delivered.add(ipo['id'])
+    for (channel, i, count, ids, _), report in zip(digests, reports[len(structured):]):
+        if report.ok:
+            delivered.update(ids)
+            logger.info(f"{channel} digest part {i}/{count} sent ({len(ids)} IPOs)")
+
+    # Subscribers with the same matching IPOs share one rendered digest
+    dead = []
+    if subscribers is not None:
+        per_chat = {}
+        for n, (window, ipo, avg_gmp) in enumerate(entries):
+            for chat_id in subscribers.matching(window, avg_gmp):
+                per_chat.setdefault(chat_id, []).append(n)
+        groups = {}
+        for chat_id, indexes in per_chat.items():
+            groups.setdefault(tuple(indexes), []).append(chat_id)
+        for indexes, chat_ids in groups.items():
+            for message, _ in alert_templates.render_digest([entries[n] for n in indexes], today):
+                _, group_dead = await asyncio.to_thread(subscriptions.fan_out, chat_ids, message)
+                dead.extend(group_dead)
+
+    windows = {ipo['id']: window for ipo, window, _, _ in due}
+    statuses = {ipo_id: WINDOW_STATUS[windows[ipo_id]][1] for ipo_id in delivered}
+    logger.info(f"Digest delivered {len(delivered)}/{len(due)} alerts")
+    return statuses, dead
+
+
+def parse_shard(text):
+    """'i/N' -> (i, N)"""
+    index, _, count = text.partition("/")
+    index, count = int(index), int(count or 1)
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard must be i/N with 0 <= i < N, got {text}")
+    return index, count
+
+
+async def run(digest=DIGEST_MODE, shard=(0, 1), workers=ALERT_WORKERS, profiles=ALERT_PROFILES):
+    async with IpoRepository() as repo:
+        await check_and_send_alerts(repo, digest=digest, shard=shard, workers=workers, profiles=profiles)
+        logger.info(f"Alert pass used {repo.request_count} database requests")
 
 
 def main():
     """Main function to check and send alerts"""
+    parser = argparse.ArgumentParser(description="Check IPOs and send alerts")
+    parser.add_argument("--digest", action="store_true", default=DIGEST_MODE,
+                        help="send one consolidated message per run instead of one per IPO")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1),
+                        help="process only shard i of N (e.g. 0/2) when running several processes")
+    parser.add_argument("--workers", type=int, default=ALERT_WORKERS, help="parallel senders in this process")
+    # Not --profiles: too close to --profile, which turns on profiling
+    parser.add_argument("--audiences", type=lambda text: [p.strip() for p in text.split(",") if p.strip()],
+                        default=ALERT_PROFILES, metavar="PROFILES",
+                        help="comma-separated delivery profiles (alert_rules.json \"profiles\") to run (default: all enabled)")
+    parser.add_argument("--profile", action="store_true", help="write CPU and memory profiles per stage (or PROFILE=1)")
+    args = parser.parse_args()
+    profiling.configure("alert_sender", args.profile)
+
     logger.info("=== Alert Checker Started ===")
-    check_and_send_alerts()
+    asyncio.run(run(args.digest, args.shard, args.workers, args.audiences))
+    log_summary()
     logger.info("=== Alert Checker Finished ===")
 
 
@@ -0,0 +1,142 @@
+"""
+Message templates for Telegram alerts.
+
+Templates are built once at import and filled with substitute(); the
+per-IPO alert, the live main.py alert and the digest all render from here
+instead of repeating f-strings in every script.
+"""
+from string import Template
+
+TELEGRAM_LIMIT = 4096  # max message length, in UTF-16 code units
+RULE = "━━━━━━━━━━━━━━━━"
+
+# Window -> (alert header, alert footer, digest section title)
+WINDOW_TEXT = {
+    "closing_tomorrow": ("🟡 *IPO ALERT - CLOSING TOMORROW*", "⏰ *Closing Tomorrow - Apply Today!*", "🟡 *CLOSING TOMORROW - Apply Today!*"),
+    "closing_today": ("🔴 *IPO ALERT - CLOSING TODAY*", "🚨 *LAST CHANCE - Closing Today!*", "🔴 *CLOSING TODAY - Last Chance!*"),
+}
+
+ALERT = Template(
+    "$header\n\n"
+    "📌 *$name*\n"
+    f"{RULE}\n"
+    "💰 Price: $price\n"
+    "📊 Subscription: $subscription\n"
+    "📅 Start: $start_date\n"
+    "📅 End: $end_date\n"
+    f"{RULE}\n"
+    "📈 *GMP History (Last $days days):*\n$history\n"
+    f"{RULE}\n"
+    "⭐ *Average GMP: $avg_gmp%*\n\n"
+    "$footer\n\n"
+    "✅ *Recommendation: PROCEED*"
+)
+
+GMP_LINE = Template("  • $date: $gmp%")
+
+LIVE_ALERT = Template(
+    "🚀 IPO PROCEED ALERT ($day_text)\n\n"
+    "Name: $name\n"
+    "GMP: $gmp%\n"
+    "Subscription: $subscription\n"
+    "Start Date: $start_date\n"
+    "End Date: $end_date\n\n"
+    "Status: PROCEED"
+)
+
+MOVE_ALERT = Template(
+    "$arrow *GMP MOVE - $name*\n"
+    f"{RULE}\n"
+    "GMP $verb from $baseline% to *$value%* ($change pts)\n"
+    "Previous sample: $last%"
+)
+
+DIGEST_HEADER = Template("📬 *IPO ALERT DIGEST - $date*$part\n")
+DIGEST_SECTION = Template("\n$title ($count)\n$rule\n")
+DIGEST_ENTRY = Template(
+    "📌 *$name* - ⭐ $avg_gmp%\n"
+    "   💰 $price | 📊 $subscription | 📅 $start_date → $end_date\n"
+)
+DIGEST_FOOTER = f"\n{RULE}\n✅ *Recommendation: PROCEED*"
+
+
+def telegram_length(text):
+    """Length as Telegram counts it (UTF-16 code units, so emoji count double)"""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def render_alert(ipo, window, avg_gmp, history, days=3):
+    """Render the per-IPO alert; `history` is a list of {'recorded_at', 'gmp'} rows"""
+    header, footer, _ = WINDOW_TEXT[window]
+    return ALERT.substitute(
+        header=header,
+        footer=footer,
+        name=ipo["name"],
+        price=ipo["price"],
+        subscription=ipo["subscription"],
+        start_date=ipo["start_date"],
+        end_date=ipo["end_date"],
+        days=days,
+        history="\n".join(GMP_LINE.substitute(date=r["recorded_at"], gmp=r["gmp"]) for r in history),
+        avg_gmp=f"{avg_gmp:.2f}",
+    )
+
+
+def render_move(move):
+    """Render a GmpMove from gmp_watch"""
+    return MOVE_ALERT.substitute(
+        arrow="📈" if move.change > 0 else "📉",
+        verb="jumped" if move.change > 0 else "dropped",
+        name=move.name,
+        baseline=f"{move.baseline:.2f}",
+        value=f"{move.value:.2f}",
+        change=f"{move.change:+.2f}",
+        last=f"{move.last:.2f}",
+    )
+
+
+def render_digest(entries, today, limit=TELEGRAM_LIMIT):
+    """
+    Render (window, ipo, avg_gmp) entries as one digest, split into as few
+    messages as fit under `limit`. Returns a list of (text, ipo_ids) so the
+    caller knows which IPOs each message covered.
+    """
+    by_window = {}
+    for window, ipo, avg_gmp in entries:
+        by_window.setdefault(window, []).append((ipo, avg_gmp))
+
+    # Greedily pack entries; a section header is repeated in the next message
+    budget = limit - telegram_length(DIGEST_HEADER.substitute(date=today, part=" (99/99)")) - telegram_length(DIGEST_FOOTER)
+    messages = []
+    body, ids, used = [], [], 0
+    for window in WINDOW_TEXT:
+        items = by_window.get(window)
+        if not items:
+            continue
+        section = DIGEST_SECTION.substitute(title=WINDOW_TEXT[window][2], count=len(items), rule=RULE)
+        section_open = False
+        for ipo, avg_gmp in items:
+            entry = DIGEST_ENTRY.substitute(
+                name=ipo["name"], avg_gmp=f"{avg_gmp:.2f}", price=ipo["price"],
+                subscription=ipo["subscription"], start_date=ipo["start_date"], end_date=ipo["end_date"],
+            )
+            needed = telegram_length(entry) + (0 if section_open else telegram_length(section))
+            if body and used + needed > budget:
+                messages.append((body, ids))
+                body, ids, used = [], [], 0
+                section_open = False
+                needed = telegram_length(entry) + telegram_length(section)
+            if not section_open:
+                body.append(section)
+                section_open = True
+            body.append(entry)
+            ids.append(ipo["id"])
+            used += needed
+    if body:
+        messages.append((body, ids))
+
+    rendered = []
+    for i, (body, ids) in enumerate(messages, 1):
+        part = f" ({i}/{len(messages)})" if len(messages) > 1 else ""
+        rendered.append((DIGEST_HEADER.substitute(date=today, part=part) + "".join(body) + DIGEST_FOOTER, ids))
+    return rendered
@@ -1,14 +1,21 @@
 import os
-import re
+import time
+import asyncio
 import logging
+import argparse
 from datetime import datetime
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
+import alert_rules
+import scraper
+import metrics
+import ranking
+import profiling
+import bot_server
+import subscriptions
+from search_index import NameIndex
+from stages import stage
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+from telegram.helpers import escape_markdown
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, InlineQueryHandler, ContextTypes
 
 # Setup logging
 logging.basicConfig(
@@ -17,108 +24,148 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Snapshot cache settings
+SNAPSHOT_TTL = int(os.getenv("SNAPSHOT_TTL", "600"))  # seconds before a re-scrape
+STALE_SNAPSHOT_TTL = 60
+PAGE_SIZE = int(os.getenv("BOT_PAGE_SIZE", "10"))
+INLINE_RESULTS = 20
+
+# GMP filter buttons, compiled once from the rules config
+BOT_FILTERS = {rule.name: rule for rule in alert_rules.load_rules("bot_filters")}
+
 # ---------------- FETCH IPO DATA ----------------
 
 def get_ipos():
-    """Scrape IPO data from investorgain.com"""
+    """Scrape IPO data from investorgain.com (a stale cached snapshot if the scrape fails)"""
     logger.info("Starting IPO data extraction")
-    today = datetime.today().date()
-
-    options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-
-    logger.info("Launching Chrome WebDriver in headless mode")
-    driver = webdriver.Chrome(options=options)
-    wait = WebDriverWait(driver, 30)
-
-    try:
-        logger.info("Navigating to IPO GMP report page")
-        driver.get("https://www.investorgain.com/report/live-ipo-gmp/331/all/")
-
-        logger.info("Waiting for IPO table to load")
-        table = wait.until(EC.presence_of_element_located((By.ID, "report_table")))
-        rows = table.find_elements(By.TAG_NAME, "tr")
-
-        ipo_data = []
-        logger.info("Extracting IPO rows")
-
-        for row in rows[1:]:  # skip header
-            cols = row.find_elements(By.TAG_NAME, "td")
-            if len(cols) > 8:
-                name = cols[0].text.strip()
-                gmp_text = cols[1].text.strip()
-                price = cols[2].text.strip()
-                sub = cols[3].text.strip()
-                start = cols[7].text.strip()
-                end = cols[8].text.strip()
-
-                # Extract GMP percentage
-                match = re.search(r"\(([\d\.]+)%\)", gmp_text)
-                gmp_value = float(match.group(1)) if match else 0
-
-                try:
-                    def extract_date(text, today):
-                        match = re.search(r"\d{1,2}-[A-Za-z]{3}", text)
-                        if match:
-                            return datetime.strptime(match.group(), "%d-%b").date().replace(year=today.year)
-                        return None
-
-                    start_date = extract_date(start, today)
-                    end_date = extract_date(end, today)
-
-                except Exception as e:
-                    logger.error(f"Date extraction failed: {e}")
-                    start_date = None
-                    end_date = None
-
-                ipo_data.append({
-                    'name': name,
-                    'gmp': gmp_value,
-                    'gmp_text': gmp_text,
-                    'price': price,
-                    'subscription': sub,
-                    'start': start_date,
-                    'end': end_date,
-                    'start_raw': start,
-                    'end_raw': end
-                })
-
-    finally:
-        driver.quit()
-
-    logger.info(f"IPO data extraction complete. Total IPOs found: {len(ipo_data)}")
-    return ipo_data
+    return scraper.scrape_ipo_records()
 
 
 def filter_ipos_by_gmp(ipos, gmp_range):
-    """Filter IPOs based on GMP percentage range"""
-    if gmp_range == "low":
-        # 0-30% GMP
-        return [ipo for ipo in ipos if 0 <= ipo['gmp'] <= 30]
-    elif gmp_range == "high":
-        # Above 30% GMP
-        return [ipo for ipo in ipos if ipo['gmp'] > 30]
-    return ipos
+    """Filter IPOs using the configured 'gmp_<range>' bot filter rule"""
+    rule = BOT_FILTERS.get(f"gmp_{gmp_range}")
+    if rule is None:
+        return ipos
+    return [ipo for ipo in ipos if rule.matches([ipo.gmp])]
 
 
 def format_ipo_message(ipo):
     """Format a single IPO as a readable message"""
     return (
-        f"📊 *{ipo['name']}*\n"
-        f"├ GMP: {ipo['gmp']}%\n"
-        f"├ Price: {ipo['price']}\n"
-        f"├ Subscription: {ipo['subscription']}\n"
-        f"├ Start: {ipo['start_raw']}\n"
-        f"└ End: {ipo['end_raw']}\n"
+        f"📊 *{ipo.name}*\n"
+        f"├ GMP: {ipo.gmp}%\n"
+        f"├ Price: {ipo.price_text}\n"
+        f"├ Subscription: {ipo.subscription_text}\n"
+        f"├ Start: {ipo.start_raw}\n"
+        f"└ End: {ipo.end_raw}\n"
     )
 
 
+# ---------------- SNAPSHOT CACHE ----------------
+
+# Filter key -> (page title, bot filter range passed to filter_ipos_by_gmp)
+VIEWS = {
+    "gmp_low": ("📉 *IPOs with 0-30% GMP*", "low"),
+    "gmp_high": ("📈 *IPOs with Above 30% GMP*", "high"),
+    "gmp_all": ("📋 *All Current IPOs*", "all"),
+}
+
+
+def callback_view(data):
+    """Filter view named by a button's callback data ('gmp_low' or 'gmp_low:<page>')"""
+    view = data.partition(":")[0]
+    return view if view in VIEWS else "gmp_all"
+
+
+class IpoSnapshot:
+    """One scrape of IPO data with its pre-rendered pages and name index"""
+
+    def __init__(self, result, page_size=PAGE_SIZE):
+        self.ipos = result.records
+        self.fetched_at = result.fetched_at
+        self.stale = result.stale  # scrape failed, data is the cached fallback
+        self.loaded_at = time.monotonic()
+        self.index = NameIndex(self.ipos, key=lambda ipo: ipo.name)
+        note = f"⚠️ _Cached data from {self.fetched_at:%d-%b %H:%M}_\n\n" if self.stale else ""
+        self.pages = {key: render_pages(key, self.ipos, page_size, note) for key in VIEWS}
+
+    def age(self):
+        return time.monotonic() - self.loaded_at
+
+    def is_expired(self):
+        # Retry a failed scrape sooner than a good one
+        return self.age() > (STALE_SNAPSHOT_TTL if self.stale else SNAPSHOT_TTL)
+
+
+def render_pages(view, ipos, page_size=PAGE_SIZE, note=""):
+    """Pre-render every page of a filter view as (text, reply_markup) tuples"""
+    title, gmp_range = VIEWS[view]
+    title = note + title
+    filtered_ipos = filter_ipos_by_gmp(ipos, gmp_range)
+
+    if not filtered_ipos:
+        return [(
+            f"{title}\n\nNo IPOs found in this category.\n\n"
+            "Use /start to select a different filter.",
+            None
+        )]
+
+    chunks = [filtered_ipos[i:i + page_size] for i in range(0, len(filtered_ipos), page_size)]
+    pages = []
+    for page, chunk in enumerate(chunks):
+        message = f"{title} ({page + 1}/{len(chunks)})\n\n"
+        message += "\n".join(format_ipo_message(ipo) for ipo in chunk)
+        message += "\n\nUse /start to filter again."
+
+        buttons = []
+        if page > 0:
+            buttons.append(InlineKeyboardButton("◀ Prev", callback_data=f"{view}:{page - 1}"))
+        if page < len(chunks) - 1:
+            buttons.append(InlineKeyboardButton("Next ▶", callback_data=f"{view}:{page + 1}"))
+        pages.append((message, InlineKeyboardMarkup([buttons]) if buttons else None))
+    return pages
+
+
+_snapshot = None
+_snapshot_lock = asyncio.Lock()
+
+
+async def get_snapshot():
+    """Return the cached snapshot, scraping once if it is missing or stale"""
+    global _snapshot
+    if _snapshot is not None and not _snapshot.is_expired():
+        metrics.SNAPSHOT_REQUESTS.labels("hit").inc()
+        return _snapshot
+
+    metrics.SNAPSHOT_REQUESTS.labels("miss").inc()
+    # Concurrent callers wait for a single scrape instead of starting their own
+    async with _snapshot_lock:
+        if _snapshot is None or _snapshot.is_expired():
+            with stage("bot.scrape"), metrics.SCRAPE_SECONDS.time():
+                result = await asyncio.to_thread(scrape_with_browser)
+            metrics.SCRAPES.labels("empty" if not result.records else "stale" if result.stale else "ok").inc()
+            if result.records:
+                _snapshot = IpoSnapshot(result)
+                metrics.SNAPSHOT_IPOS.set(len(result))
+                logger.info(f"Snapshot refreshed: {len(result)} IPOs{' (stale)' if result.stale else ''}")
+    return _snapshot
+
+
+def scrape_with_browser():
+    with metrics.BROWSER_SESSIONS.track_inprogress():
+        return get_ipos()
+
+
+def data_age():
+    """Seconds since the served data was scraped, for the metrics gauge"""
+    if _snapshot is None or _snapshot.fetched_at is None:
+        return -1
+    return (datetime.now() - _snapshot.fetched_at).total_seconds()
+
+
 # ---------------- TELEGRAM BOT HANDLERS ----------------
 
+@metrics.timed("start")
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command - show GMP filter buttons"""
     keyboard = [
@@ -142,53 +189,30 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+@metrics.timed(lambda update: callback_view(update.callback_query.data))
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle button clicks"""
+    """Handle filter and page button clicks from the cached snapshot"""
     query = update.callback_query
     await query.answer()  # Acknowledge the button click
-    
-    # Show loading message
-    await query.edit_message_text("⏳ Fetching IPO data... Please wait...")
-    
+
+    view, page = callback_view(query.data), query.data.partition(":")[2]
+    page = int(page) if page.isdigit() else 0
+
+    if _snapshot is None or _snapshot.is_expired():
+        # Show loading message
+        await query.edit_message_text("⏳ Fetching IPO data... Please wait...")
+
     try:
-        # Fetch IPO data
-        ipos = get_ipos()
-        
-        if not ipos:
+        snapshot = await get_snapshot()
+
+        if snapshot is None:
             await query.edit_message_text("❌ No IPO data found. Please try again later.")
             return
-        
-        # Filter based on selection
-        if query.data == "gmp_low":
-            filtered_ipos = filter_ipos_by_gmp(ipos, "low")
-            title = "📉 *IPOs with 0-30% GMP*\n\n"
-        elif query.data == "gmp_high":
-            filtered_ipos = filter_ipos_by_gmp(ipos, "high")
-            title = "📈 *IPOs with Above 30% GMP*\n\n"
-        else:  # gmp_all
-            filtered_ipos = ipos
-            title = "📋 *All Current IPOs*\n\n"
-        
-        if not filtered_ipos:
-            await query.edit_message_text(
-                f"{title}No IPOs found in this category.\n\n"
-                "Use /start to select a different filter.",
-                parse_mode='Markdown'
-            )
-            return
-        
-        # Build response message
-        message = title
-        for ipo in filtered_ipos[:10]:  # Limit to 10 IPOs to avoid message too long
-            message += format_ipo_message(ipo) + "\n"
-        
-        if len(filtered_ipos) > 10:
-            message += f"\n_...and {len(filtered_ipos) - 10} more IPOs_\n"
-        
-        message += "\n\nUse /start to filter again."
-        
-        await query.edit_message_text(message, parse_mode='Markdown')
-        
+
+        pages = snapshot.pages[view]
+        message, reply_markup = pages[min(page, len(pages) - 1)]
+        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode='Markdown')
+
     except Exception as e:
         logger.error(f"Error fetching IPO data: {e}")
         await query.edit_message_text(
@@ -197,12 +221,96 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
+@metrics.timed("search")
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /search <name> - look IPOs up in the cached name index"""
+    text = " ".join(context.args)
+    if not text:
+        await update.message.reply_text("Usage: /search <IPO name>")
+        return
+
+    snapshot = await get_snapshot()
+    if snapshot is None:
+        await update.message.reply_text("❌ No IPO data found. Please try again later.")
+        return
+
+    matches = snapshot.index.search(text, limit=PAGE_SIZE)
+    if not matches:
+        await update.message.reply_text(f"No IPOs matching '{text}'.")
+        return
+
+    message = f"🔎 *Results for '{escape_markdown(text)}'*\n\n" + "\n".join(format_ipo_message(ipo) for ipo in matches)
+    await update.message.reply_text(message, parse_mode='Markdown')
+
+
+@metrics.timed("top")
+async def top_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /top [gmp|subscription|score|closing] [k] [sme|main] [week] - rank the cached snapshot"""
+    try:
+        key, k, filters = ranking.parse_top_args(context.args)
+    except ValueError as e:
+        await update.message.reply_text(
+            f"Unknown option '{e}'.\n"
+            "Usage: /top [gmp|subscription|score|closing] [count] [sme|main] [week]\n"
+            "Example: /top subscription 5 sme"
+        )
+        return
+
+    snapshot = await get_snapshot()
+    if snapshot is None:
+        await update.message.reply_text("❌ No IPO data found. Please try again later.")
+        return
+
+    ranked = ranking.top_ipos(snapshot.ipos, key, k, filters)
+    label, _, fmt = ranking.RANK_KEYS[key]
+    scope = " ".join(filters)
+    title = f"🏆 *Top {len(ranked) or k}{f' {scope}' if scope else ''} IPOs by {label.lower()}*"
+    if not ranked:
+        await update.message.reply_text(f"{title}\n\nNo IPOs match.", parse_mode='Markdown')
+        return
+
+    message = f"{title}\n\n" + "\n".join(
+        f"*#{rank}* {label}: {fmt(value)}\n{format_ipo_message(ipo)}" for rank, (value, ipo) in enumerate(ranked, 1)
+    )
+    await update.message.reply_text(message, parse_mode='Markdown')
+
+
+@metrics.timed("inline")
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Answer inline queries from the cached name index (never scrapes inline)"""
+    query = update.inline_query
+    if _snapshot is None or _snapshot.is_expired():
+        # Refresh the cache for the next query instead of blocking this one
+        context.application.create_task(get_snapshot())
+    if _snapshot is None:
+        await query.answer([], cache_time=5)
+        return
+
+    matches = _snapshot.index.search(query.query, limit=INLINE_RESULTS) if query.query else _snapshot.ipos[:INLINE_RESULTS]
+    results = [
+        InlineQueryResultArticle(
+            id=str(i),
+            title=ipo.name,
+            description=f"GMP {ipo.gmp}% | Sub {ipo.subscription_text} | Ends {ipo.end_raw}",
+            input_message_content=InputTextMessageContent(format_ipo_message(ipo), parse_mode='Markdown'),
+        )
+        for i, ipo in enumerate(matches)
+    ]
+    await query.answer(results, cache_time=60)
+
+
+@metrics.timed("help")
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /help command"""
     await update.message.reply_text(
         "🤖 *IPO GMP Tracker Bot*\n\n"
         "*Commands:*\n"
         "/start - Show GMP filter buttons\n"
+        "/search <name> - Find an IPO by name\n"
+        "/top [gmp|subscription|score|closing] [count] [sme|main] [week] - Best IPOs right now\n"
+        "/subscribe <gmp> [tomorrow|today|both] - Personal alerts\n"
+        "/unsubscribe - Stop personal alerts\n"
+        "/mysubs - Show your alert settings\n"
         "/help - Show this help message\n\n"
         "*What is GMP?*\n"
         "Grey Market Premium (GMP) indicates the expected listing gain.\n"
@@ -214,10 +322,82 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+# ---------------- SUBSCRIPTIONS ----------------
+
+# /subscribe argument -> alert windows
+WINDOW_ARGS = {
+    "tomorrow": ["closing_tomorrow"],
+    "today": ["closing_today"],
+    "both": list(subscriptions.WINDOWS),
+}
+
+_supabase = None
+
+
+def get_db():
+    """Lazily create the Supabase client used for subscriptions"""
+    global _supabase
+    if _supabase is None:
+        _supabase = subscriptions.get_supabase()
+    return _supabase
+
+
+@metrics.timed("subscribe")
+async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /subscribe <min_gmp> [tomorrow|today|both]"""
+    try:
+        min_gmp = float(context.args[0])
+        windows = WINDOW_ARGS[context.args[1].lower() if len(context.args) > 1 else "both"]
+        if min_gmp < 0:
+            raise ValueError
+    except (IndexError, KeyError, ValueError):
+        await update.message.reply_text(
+            "Usage: /subscribe <min GMP %> [tomorrow|today|both]\n"
+            "Example: /subscribe 20 both"
+        )
+        return
+
+    chat = update.effective_chat
+    await asyncio.to_thread(subscriptions.save_subscription, get_db(), chat.id, chat.username, min_gmp, windows)
+    await update.message.reply_text(
+        f"✅ Subscribed to IPO alerts with average GMP ≥ {min_gmp:g}%\n"
+        f"Windows: {', '.join(w.replace('_', ' ') for w in windows)}"
+    )
+
+
+@metrics.timed("unsubscribe")
+async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /unsubscribe"""
+    await asyncio.to_thread(subscriptions.remove_subscription, get_db(), update.effective_chat.id)
+    await update.message.reply_text("🔕 You will no longer receive personal IPO alerts.")
+
+
+@metrics.timed("mysubs")
+async def mysubs_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /mysubs - show the user's subscription"""
+    rows = await asyncio.to_thread(subscriptions.get_subscription, get_db(), update.effective_chat.id)
+    if not rows:
+        await update.message.reply_text("You have no active subscription. Use /subscribe to add one.")
+        return
+    lines = [f"• {row['alert_window'].replace('_', ' ')}: GMP ≥ {row['min_gmp']:g}%" for row in rows]
+    await update.message.reply_text("🔔 Your IPO alerts:\n" + "\n".join(lines))
+
+
 # ---------------- MAIN ----------------
 
 def main():
-    """Start the bot"""
+    """Start the bot (polling by default, webhook with --webhook or BOT_MODE=webhook)"""
+    parser = argparse.ArgumentParser(description="IPO GMP Tracker bot")
+    parser.add_argument("--webhook", action="store_true", default=os.getenv("BOT_MODE") == "webhook",
+                        help="serve updates over a webhook instead of polling")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile every snapshot scrape (or PROFILE=1); SIGUSR1 writes a memory snapshot either way")
+    args = parser.parse_args()
+    profiling.configure("bot", args.profile)
+    profiling.install_memory_signal("bot")
+    metrics.DATA_AGE.set_function(data_age)
+    metrics.serve()
+
     # Get token from environment variable
     TELEGRAM_TOKEN = os.getenv("TG_BOT_TOKEN")
     
@@ -225,17 +405,31 @@ def main():
         logger.error("TG_BOT_TOKEN environment variable not set!")
         return
     
-    # Create the Application
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    # Create the Application - updates run concurrently, in order per chat
+    builder = Application.builder().token(TELEGRAM_TOKEN).concurrent_updates(bot_server.PerChatUpdateProcessor())
+    if os.getenv("TG_API_BASE_URL"):
+        # e.g. the stub Bot API started by loadtest_bot.py
+        builder = builder.base_url(os.getenv("TG_API_BASE_URL"))
+    application = builder.build()
     
     # Add handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("search", search_command))
+    application.add_handler(CommandHandler("top", top_command))
+    application.add_handler(CommandHandler("subscribe", subscribe_command))
+    application.add_handler(CommandHandler("unsubscribe", unsubscribe_command))
+    application.add_handler(CommandHandler("mysubs", mysubs_command))
     application.add_handler(CallbackQueryHandler(button_callback))
+    application.add_handler(InlineQueryHandler(inline_query))
     
     # Start the bot
-    logger.info("Bot is starting...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    if args.webhook:
+        logger.info("Bot is starting in webhook mode...")
+        asyncio.run(bot_server.serve(application))
+    else:
+        logger.info("Bot is starting...")
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == "__main__":
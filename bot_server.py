@@ -0,0 +1,128 @@
+"""
+Webhook-mode server for the Telegram bot.
+
+Telegram POSTs updates to an aiohttp endpoint which hands them to the
+Application's update queue. Updates are processed concurrently by
+PerChatUpdateProcessor: up to BOT_CONCURRENCY at once, but never two for
+the same chat, so each user still sees replies in the order they clicked.
+"""
+import os
+import signal
+import asyncio
+import logging
+from aiohttp import web
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# Webhook config
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # public https URL Telegram posts to
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+BOT_CONCURRENCY = int(os.getenv("BOT_CONCURRENCY", "32"))
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Run updates concurrently while keeping updates of one chat in order"""
+
+    def __init__(self, max_concurrent_updates=BOT_CONCURRENCY):
+        super().__init__(max_concurrent_updates)
+        self._slots = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._locks = {}
+        self._waiters = {}
+
+    # BaseUpdateProcessor.process_update takes the global semaphore before
+    # do_process_update, so an update queued behind its own chat would hold
+    # a slot while waiting. Here the chat lock comes first and a slot is only
+    # taken once the update can actually run (@final is a typing hint only).
+    async def process_update(self, update, coroutine):
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            async with self._slots:
+                await self.do_process_update(update, coroutine)
+            return
+
+        key = chat.id
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                async with self._slots:
+                    await self.do_process_update(update, coroutine)
+        finally:
+            # Drop the lock once nobody is queued on it so idle chats cost nothing
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                del self._locks[key]
+
+    async def do_process_update(self, update, coroutine):
+        await coroutine
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+
+def build_web_app(application):
+    """Build the aiohttp app that feeds webhook POSTs into the update queue"""
+
+    async def handle_update(request):
+        if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+
+        await application.update_queue.put(Update.de_json(data, application.bot))
+        return web.Response()
+
+    async def health(request):
+        return web.json_response({"status": "ok", "running": application.running})
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle_update)
+    app.router.add_get("/healthz", health)
+    return app
+
+
+async def serve(application):
+    """Run the bot in webhook mode until SIGINT/SIGTERM, then drain and stop"""
+    if not WEBHOOK_URL:
+        raise ValueError("WEBHOOK_URL environment variable not set!")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    runner = web.AppRunner(build_web_app(application))
+
+    async with application:  # initialize() / shutdown()
+        await application.start()
+        await application.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES,
+        )
+
+        await runner.setup()
+        site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+        await site.start()
+        logger.info(f"Webhook server listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH} "
+                    f"(concurrency {application.update_processor.max_concurrent_updates})")
+
+        await stop_event.wait()
+
+        # Stop taking new updates first, then let in-flight handlers finish
+        logger.info("Shutting down webhook server...")
+        await runner.cleanup()
+        await application.stop()
+
+    logger.info("Webhook server stopped")
@@ -1,7 +1,12 @@
 import os
+import asyncio
 import logging
-from datetime import datetime, timedelta
-from supabase import create_client, Client
+import argparse
+import profiling
+from datetime import date, datetime, timedelta
+from db import IpoRepository
+from read_api import notify_read_api
+from stages import stage, log_summary
 
 # Setup logging
 logging.basicConfig(
@@ -10,38 +15,62 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Supabase config
-SUPABASE_URL = os.getenv("SUPABASE_URL", "https://ofcngucvrrmzvihjgjvz.supabase.co")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-def get_supabase() -> Client:
-    """Get Supabase client"""
-    if not SUPABASE_KEY:
-        raise ValueError("SUPABASE_KEY environment variable not set!")
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
-
-
-def cleanup_old_data():
-    """Delete IPOs and GMP history older than 2 weeks"""
-    supabase = get_supabase()
-    today = datetime.today().date()
-    cutoff_date = today - timedelta(weeks=2)
-    
-    logger.info(f"Cleaning up data older than {cutoff_date}")
-    
-    # Delete old IPOs (CASCADE will delete related gmp_history)
-    result = supabase.table('ipos').delete().lt('end_date', str(cutoff_date)).execute()
-    
-    deleted_count = len(result.data) if result.data else 0
-    logger.info(f"Deleted {deleted_count} old IPO records")
-    
-    return deleted_count
+EXPIRE_AFTER = timedelta(weeks=2)                                 # closed IPOs leave the live set
+RETENTION_MONTHS = int(os.getenv("GMP_RETENTION_MONTHS", "36"))   # whole months of history kept
+PARTITIONS_AHEAD = timedelta(days=90)
+DETACH_ONLY = os.getenv("GMP_RETENTION_DETACH") == "1"            # keep old months as archive tables
+
+
+def months_before(day, months):
+    """First day of the month `months` before day's month"""
+    year, month = divmod(day.year * 12 + day.month - 1 - months, 12)
+    return date(year, month + 1, 1)
+
+
+async def cleanup_old_data(repo, today=None):
+    """Expire IPOs closed over 2 weeks ago and drop GMP history past the retention window"""
+    today = today or datetime.today().date()
+    expire_before = today - EXPIRE_AFTER
+    retain_from = months_before(today, RETENTION_MONTHS)
+
+    # Closed IPOs keep their rows and history; expiring them keeps the tracker and alert queries small
+    with stage("cleanup.expire"):
+        expired = await repo.expire_ipos_ended_before(expire_before)
+    logger.info(f"Expired {len(expired)} IPOs that closed before {expire_before}")
+
+    # Whole months go at once: a partition drop instead of row-by-row cascaded deletes
+    with stage("cleanup.partitions"):
+        created = await repo.create_gmp_partitions(today, today + PARTITIONS_AHEAD)
+        removed = await repo.drop_gmp_partitions(retain_from, detach_only=DETACH_ONLY)
+    if created:
+        logger.info(f"Created GMP history partitions: {', '.join(created)}")
+    if removed:
+        logger.info(f"{'Detached' if DETACH_ONLY else 'Dropped'} GMP history partitions before {retain_from}: {', '.join(removed)}")
+
+    # Their history months are normally gone already, so the cascade has little left to delete
+    with stage("cleanup.delete"):
+        deleted = await repo.delete_ipos_ended_before(retain_from)
+    logger.info(f"Deleted {len(deleted)} IPOs that closed before {retain_from}")
+
+    return len(expired) + len(deleted)
+
+
+async def run():
+    async with IpoRepository() as repo:
+        if await cleanup_old_data(repo):
+            await notify_read_api()
 
 
 def main():
     """Main cleanup function"""
+    parser = argparse.ArgumentParser(description="Expire closed IPOs and drop GMP history past retention")
+    parser.add_argument("--profile", action="store_true", help="write CPU and memory profiles per stage (or PROFILE=1)")
+    args = parser.parse_args()
+    profiling.configure("cleanup", args.profile)
+
     logger.info("=== Cleanup Started ===")
-    cleanup_old_data()
+    asyncio.run(run())
+    log_summary()
     logger.info("=== Cleanup Finished ===")
 
 
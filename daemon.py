@@ -0,0 +1,282 @@
+"""
+Long-running pipeline daemon with an adaptive collection schedule.
+
+    python daemon.py
+
+Instead of a cold runner per cron slot, one process keeps a warm Chrome
+session and database connection pool and runs:
+
+collect   scrape once, add new IPOs and record today's GMP. The next run is
+          ACTIVE_INTERVAL away while an IPO closes today or next session,
+          LIVE_INTERVAL while any IPO is open, IDLE_INTERVAL otherwise, and
+          is pushed to the next ACTIVE_HOURS window (IST) outside it.
+alerts    daily at ALERT_TIME (IST)
+cleanup   daily at CLEANUP_TIME (IST)
+
+A job still running when it comes due again is skipped, not queued, and a
+lock file stops a second daemon from starting. Each job's last and next run
+are persisted in DAEMON_STATE_FILE, so a restart resumes the schedule and a
+daily job missed while the daemon was down runs once on start-up.
+"""
+import os
+import json
+import fcntl
+import signal
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, time as dtime, timedelta
+from zoneinfo import ZoneInfo
+import scraper
+import trading_calendar
+import profiling
+import ipo_tracker
+import gmp_collector
+import alert_sender
+import cleanup
+from db import IpoRepository
+from read_api import notify_read_api
+
+# Setup logging
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo("Asia/Kolkata")
+
+# Collection cadence (seconds)
+ACTIVE_INTERVAL = int(os.getenv("DAEMON_ACTIVE_INTERVAL", str(15 * 60)))  # an IPO closes today/tomorrow
+LIVE_INTERVAL = int(os.getenv("DAEMON_LIVE_INTERVAL", str(60 * 60)))      # IPOs open, none closing yet
+IDLE_INTERVAL = int(os.getenv("DAEMON_IDLE_INTERVAL", str(6 * 60 * 60)))  # nothing live
+ACTIVE_HOURS = os.getenv("DAEMON_ACTIVE_HOURS", "08:00-20:00")            # IST; GMPs do not move overnight
+ALERT_TIME = os.getenv("DAEMON_ALERT_TIME", "08:05")
+CLEANUP_TIME = os.getenv("DAEMON_CLEANUP_TIME", "08:30")
+BROWSER_RECYCLE = int(os.getenv("DAEMON_BROWSER_RECYCLE", "50"))          # scrapes per Chrome session
+
+STATE_FILE = os.getenv("DAEMON_STATE_FILE", os.path.join(scraper.CACHE_DIR, "daemon_state.json"))
+LOCK_FILE = os.path.join(scraper.CACHE_DIR, "daemon.lock")
+MAX_SLEEP = 60  # re-check the schedule at least this often
+
+
+def parse_clock(text):
+    hours, minutes = text.split(":")
+    return dtime(int(hours), int(minutes))
+
+
+def next_daily(clock, now):
+    """Next occurrence of `clock` (IST) strictly after `now`"""
+    candidate = datetime.combine(now.astimezone(IST).date(), clock, IST)
+    return candidate if candidate > now else candidate + timedelta(days=1)
+
+
+def within_active_hours(when):
+    start, end = (parse_clock(t) for t in ACTIVE_HOURS.split("-"))
+    return start <= when.astimezone(IST).time() < end
+
+
+def collect_interval(records, now):
+    """Seconds until the next collection, from how many sessions live IPOs have left"""
+    today = now.astimezone(IST).date()
+    calendar = trading_calendar.get_calendar()
+    days_left = [calendar.trading_days_between(today, r.end_date) for r in records if r.end_date and r.end_date >= today]
+    if not days_left:
+        return IDLE_INTERVAL
+    return ACTIVE_INTERVAL if min(days_left) <= 1 else LIVE_INTERVAL
+
+
+# ---------------- STATE ----------------
+
+@dataclass
+class Job:
+    name: str
+    next_run: datetime
+    last_run: datetime = None
+    last_ok: bool = None
+    running: bool = False
+
+    def to_dict(self):
+        return {
+            "next_run": self.next_run.isoformat(),
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_ok": self.last_ok,
+        }
+
+
+def load_jobs(now):
+    """Jobs with their persisted schedule; a missed daily run is due immediately"""
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        saved = {}
+
+    defaults = {
+        "collect": now,
+        "alerts": next_daily(parse_clock(ALERT_TIME), now),
+        "cleanup": next_daily(parse_clock(CLEANUP_TIME), now),
+    }
+    jobs = {}
+    for name, next_run in defaults.items():
+        data = saved.get(name, {})
+        job = Job(name, next_run)
+        if data.get("next_run"):
+            job.next_run = min(datetime.fromisoformat(data["next_run"]), next_run)
+        if data.get("last_run"):
+            job.last_run = datetime.fromisoformat(data["last_run"])
+        job.last_ok = data.get("last_ok")
+        jobs[name] = job
+    return jobs
+
+
+def save_jobs(jobs):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({name: job.to_dict() for name, job in jobs.items()}, f, indent=2)
+    os.replace(tmp, STATE_FILE)
+
+
+# ---------------- WARM BROWSER ----------------
+
+class WarmBrowser:
+    """One Chrome session reused across scrapes, relaunched after failures"""
+
+    def __init__(self):
+        self.driver = None
+        self.scrapes = 0
+
+    def scrape(self):
+        if self.driver is None:
+            self.driver = scraper.launch_driver()
+            self.scrapes = 0
+        result = scraper.scrape_ipo_records(driver=self.driver)
+        self.scrapes += 1
+        # A stale result means every attempt failed - the session may be dead
+        if result.stale or self.scrapes >= BROWSER_RECYCLE:
+            self.close()
+        return result
+
+    def close(self):
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except Exception as e:
+                logger.warning(f"Error closing Chrome: {e}")
+            self.driver = None
+
+
+# ---------------- JOBS ----------------
+
+class Daemon:
+    def __init__(self, repo):
+        self.repo = repo
+        self.browser = WarmBrowser()
+
+    async def collect(self, now):
+        """Scrape, track new IPOs, record GMP; returns the next run time"""
+        result = await asyncio.to_thread(self.browser.scrape)
+        records = [r for r in result.records if r.end_date]
+
+        changed = await ipo_tracker.add_new_ipos_to_db(self.repo, records, record_gmp=not result.stale)
+        if result.stale:
+            logger.warning(f"Only stale data (from {result.fetched_at}) - GMP not recorded")
+        else:
+            changed += await gmp_collector.collect_daily_gmps(self.repo, current_gmps={r.name: r.gmp for r in result})
+        if changed:
+            await notify_read_api()
+
+        next_run = now + timedelta(seconds=collect_interval(records, now))
+        if not within_active_hours(next_run):
+            next_run = next_daily(parse_clock(ACTIVE_HOURS.split("-")[0]), next_run)
+        return next_run
+
+    async def alerts(self, now):
+        await alert_sender.check_and_send_alerts(self.repo)
+        return next_daily(parse_clock(ALERT_TIME), now)
+
+    async def cleanup(self, now):
+        if await cleanup.cleanup_old_data(self.repo):
+            await notify_read_api()
+        return next_daily(parse_clock(CLEANUP_TIME), now)
+
+    async def run_job(self, job, jobs):
+        job.running = True
+        now = datetime.now(IST)
+        logger.info(f"Running job '{job.name}'")
+        try:
+            job.next_run = await getattr(self, job.name)(now)
+            job.last_ok = True
+        except Exception as e:
+            logger.exception(f"Job '{job.name}' failed: {e}")
+            job.last_ok = False
+            # Retry on the short cadence; alert claims and statuses make a rerun safe
+            job.next_run = now + timedelta(seconds=ACTIVE_INTERVAL)
+        finally:
+            job.running = False
+            job.last_run = now
+            save_jobs(jobs)
+        logger.info(f"Job '{job.name}' finished; next run {job.next_run:%Y-%m-%d %H:%M %Z}")
+
+
+async def run_forever():
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    jobs = load_jobs(datetime.now(IST))
+    for job in jobs.values():
+        logger.info(f"Job '{job.name}' next run {job.next_run:%Y-%m-%d %H:%M %Z}")
+
+    async with IpoRepository() as repo:
+        daemon = Daemon(repo)
+        tasks = set()
+        try:
+            while not stop_event.is_set():
+                now = datetime.now(IST)
+                for job in jobs.values():
+                    if job.next_run > now:
+                        continue
+                    if job.running:
+                        # Still busy from the last slot - skip rather than stack runs
+                        logger.warning(f"Skipping '{job.name}': previous run still in progress")
+                        job.next_run = now + timedelta(seconds=MAX_SLEEP)
+                        continue
+                    task = asyncio.create_task(daemon.run_job(job, jobs))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+                wake = min(job.next_run for job in jobs.values())
+                timeout = min(MAX_SLEEP, max(1.0, (wake - datetime.now(IST)).total_seconds()))
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+            logger.info("Stopping daemon, waiting for running jobs...")
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            await asyncio.to_thread(daemon.browser.close)
+            save_jobs(jobs)
+
+
+def main():
+    """Run the daemon, refusing to start if another instance holds the lock"""
+    os.makedirs(os.path.dirname(LOCK_FILE), exist_ok=True)
+    with open(LOCK_FILE, "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise SystemExit(f"Another daemon is already running (lock {LOCK_FILE})")
+
+        profiling.configure("daemon")
+        profiling.install_memory_signal("daemon")
+        logger.info("=== Pipeline Daemon Started ===")
+        asyncio.run(run_forever())
+        logger.info("=== Pipeline Daemon Stopped ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Async data access for Supabase.
+
+Talks to PostgREST directly over one pooled httpx.AsyncClient so independent
+queries can be in flight together; DB_CONCURRENCY bounds how many run at
+once. IpoRepository wraps the table-level calls used by the pipeline.
+
+    async with IpoRepository() as repo:
+        tracked, history = await asyncio.gather(repo.tracked_ipos(), repo.recent_gmp_history(ids))
+"""
+import os
+import asyncio
+import logging
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Supabase config
+SUPABASE_URL = os.getenv("SUPABASE_URL", "https://ofcngucvrrmzvihjgjvz.supabase.co")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+DB_CONCURRENCY = int(os.getenv("DB_CONCURRENCY", "8"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "30"))
+PAGE_SIZE = 1000
+
+
+class DatabaseError(Exception):
+    """Raised when PostgREST returns an error response"""
+
+
+# ---------------- FILTERS ----------------
+
+def eq(value):
+    return f"eq.{value}"
+
+
+def lt(value):
+    return f"lt.{value}"
+
+
+def lte(value):
+    return f"lte.{value}"
+
+
+def gte(value):
+    return f"gte.{value}"
+
+
+def in_(values):
+    """PostgREST `in` filter with every value quoted"""
+    quoted = ",".join('"' + str(v).replace('"', '\\"') + '"' for v in values)
+    return f"in.({quoted})"
+
+
+# ---------------- CLIENT ----------------
+
+class PostgrestClient:
+    """Minimal async PostgREST client with bounded concurrency"""
+
+    def __init__(self, url=SUPABASE_URL, key=SUPABASE_KEY, concurrency=DB_CONCURRENCY):
+        if not key:
+            raise ValueError("SUPABASE_KEY environment variable not set!")
+        self.base_url = f"{url.rstrip('/')}/rest/v1"
+        self.headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.client = None
+        self.request_count = 0
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=DB_TIMEOUT,
+            limits=httpx.Limits(max_connections=self.concurrency),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+    async def request(self, method, path, params=None, json=None, prefer=None, headers=None):
+        headers = dict(headers or {})
+        if prefer:
+            headers["Prefer"] = prefer
+
+        async with self.semaphore:
+            self.request_count += 1
+            response = await self.client.request(method, path, params=params, json=json, headers=headers)
+
+        if response.status_code >= 400:
+            raise DatabaseError(f"{method} {path} failed ({response.status_code}): {response.text}")
+        if not response.content:
+            return []
+        return response.json()
+
+    async def select(self, table, columns="*", params=None, headers=None):
+        return await self.request("GET", f"/{table}", params={"select": columns, **(params or {})}, headers=headers)
+
+    async def insert(self, table, rows, on_conflict=None, merge=False, ignore_duplicates=False):
+        """Insert rows (upsert when on_conflict is given) and return the written rows"""
+        params = {"on_conflict": on_conflict} if on_conflict else None
+        prefer = ["return=representation"]
+        if merge:
+            prefer.append("resolution=merge-duplicates")
+        elif ignore_duplicates:
+            prefer.append("resolution=ignore-duplicates")
+        return await self.request("POST", f"/{table}", params=params, json=rows, prefer=",".join(prefer))
+
+    async def update(self, table, values, params):
+        return await self.request("PATCH", f"/{table}", params=params, json=values, prefer="return=representation")
+
+    async def delete(self, table, params):
+        return await self.request("DELETE", f"/{table}", params=params, prefer="return=representation")
+
+    async def rpc(self, function, args=None):
+        return await self.request("POST", f"/rpc/{function}", json=args or {})
+
+
+# ---------------- REPOSITORY ----------------
+
+class IpoRepository:
+    """Table-level operations used by the tracker, collector, alerts and cleanup"""
+
+    def __init__(self, client=None):
+        self.client = client or PostgrestClient()
+
+    async def __aenter__(self):
+        await self.client.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.__aexit__(*exc)
+
+    @property
+    def request_count(self):
+        return self.client.request_count
+
+    async def select_all(self, table, columns, params, order, page_size=PAGE_SIZE):
+        """
+        Every matching row, fetched page by page past the server's max-rows cap.
+        `order` must be unique per row so pages neither overlap nor skip rows.
+        """
+        rows = []
+        offset = 0
+        while True:
+            page = await self.client.select(table, columns, {
+                **params, "order": order, "offset": str(offset), "limit": str(page_size),
+            })
+            rows.extend(page)
+            if len(page) < page_size:
+                return rows
+            offset += page_size
+
+    # ipos
+
+    async def ipos_ending_on(self, end_dates, columns="id, name, end_date"):
+        """IPOs whose end_date is one of `end_dates`"""
+        if not end_dates:
+            return []
+        return await self.select_all("ipos", columns, {"end_date": in_(sorted(map(str, end_dates)))}, "id")
+
+    async def ipos_by_keys(self, keys):
+        """Look up ids for (name, end_date) pairs; returns {(name, end_date): id}"""
+        if not keys:
+            return {}
+        names = sorted({name for name, _ in keys})
+        end_dates = sorted({str(end_date) for _, end_date in keys})
+
+        # Split long name lists so the query string stays a sane length
+        batches = [names[i:i + 100] for i in range(0, len(names), 100)]
+        pages = await asyncio.gather(*(
+            self.client.select("ipos", "id, name, end_date", {"name": in_(batch), "end_date": in_(end_dates)})
+            for batch in batches
+        ))
+        wanted = {(name, str(end_date)) for name, end_date in keys}
+        return {(row["name"], row["end_date"]): row["id"] for rows in pages for row in rows
+                if (row["name"], row["end_date"]) in wanted}
+
+    async def tracked_ipos(self):
+        return await self.select_all("ipos", "id, name", {"status": eq("tracking")}, "id")
+
+    async def window_candidates(self, end_dates, statuses):
+        """IPOs closing on any of `end_dates` whose status is in `statuses`"""
+        return await self.select_all("ipos", "*", {
+            "end_date": in_(sorted(map(str, end_dates))),
+            "status": in_(statuses),
+        }, "end_date,id")
+
+    async def insert_ipos(self, rows):
+        """Insert new IPOs, skipping any (name, end_date) already present; returns inserted rows"""
+        if not rows:
+            return []
+        return await self.client.insert("ipos", rows, on_conflict="name,end_date", ignore_duplicates=True)
+
+    async def iter_ipos_with_history(self, params=None, page_size=PAGE_SIZE):
+        """
+        Yield IPOs with their embedded gmp_history, ordered by (end_date, id).
+        Uses keyset pagination so each page is an index range scan and memory
+        stays at one page regardless of table size.
+        """
+        params = dict(params or {})
+        last = None
+        while True:
+            page_params = {
+                **params,
+                "order": "end_date.asc,id.asc",
+                "gmp_history.order": "recorded_at.asc",
+                "limit": str(page_size),
+            }
+            if last is not None:
+                end_date, ipo_id = last
+                page_params["or"] = f"(end_date.gt.{end_date},and(end_date.eq.{end_date},id.gt.{ipo_id}))"
+
+            page = await self.client.select("ipos", "*, gmp_history(gmp, recorded_at)", page_params)
+            for row in page:
+                yield row
+            if len(page) < page_size:
+                return
+            last = (page[-1]["end_date"], page[-1]["id"])
+
+    async def set_status(self, ipo_ids, status):
+        if not ipo_ids:
+            return []
+        return await self.client.update("ipos", {"status": status}, {"id": in_(ipo_ids)})
+
+    async def claim_ipos(self, ipo_ids, statuses, worker, stale_seconds=900):
+        """Atomically move IPOs in `statuses` to 'alerting'; returns only the rows this worker won"""
+        if not ipo_ids:
+            return []
+        return await self.client.rpc("claim_ipos", {
+            "p_ids": list(ipo_ids),
+            "p_statuses": list(statuses),
+            "p_worker": worker,
+            "p_stale_seconds": stale_seconds,
+        })
+
+    async def apply_statuses(self, statuses, worker=None):
+        """Set a different status per IPO ({id: status}) in a single transaction, releasing claims"""
+        if not statuses:
+            return 0
+        ids = list(statuses)
+        return await self.client.rpc("apply_alert_statuses", {
+            "p_ids": ids,
+            "p_statuses": [statuses[i] for i in ids],
+            "p_worker": worker,
+        })
+
+    async def ipos_to_enrich(self, statuses=("tracking", "alerting", "alerted_tomorrow", "alerted_today")):
+        """Open or recently alerted IPOs with the columns the enrichment stage needs"""
+        return await self.select_all("ipos", "id, name, end_date, detail_url", {"status": in_(statuses)}, "id")
+
+    async def apply_ipo_details(self, details):
+        """Write detail-page fields for many IPOs ([{id, lot_size, ...}]) in one request"""
+        if not details:
+            return 0
+        return await self.client.rpc("apply_ipo_details", {"p_details": details})
+
+    async def expire_ipos_ended_before(self, cutoff_date):
+        """Mark IPOs that ended before cutoff_date expired, keeping their rows and history"""
+        return await self.client.update("ipos", {"status": "expired"}, {
+            "end_date": lt(cutoff_date),
+            "status": in_(["tracking", "alerted_tomorrow", "alerted_today"]),
+        })
+
+    async def delete_ipos_ended_before(self, cutoff_date):
+        """Delete IPOs that ended before cutoff_date (gmp_history cascades)"""
+        return await self.client.delete("ipos", {"end_date": lt(cutoff_date)})
+
+    # gmp_history
+
+    async def recent_gmp_history(self, ipo_ids, columns="ipo_id, gmp, recorded_at", since=None):
+        """GMP history for the given IPOs, most recent first; `since` lets the planner skip old partitions"""
+        if not ipo_ids:
+            return []
+        params = {"ipo_id": in_(ipo_ids)}
+        if since is not None:
+            params["recorded_at"] = gte(since)
+        return await self.select_all("gmp_history", columns, params, "recorded_at.desc,ipo_id")
+
+    async def upsert_gmp(self, rows):
+        """Insert or overwrite (ipo_id, recorded_at) GMP samples in one request"""
+        if not rows:
+            return []
+        return await self.client.insert("gmp_history", rows, on_conflict="ipo_id,recorded_at", merge=True)
+
+    async def insert_gmp(self, rows):
+        if not rows:
+            return []
+        return await self.client.insert("gmp_history", rows, on_conflict="ipo_id,recorded_at", ignore_duplicates=True)
+
+    async def create_gmp_partitions(self, start, end):
+        """Make sure monthly gmp_history partitions cover start..end; returns the ones created"""
+        return await self.client.rpc("create_gmp_partitions", {"p_from": str(start), "p_to": str(end)}) or []
+
+    async def drop_gmp_partitions(self, before, detach_only=False):
+        """Drop (or detach) gmp_history partitions for months ending by `before`; returns their names"""
+        return await self.client.rpc("drop_gmp_partitions", {"p_before": str(before), "p_detach_only": detach_only}) or []
+
+    # ipo_aliases
+
+    async def ipo_aliases(self, ipo_ids):
+        """Scraped spellings previously matched to the given IPOs"""
+        if not ipo_ids:
+            return []
+        return await self.select_all("ipo_aliases", "ipo_id, alias", {"ipo_id": in_(ipo_ids)}, "ipo_id,alias")
+
+    async def add_aliases(self, aliases):
+        """Record {alias: ipo_id} matches, ignoring ones already stored"""
+        rows = [{"ipo_id": ipo_id, "alias": alias} for alias, ipo_id in aliases.items()]
+        if not rows:
+            return []
+        return await self.client.insert("ipo_aliases", rows, on_conflict="ipo_id,alias", ignore_duplicates=True)
+
+    # subscriptions
+
+    async def active_subscriptions(self):
+        """Every subscription of an active subscriber, fetched page by page"""
+        return await self.select_all(
+            "subscriptions", "chat_id, alert_window, min_gmp, subscribers!inner(active)",
+            {"subscribers.active": eq("true")}, "chat_id,alert_window",
+        )
+
+    async def deactivate_chats(self, chat_ids):
+        """Mark chats inactive; ids are deduplicated and sent 100 per request so the URL stays a sane length"""
+        chat_ids = sorted(set(chat_ids))
+        if not chat_ids:
+            return []
+        pages = await asyncio.gather(*(
+            self.client.update("subscribers", {"active": False}, {"chat_id": in_(chat_ids[i:i + 100])})
+            for i in range(0, len(chat_ids), 100)
+        ))
+        return [row for rows in pages for row in rows]
@@ -0,0 +1,160 @@
+"""
+Compare wall-clock time of the read stages on the sync supabase client
+(one request after another, as the scripts used to do) against the async
+IpoRepository (batched and overlapped). Read-only - nothing is written.
+
+    python db_benchmark.py --rounds 3
+    python db_benchmark.py --memory 100     # async path only, synthetic data
+
+With --memory, the async stages run against a MemoryClient seeded with
+synthetic data at the given scale, and each read's row count is checked
+against what was seeded - a read cut off at the max-rows cap fails the run.
+"""
+import time
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+from supabase import create_client
+import alert_rules
+import synthetic_data
+from db import IpoRepository, SUPABASE_URL, SUPABASE_KEY
+from memory_db import MemoryClient
+from alert_sender import load_candidates, load_subscribers
+
+
+# ---------------- SYNC (previous access pattern) ----------------
+
+def sync_alert_load(supabase, today):
+    tomorrow = today + timedelta(days=1)
+    requests = 0
+    ipos = []
+    for end_date, status in ((tomorrow, 'tracking'), (today, 'alerted_tomorrow'), (today, 'tracking')):
+        ipos += supabase.table('ipos').select('*').eq('end_date', str(end_date)).eq('status', status).execute().data
+        requests += 1
+    for ipo in ipos:
+        supabase.table('gmp_history').select('gmp, recorded_at').eq('ipo_id', ipo['id']).order('recorded_at', desc=True).limit(4).execute()
+        requests += 1
+    supabase.table('subscriptions').select('chat_id, alert_window, min_gmp, subscribers!inner(active)').eq('subscribers.active', True).execute()
+    return requests + 1
+
+
+def sync_tracked_history(supabase):
+    tracked = supabase.table('ipos').select('id, name').eq('status', 'tracking').execute().data
+    for ipo in tracked:
+        supabase.table('gmp_history').select('gmp, recorded_at').eq('ipo_id', ipo['id']).execute()
+    return len(tracked) + 1
+
+
+# ---------------- ASYNC ----------------
+
+async def async_alert_load(repo, today):
+    """Returns {table: rows read} for the reads whose size is known up front"""
+    rules = alert_rules.load_rules('alerts')
+    _, index = await asyncio.gather(load_candidates(repo, rules, today), load_subscribers(repo))
+    return {"subscriptions": len(index)}
+
+
+async def async_tracked_history(repo):
+    tracked = await repo.tracked_ipos()
+    history = await repo.recent_gmp_history([ipo['id'] for ipo in tracked])
+    return {"ipos": len(tracked), "gmp_history": len(history)}
+
+
+def seeded_counts(data):
+    """Rows each async stage should read back from `data`"""
+    tracked = {ipo['id'] for ipo in data.ipos if ipo['status'] == 'tracking'}
+    active = {s['chat_id'] for s in data.subscribers if s['active']}
+    return {
+        "alerts.load": {"subscriptions": sum(s['chat_id'] in active for s in data.subscriptions)},
+        "tracked.history": {
+            "ipos": len(tracked),
+            "gmp_history": sum(row['ipo_id'] in tracked for row in data.gmp_history),
+        },
+    }
+
+
+# ---------------- RUN ----------------
+
+def time_sync(fn, *args):
+    started = time.perf_counter()
+    requests = fn(*args)
+    return time.perf_counter() - started, requests
+
+
+async def time_async(repo, fn, *args):
+    before = repo.request_count
+    started = time.perf_counter()
+    rows = await fn(repo, *args)
+    return time.perf_counter() - started, repo.request_count - before, rows
+
+
+async def run(rounds):
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    today = datetime.today().date()
+    stages = [
+        ("alerts.load", (sync_alert_load, supabase, today), (async_alert_load, today)),
+        ("tracked.history", (sync_tracked_history, supabase), (async_tracked_history,)),
+    ]
+
+    print(f"{'stage':<18}{'sync s':>10}{'async s':>10}{'sync req':>10}{'async req':>11}{'speedup':>9}")
+    async with IpoRepository() as repo:
+        for name, (sync_fn, *sync_args), (async_fn, *async_args) in stages:
+            sync_times, async_times = [], []
+            for _ in range(rounds):
+                elapsed, sync_requests = time_sync(sync_fn, *sync_args)
+                sync_times.append(elapsed)
+                elapsed, async_requests, _ = await time_async(repo, async_fn, *async_args)
+                async_times.append(elapsed)
+
+            sync_best, async_best = min(sync_times), min(async_times)
+            print(f"{name:<18}{sync_best:>10.3f}{async_best:>10.3f}{sync_requests:>10}{async_requests:>11}"
+                  f"{sync_best / async_best if async_best else 0:>8.1f}x")
+
+
+async def run_memory(rounds, scale, latency):
+    """Time the async stages on synthetic data; returns the reads that came back short"""
+    data = synthetic_data.generate(scale)
+    client = MemoryClient(latency=latency)
+    for table in ("ipos", "gmp_history", "subscribers", "subscriptions"):
+        client.load(table, getattr(data, table))
+    expected = seeded_counts(data)
+    stages = [
+        ("alerts.load", async_alert_load, (data.today,)),
+        ("tracked.history", async_tracked_history, ()),
+    ]
+
+    short = []
+    print(f"{'stage':<18}{'async s':>10}{'async req':>11}{'rows':>9}")
+    async with IpoRepository(client) as repo:
+        for name, fn, args in stages:
+            times = []
+            for _ in range(rounds):
+                elapsed, requests, rows = await time_async(repo, fn, *args)
+                times.append(elapsed)
+            print(f"{name:<18}{min(times):>10.3f}{requests:>11}{sum(rows.values()):>9}")
+            short += [f"{name} {table}: read {rows[table]} of {count} seeded rows"
+                      for table, count in expected[name].items() if rows[table] != count]
+    if client.truncated:
+        short.append(f"{client.truncated} requests hit the {client.max_rows}-row cap")
+    return short
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async database stage timings")
+    parser.add_argument("--rounds", type=int, default=3, help="best of N rounds per stage")
+    parser.add_argument("--memory", type=int, metavar="SCALE",
+                        help="run the async stages on synthetic data SCALE times today's size instead")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated round trip in seconds (--memory)")
+    args = parser.parse_args()
+    if args.memory:
+        short = asyncio.run(run_memory(args.rounds, args.memory, args.latency))
+        if short:
+            raise SystemExit("Failed: " + "; ".join(short))
+        return
+    if not SUPABASE_KEY:
+        raise SystemExit("SUPABASE_KEY environment variable not set!")
+    asyncio.run(run(args.rounds))
+
+
+if __name__ == "__main__":
+    main()
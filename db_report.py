@@ -0,0 +1,141 @@
+"""
+Database report: every IPO with its GMP history, streamed row by row.
+
+    python db_report.py                          # all IPOs, text
+    python db_report.py --format csv > ipos.csv
+    python db_report.py --format jsonl --status tracking
+    python db_report.py --closing-tomorrow --history 5
+
+IPOs are read with keyset pagination and gmp_history is embedded in the same
+request, so memory stays flat at one page no matter how big the tables are.
+"""
+import sys
+import csv
+import json
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+import db
+from db import IpoRepository
+
+CSV_COLUMNS = ["name", "price", "subscription", "start_date", "end_date", "status", "recorded_at", "gmp"]
+
+
+class TextWriter:
+    """Human-readable report (ASCII only, like the old check_db.py output)"""
+
+    def __init__(self, out, history_limit=None):
+        self.out = out
+        self.history_limit = history_limit
+
+    def header(self, title):
+        self.out.write(f"\n{'=' * 60}\n{title}\n{'=' * 60}\n\n")
+
+    def write(self, i, ipo):
+        self.out.write(
+            f"[{i}] {ipo['name']}\n"
+            f"    Price: {ipo['price']}\n"
+            f"    Subscription: {ipo['subscription']}\n"
+            f"    Start: {ipo['start_date']} | End: {ipo['end_date']}\n"
+            f"    Status: {ipo['status']}\n"
+        )
+        history = ipo['gmp_history']
+        if self.history_limit:
+            history = history[-self.history_limit:]
+        if history:
+            self.out.write("    GMP History:\n")
+            for g in history:
+                self.out.write(f"       - {g['recorded_at']}: {g['gmp']}%\n")
+        else:
+            self.out.write("    GMP History: No data yet\n")
+        self.out.write("\n")
+
+    def footer(self, ipo_count, gmp_count):
+        self.out.write(f"{'=' * 60}\nTotal IPOs: {ipo_count} | Total GMP Records: {gmp_count}\n{'=' * 60}\n")
+
+
+class CsvWriter:
+    """One CSV row per GMP sample (one row with empty GMP for IPOs without history)"""
+
+    def __init__(self, out, history_limit=None):
+        self.writer = csv.writer(out)
+        self.history_limit = history_limit
+
+    def header(self, title):
+        self.writer.writerow(CSV_COLUMNS)
+
+    def write(self, i, ipo):
+        base = [ipo['name'], ipo['price'], ipo['subscription'], ipo['start_date'], ipo['end_date'], ipo['status']]
+        history = ipo['gmp_history']
+        if self.history_limit:
+            history = history[-self.history_limit:]
+        if not history:
+            self.writer.writerow(base + ["", ""])
+        for g in history:
+            self.writer.writerow(base + [g['recorded_at'], g['gmp']])
+
+    def footer(self, ipo_count, gmp_count):
+        pass
+
+
+class JsonLinesWriter:
+    """One JSON object per IPO, history embedded"""
+
+    def __init__(self, out, history_limit=None):
+        self.out = out
+        self.history_limit = history_limit
+
+    def header(self, title):
+        pass
+
+    def write(self, i, ipo):
+        if self.history_limit:
+            ipo['gmp_history'] = ipo['gmp_history'][-self.history_limit:]
+        self.out.write(json.dumps(ipo, separators=(",", ":"), default=str) + "\n")
+
+    def footer(self, ipo_count, gmp_count):
+        pass
+
+
+WRITERS = {"text": TextWriter, "csv": CsvWriter, "jsonl": JsonLinesWriter}
+
+
+async def report(args, out=sys.stdout):
+    params = {}
+    title = "SUPABASE DATABASE - ALL IPOs"
+    if args.closing_tomorrow:
+        tomorrow = datetime.today().date() + timedelta(days=1)
+        params["end_date"] = db.eq(tomorrow)
+        title = f"IPOs closing {tomorrow}"
+    elif args.end_date:
+        params["end_date"] = db.eq(args.end_date)
+        title = f"IPOs closing {args.end_date}"
+    if args.status:
+        params["status"] = db.eq(args.status)
+
+    writer = WRITERS[args.format](out, args.history)
+    writer.header(title)
+
+    ipo_count = gmp_count = 0
+    async with IpoRepository() as repo:
+        async for ipo in repo.iter_ipos_with_history(params, page_size=args.page_size):
+            ipo_count += 1
+            gmp_count += len(ipo['gmp_history'])
+            writer.write(ipo_count, ipo)
+
+    writer.footer(ipo_count, gmp_count)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream IPOs and their GMP history from the database")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="text")
+    parser.add_argument("--status", help="only IPOs with this status")
+    parser.add_argument("--end-date", help="only IPOs closing on this date (YYYY-MM-DD)")
+    parser.add_argument("--closing-tomorrow", action="store_true", help="only IPOs closing tomorrow")
+    parser.add_argument("--history", type=int, help="show only the last N GMP samples per IPO")
+    parser.add_argument("--page-size", type=int, default=500)
+    asyncio.run(report(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Per-IPO detail-page enrichment.
+
+The live table only has name, GMP, price, subscription and dates; lot size,
+issue size, listing date and category-wise subscription are on each IPO's
+own page (linked from the name cell, stored as ipos.detail_url). This stage
+fetches those pages concurrently, at most ENRICH_WORKERS at a time, and
+writes the parsed fields to the ipos columns in one request. It is opt-in:
+the tracker run skips it unless ENRICH_WORKERS is set above 0.
+
+Parsed fields are cached in ENRICH_CACHE_FILE with a per-field TTL, so a
+page is only fetched when one of its fields is due:
+- lot size, issue size and listing date never change once shown
+- subscription figures are refreshed every ENRICH_SUBSCRIPTION_TTL seconds
+  while the IPO is open, and are final once fetched after its close date
+- a field the page does not show yet is retried after MISSING_TTL
+
+    python enrichment.py --workers 4                  # tracked IPOs from the database
+    python enrichment.py --fixtures TestData/ipo_details
+    python enrichment.py --parse TestData/ipo_details/gmp_example-ipo_1234.html
+
+With --fixtures, pages are read from DIR/<url path with "/" as "_">.html
+instead of being fetched, so the stage runs offline.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import argparse
+from dataclasses import dataclass
+from datetime import date
+from urllib.parse import urlsplit
+import httpx
+import scraper
+import profiling
+import ipo_parser
+from db import IpoRepository
+from stages import stage, log_summary
+
+# Setup logging
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+ENRICH_WORKERS = int(os.getenv("ENRICH_WORKERS", "0"))  # concurrent page fetches; 0 keeps the stage off
+ENRICH_TIMEOUT = float(os.getenv("ENRICH_TIMEOUT", "15"))
+SUBSCRIPTION_TTL = int(os.getenv("ENRICH_SUBSCRIPTION_TTL", "1800"))  # seconds while the IPO is open
+MISSING_TTL = 6 * 3600  # seconds before retrying a field the page did not show
+CACHE_MAX_AGE = 90 * 86400  # pages not fetched for this long are dropped from the cache
+CACHE_FILE = os.getenv("ENRICH_CACHE_FILE", os.path.join(scraper.CACHE_DIR, "ipo_details.json"))
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+
+SUBSCRIPTION_FIELDS = ("subscription_qib", "subscription_nii", "subscription_retail")
+FIELDS = ("lot_size", "issue_size_cr", "listing_date", *SUBSCRIPTION_FIELDS)
+
+CRORE_PATTERN = re.compile(r"([\d,]+(?:\.\d+)?)\s*(?:Cr\b|crore)", re.IGNORECASE)
+TIMES_PATTERN = re.compile(r"^(\d[\d,]*(?:\.\d+)?)\s*(?:x|times)?$", re.IGNORECASE)
+MIN_MAX_PATTERN = re.compile(r"\b(?:min|max)\b", re.IGNORECASE)
+
+
+@dataclass(slots=True)
+class Target:
+    """One IPO to enrich"""
+    ipo_id: str
+    url: str
+    end_date: date
+    name: str = ""
+
+
+# ---------------- PARSING ----------------
+
+def parse_lot_size(text):
+    match = ipo_parser.NUMBER_PATTERN.search(text)
+    return int(float(match.group().replace(",", ""))) if match else None
+
+
+def parse_crores(text):
+    """'1,20,00,000 shares (aggregating up to ₹54.00 Cr)' -> 54.0"""
+    match = CRORE_PATTERN.search(text)
+    return float(match.group(1).replace(",", "")) if match else None
+
+
+def parse_times(text):
+    """'12.34x' or '12.34' -> 12.34; None for quota texts like 'Not less than 35%'"""
+    match = TIMES_PATTERN.match(text.strip())
+    return float(match.group(1).replace(",", "")) if match else None
+
+
+def parse_listing_date(text):
+    parsed = ipo_parser.parse_full_date(text)
+    return parsed.isoformat() if parsed else None
+
+
+# Field -> (label prefixes, value parser); the label is the row's first cell, lower-cased
+LABELS = {
+    "lot_size": (("lot size", "market lot"), parse_lot_size),
+    "issue_size_cr": (("issue size", "total issue size"), parse_crores),
+    "listing_date": (("listing date", "tentative listing date"), parse_listing_date),
+    "subscription_qib": (("qib", "qualified institution"), parse_times),
+    "subscription_nii": (("nii", "hni", "non-institutional", "non institutional"), parse_times),
+    "subscription_retail": (("retail", "rii"), parse_times),
+}
+
+
+def parse_detail_html(html):
+    """Fields found on an IPO detail page ({field: value}, None where missing)"""
+    found = dict.fromkeys(FIELDS)
+    for cells in ipo_parser.table_rows(html, header_cells=True):
+        if len(cells) < 2:
+            continue
+        label = cells[0].lower().rstrip(" :")
+        # "Retail (Min)" and friends are lot-size rows, not subscription
+        if MIN_MAX_PATTERN.search(label):
+            continue
+        for field, (prefixes, parse) in LABELS.items():
+            if found[field] is None and label.startswith(prefixes):
+                value = parse(cells[1])
+                if value is not None:
+                    found[field] = value
+                    break
+    return found
+
+
+# ---------------- CACHE ----------------
+
+class DetailCache:
+    """Parsed fields per detail URL as {url: {field: [value, fetched_at]}}"""
+
+    def __init__(self, entries=None):
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls):
+        try:
+            with open(CACHE_FILE, encoding="utf-8") as f:
+                return cls(json.load(f))
+        except (OSError, ValueError):
+            return cls()
+
+    def save(self, now=None):
+        cutoff = (now or time.time()) - CACHE_MAX_AGE
+        self.entries = {url: fields for url, fields in self.entries.items()
+                        if max(fetched_at for _, fetched_at in fields.values()) >= cutoff}
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        tmp = CACHE_FILE + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, CACHE_FILE)
+
+    @staticmethod
+    def ttl(field, value, fetched_at, end_date):
+        """Seconds a cached field stays fresh (None = forever)"""
+        if value is None:
+            return MISSING_TTL
+        if field in SUBSCRIPTION_FIELDS and date.fromtimestamp(fetched_at) <= end_date:
+            return SUBSCRIPTION_TTL
+        return None
+
+    def is_due(self, url, end_date, now):
+        """True if any field of the page is missing or past its TTL"""
+        fields = self.entries.get(url)
+        if not fields or set(fields) != set(FIELDS):
+            return True
+        for field, (value, fetched_at) in fields.items():
+            ttl = self.ttl(field, value, fetched_at, end_date)
+            if ttl is not None and now - fetched_at >= ttl:
+                return True
+        return False
+
+    def store(self, url, found, now):
+        """Record a fetch; a field the page no longer shows keeps its cached value"""
+        fields = self.entries.setdefault(url, {})
+        for field, value in found.items():
+            if value is not None or fields.get(field, [None])[0] is None:
+                fields[field] = [value, now]
+
+    def values(self, url):
+        return {field: value for field, (value, _) in self.entries.get(url, {}).items()}
+
+
+# ---------------- FETCHING ----------------
+
+async def fetch_page(client, url):
+    response = await client.get(url)
+    response.raise_for_status()
+    return response.text
+
+
+def fixture_name(url):
+    """'https://host/gmp/abc-ipo/1234/' -> 'gmp_abc-ipo_1234.html'"""
+    return re.sub(r"[^\w.-]+", "_", urlsplit(url).path.strip("/")) + ".html"
+
+
+def fixture_fetcher(directory):
+    """A fetch_page stand-in reading saved pages from `directory`"""
+    async def fetch(client, url):
+        with open(os.path.join(directory, fixture_name(url)), encoding="utf-8") as f:
+            return f.read()
+    return fetch
+
+
+# ---------------- STAGE ----------------
+
+async def enrich(repo, targets, fetch=fetch_page, workers=ENRICH_WORKERS, cache=None):
+    """Fetch the detail pages that are due, concurrently, and store the fields of every page we have; returns pages fetched"""
+    if not targets:
+        return 0
+    cache = cache or DetailCache.load()
+    now = time.time()
+    due = [t for t in targets if cache.is_due(t.url, t.end_date, now)]
+    logger.info(f"Enriching {len(targets)} IPOs: {len(due)} detail pages due, {len(targets) - len(due)} cached")
+
+    semaphore = asyncio.Semaphore(max(1, workers))
+
+    async def enrich_one(client, target):
+        async with semaphore:
+            try:
+                html = await fetch(client, target.url)
+            except (httpx.HTTPError, OSError) as e:
+                logger.warning(f"Detail page for {target.name} failed: {e}")
+                return False
+        found = parse_detail_html(html)
+        if not any(value is not None for value in found.values()):
+            logger.warning(f"No details found on the page for {target.name} ({target.url})")
+        cache.store(target.url, found, now)
+        return True
+
+    if due:
+        async with httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            timeout=ENRICH_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=max(1, workers)),
+        ) as client:
+            fetched = sum(await asyncio.gather(*(enrich_one(client, t) for t in due)))
+        cache.save(now)
+    else:
+        fetched = 0
+
+    # A page that failed and was never cached has nothing to write; sending it would mark the IPO enriched
+    details = [{"id": t.ipo_id, "detail_url": t.url, **cache.values(t.url)} for t in targets if t.url in cache.entries]
+    updated = await repo.apply_ipo_details(details)
+    logger.info(f"Fetched {fetched}/{len(due)} detail pages, updated {updated} IPOs")
+    return fetched
+
+
+async def enrich_records(repo, records, **kwargs):
+    """Enrich the scraped IPOs that are in the database, using the links from the live table"""
+    linked = {(r.name, str(r.end_date)): r.detail_url for r in records if r.detail_url and r.end_date}
+    ids = await repo.ipos_by_keys(list(linked))
+    targets = [Target(ipo_id, linked[key], date.fromisoformat(key[1]), key[0]) for key, ipo_id in ids.items()]
+    return await enrich(repo, targets, **kwargs)
+
+
+async def enrich_tracked(repo, **kwargs):
+    """Enrich the open IPOs in the database that have a detail link"""
+    rows = await repo.ipos_to_enrich()
+    targets = [Target(row["id"], row["detail_url"], date.fromisoformat(row["end_date"]), row["name"])
+               for row in rows if row.get("detail_url")]
+    return await enrich(repo, targets, **kwargs)
+
+
+async def run(fetch, workers):
+    async with IpoRepository() as repo:
+        with stage("enrich.details"):
+            await enrich_tracked(repo, fetch=fetch, workers=workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch IPO detail pages and store their fields")
+    parser.add_argument("--fixtures", metavar="DIR", help="read detail pages from saved files instead of the site")
+    parser.add_argument("--workers", type=int, default=max(1, ENRICH_WORKERS),
+                        help="concurrent page fetches (default ENRICH_WORKERS, at least 1)")
+    parser.add_argument("--parse", metavar="FILE", help="print the fields parsed from one saved detail page and exit")
+    parser.add_argument("--profile", action="store_true", help="write CPU and memory profiles per stage (or PROFILE=1)")
+    args = parser.parse_args()
+
+    if args.parse:
+        with open(args.parse, encoding="utf-8") as f:
+            print(json.dumps(parse_detail_html(f.read()), indent=2))
+        return
+
+    profiling.configure("enrichment", args.profile)
+    logger.info("=== IPO Enrichment Started ===")
+    asyncio.run(run(fixture_fetcher(args.fixtures) if args.fixtures else fetch_page, args.workers))
+    log_summary()
+    logger.info("=== IPO Enrichment Finished ===")
+
+
+if __name__ == "__main__":
+    main()
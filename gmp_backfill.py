@@ -0,0 +1,457 @@
+"""
+Backfill historical GMP from investorgain's archived report pages.
+
+Our history starts the day ipo_tracker first saw an IPO. This crawler reads
+the yearly GMP report (BACKFILL_REPORT_URL, one page per year) for past
+IPOs and their detail links, then each IPO's page for its day-by-day GMP
+trend table. Archived names are resolved against the IPOs already stored
+for the same close date (name_index.NameMatcher with the known aliases),
+so a spelling the tracker saw differently extends that IPO's history
+instead of adding a second one. The samples are written through
+gmp_import.upsert_samples in chunks.
+
+    python gmp_backfill.py                          # every year still inside GMP retention
+    python gmp_backfill.py --years 2024 2025 --concurrency 2 --interval 2
+
+The crawler is polite and cheap to rerun:
+- at most BACKFILL_CONCURRENCY requests in flight, and at least
+  BACKFILL_HOST_INTERVAL seconds between requests to any one host
+- robots.txt is honoured, and 429/5xx answers are retried after Retry-After
+  or an exponential backoff
+- every response is kept in an on-disk cache under BACKFILL_CACHE_DIR.
+  Pages of IPOs that closed over a week ago are final and are never
+  requested again. Anything else is revalidated with If-None-Match /
+  If-Modified-Since, so an unchanged page costs a 304.
+- a checkpoint records every IPO whose samples are committed, so an
+  interrupted run resumes where it stopped (--restart ignores it)
+
+Offline run against the fixtures in TestData/backfill:
+
+    python gmp_backfill.py --serve-fixtures TestData/backfill --port 8765 &
+    BACKFILL_REPORT_URL=http://127.0.0.1:8765/report/{year}.html python gmp_backfill.py --years 2025
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import argparse
+import functools
+from collections import Counter
+from datetime import date, datetime, timedelta
+from email.utils import parsedate_to_datetime
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib import robotparser
+from urllib.parse import urlsplit
+import httpx
+import scraper
+import name_index
+import ipo_parser
+from cleanup import RETENTION_MONTHS, months_before
+from db import IpoRepository
+from gmp_import import CHUNK_SIZE, write_with_retry
+from read_api import notify_read_api
+from stages import stage, log_summary
+
+# Setup logging
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Site paths are configurable in case the archive moves
+REPORT_URL = os.getenv("BACKFILL_REPORT_URL", "https://www.investorgain.com/report/live-ipo-gmp/331/all/?year={year}")
+CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+HOST_INTERVAL = float(os.getenv("BACKFILL_HOST_INTERVAL", "1.0"))  # seconds between requests to one host
+USER_AGENT = os.getenv("BACKFILL_USER_AGENT", "ipo-gmp-tracker-backfill/1.0 (historical GMP, low rate)")
+CACHE_DIR = os.getenv("BACKFILL_CACHE_DIR", os.path.join(scraper.CACHE_DIR, "backfill"))
+CHECKPOINT_FILE = os.path.join(CACHE_DIR, "checkpoint.json")
+REQUEST_TIMEOUT = 20.0
+MAX_RETRIES = 3
+BACKOFF_MAX = 60.0
+REPORT_MAX_AGE = 24 * 3600  # seconds before a cached report page is revalidated
+SETTLED_AFTER = timedelta(days=7)  # an IPO's GMP trend is final this long after it closes
+
+
+# ---------------- RESPONSE CACHE ----------------
+
+class ResponseCache:
+    """One JSON file per URL: body plus the validators for conditional requests"""
+
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = os.path.join(directory, "pages")
+
+    def path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode()).hexdigest() + ".json")
+
+    def get(self, url):
+        try:
+            with open(self.path(url), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, body, headers):
+        entry = {
+            "url": url,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "fetched_at": time.time(),
+            "body": body,
+        }
+        self._write(url, entry)
+        return entry
+
+    def touch(self, entry):
+        """A 304 revalidated the cached body"""
+        entry["fetched_at"] = time.time()
+        self._write(entry["url"], entry)
+
+    def _write(self, url, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(url)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+
+# ---------------- CRAWLER ----------------
+
+class HostLimiter:
+    """Spaces requests to the same host at least `interval` seconds apart"""
+
+    def __init__(self, interval=HOST_INTERVAL):
+        self.interval = interval
+        self.locks = {}
+        self.next_slot = {}
+
+    async def wait(self, host):
+        async with self.locks.setdefault(host, asyncio.Lock()):
+            delay = self.next_slot.get(host, 0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.next_slot[host] = time.monotonic() + self.interval
+
+
+def retry_after(response, attempt):
+    """Seconds to wait before retrying a 429/5xx answer"""
+    value = response.headers.get("retry-after") if response is not None else None
+    if value:
+        try:
+            return min(BACKOFF_MAX, float(value))
+        except ValueError:
+            try:
+                return min(BACKOFF_MAX, max(0.0, parsedate_to_datetime(value).timestamp() - time.time()))
+            except (TypeError, ValueError):
+                pass
+    return min(BACKOFF_MAX, 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+class Crawler:
+    """Cached, conditional, rate-limited GETs with bounded concurrency"""
+
+    def __init__(self, client, cache=None, concurrency=CONCURRENCY, interval=HOST_INTERVAL):
+        self.client = client
+        self.cache = cache or ResponseCache()
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.limiter = HostLimiter(interval)
+        self.robots = {}
+        self.robots_locks = {}
+        self.stats = Counter()
+
+    async def request(self, url, headers=None):
+        async with self.semaphore:
+            await self.limiter.wait(urlsplit(url).netloc)
+            self.stats["requests"] += 1
+            return await self.client.get(url, headers=headers)
+
+    async def allowed(self, url):
+        """robots.txt check, fetched once per host; an unreachable robots.txt allows everything"""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        async with self.robots_locks.setdefault(host, asyncio.Lock()):
+            if host not in self.robots:
+                rules = robotparser.RobotFileParser()
+                try:
+                    response = await self.request(f"{host}/robots.txt")
+                    rules.parse(response.text.splitlines() if response.status_code == 200 else [])
+                except httpx.HTTPError as e:
+                    logger.warning(f"Could not read {host}/robots.txt ({e}) - assuming allowed")
+                    rules.parse([])
+                self.robots[host] = rules
+        return self.robots[host].can_fetch(USER_AGENT, url)
+
+    async def fetch(self, url, max_age=None):
+        """
+        Page body, or None if it cannot be had. A cached copy younger than
+        `max_age` seconds (any age when None) is returned without a request.
+        """
+        entry = self.cache.get(url)
+        if entry and (max_age is None or time.time() - entry["fetched_at"] < max_age):
+            self.stats["cached"] += 1
+            return entry["body"]
+        if not await self.allowed(url):
+            logger.warning(f"robots.txt disallows {url}")
+            self.stats["disallowed"] += 1
+            return None
+
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        for attempt in range(1, MAX_RETRIES + 1):
+            response = None
+            try:
+                response = await self.request(url, headers)
+            except httpx.HTTPError as e:
+                logger.warning(f"GET {url} failed (attempt {attempt}): {e}")
+            else:
+                if response.status_code == 304 and entry:
+                    self.stats["not_modified"] += 1
+                    self.cache.touch(entry)
+                    return entry["body"]
+                if response.status_code == 200:
+                    self.stats["downloaded"] += 1
+                    return self.cache.put(url, response.text, response.headers)["body"]
+                if response.status_code != 429 and response.status_code < 500:
+                    logger.warning(f"GET {url} returned {response.status_code}")
+                    break
+                logger.warning(f"GET {url} returned {response.status_code} (attempt {attempt})")
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(retry_after(response, attempt))
+
+        self.stats["failed"] += 1
+        if entry:
+            logger.warning(f"Using cached copy of {url} from {datetime.fromtimestamp(entry['fetched_at']):%Y-%m-%d}")
+            return entry["body"]
+        return None
+
+
+# ---------------- PARSING ----------------
+
+def parse_report(html, year, url):
+    """IPO rows of one yearly report page; 'DD-Mon' dates are read in that year"""
+    records = ipo_parser.parse_table_html(html, date(year, 7, 1), base_url=url)
+    return [record for record in records if record.end_date]
+
+
+def trend_date(text, end_date):
+    return ipo_parser.parse_full_date(text) or ipo_parser.parse_date(text, end_date)
+
+
+def parse_trend(html, record):
+    """(day, GMP %) rows of an IPO page's GMP trend table, any row starting with a date"""
+    samples = {}
+    for cells in ipo_parser.table_rows(html):
+        day = trend_date(cells[0], record.end_date) if cells else None
+        if day is None:
+            continue
+        gmp = next((ipo_parser.parse_gmp(cell) for cell in cells[1:] if ipo_parser.GMP_PATTERN.search(cell)), None)
+        if gmp is not None:
+            samples.setdefault(day, gmp)  # the table lists the latest update of a day first
+    return sorted(samples.items())
+
+
+def to_samples(record, trend, name=None):
+    """gmp_import sample dicts (under the stored IPO's `name` if given); without a trend table the report's final GMP is dated on the close"""
+    base = {
+        "name": name or record.name,
+        "price": record.price_text or None,
+        "subscription": record.subscription_text or None,
+        "start_date": record.start_date,
+        "end_date": record.end_date,
+    }
+    trend = trend or [(record.end_date, record.gmp)]
+    return [{**base, "gmp": gmp, "recorded_at": day} for day, gmp in trend]
+
+
+def record_key(record):
+    return record.detail_url or f"{record.name}|{record.end_date}"
+
+
+# ---------------- CHECKPOINT ----------------
+
+def load_checkpoint():
+    try:
+        with open(CHECKPOINT_FILE, encoding="utf-8") as f:
+            return set(json.load(f)["done"])
+    except (OSError, ValueError, KeyError):
+        return set()
+
+
+def save_checkpoint(done):
+    os.makedirs(os.path.dirname(CHECKPOINT_FILE), exist_ok=True)
+    tmp = CHECKPOINT_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"done": sorted(done)}, f)
+    os.replace(tmp, CHECKPOINT_FILE)
+
+
+# ---------------- RUN ----------------
+
+async def crawl_reports(crawler, years, since):
+    """Past IPOs from the yearly reports, closed on or after `since`, each once"""
+    urls = {year: REPORT_URL.format(year=year) for year in years}
+    pages = await asyncio.gather(*(crawler.fetch(url, REPORT_MAX_AGE) for url in urls.values()))
+    records = {}
+    for (year, url), html in zip(urls.items(), pages):
+        if html is None:
+            logger.error(f"No report page for {year} ({url})")
+            continue
+        found = parse_report(html, year, url)
+        logger.info(f"{year}: {len(found)} IPOs in the report")
+        for record in found:
+            if record.end_date >= since:
+                records.setdefault((record.name, record.end_date), record)
+    return list(records.values())
+
+
+async def resolve_names(repo, records, batch_size=100):
+    """
+    {(archived name, end_date): stored name} for records that match an IPO
+    already in the database closing the same day; new spellings are saved
+    as aliases
+    """
+    end_dates = sorted({str(record.end_date) for record in records})
+    pages = await asyncio.gather(*(repo.ipos_ending_on(end_dates[i:i + batch_size])
+                                   for i in range(0, len(end_dates), batch_size)))
+    stored = [ipo for rows in pages for ipo in rows]
+    ids = [ipo['id'] for ipo in stored]
+    pages = await asyncio.gather(*(repo.ipo_aliases(ids[i:i + batch_size]) for i in range(0, len(ids), batch_size)))
+    aliases = [alias for rows in pages for alias in rows]
+
+    by_date, aliases_by_date = {}, {}
+    for ipo in stored:
+        by_date.setdefault(ipo['end_date'], []).append(ipo)
+    names = {ipo['id']: ipo['name'] for ipo in stored}
+    days = {ipo['id']: ipo['end_date'] for ipo in stored}
+    for alias in aliases:
+        aliases_by_date.setdefault(days[alias['ipo_id']], []).append(alias)
+
+    resolved, new_aliases, matchers = {}, {}, {}
+    for record in records:
+        day = str(record.end_date)
+        if day not in by_date:
+            continue
+        # One matcher per close date: names are only compared with IPOs closing the same day
+        if day not in matchers:
+            matchers[day] = name_index.NameMatcher(by_date[day], aliases_by_date.get(day, ()))
+        ipo_id, how = matchers[day].match(record.name)
+        if ipo_id is None:
+            continue
+        resolved[(record.name, record.end_date)] = names[ipo_id]
+        if how == "fuzzy":
+            logger.info(f"Matched archived '{record.name}' to stored IPO '{names[ipo_id]}' (fuzzy)")
+    for matcher in matchers.values():
+        new_aliases.update(matcher.new_aliases)
+    await repo.add_aliases(new_aliases)
+    logger.info(f"{len(resolved)}/{len(records)} archived IPOs matched stored ones, {len(new_aliases)} new aliases")
+    return resolved
+
+
+async def backfill(repo, crawler, years, since, chunk_size=CHUNK_SIZE, restart=False, today=None):
+    """Crawl and write every IPO not in the checkpoint; returns samples written"""
+    today = today or date.today()
+    done = set() if restart else load_checkpoint()
+
+    with stage("backfill.reports"):
+        records = await crawl_reports(crawler, years, since)
+    pending = [record for record in records if record_key(record) not in done]
+    logger.info(f"{len(pending)} IPOs to backfill ({len(records) - len(pending)} already done)")
+    with stage("backfill.match"):
+        names = await resolve_names(repo, pending)
+
+    async def crawl_trend(record):
+        if not record.detail_url:
+            return record, []
+        settled = record.end_date <= today - SETTLED_AFTER
+        html = await crawler.fetch(record.detail_url, None if settled else 0)
+        return record, (parse_trend(html, record) if html is not None else None)
+
+    written = failed = 0
+    chunk, keys = [], []
+
+    async def flush():
+        nonlocal written, chunk, keys
+        written += await write_with_retry(repo, chunk)
+        done.update(keys)
+        save_checkpoint(done)
+        chunk, keys = [], []
+        logger.info(f"{len(done)} IPOs done, {written} samples written ({dict(crawler.stats)})")
+
+    with stage("backfill.trends"):
+        # Pages are written as they arrive; the crawler bounds what is in flight
+        for next_done in asyncio.as_completed([crawl_trend(record) for record in pending]):
+            record, trend = await next_done
+            if trend is None:
+                # Left out of the checkpoint so the next run tries again
+                failed += 1
+                continue
+            chunk.extend(to_samples(record, trend, names.get((record.name, record.end_date))))
+            keys.append(record_key(record))
+            if len(chunk) >= chunk_size:
+                await flush()
+        if chunk:
+            await flush()
+
+    logger.info(f"Backfill finished: {written} samples for {len(pending) - failed} IPOs, "
+                f"{failed} pages failed ({dict(crawler.stats)})")
+    return written
+
+
+async def run(years, since, chunk_size, restart, concurrency, interval):
+    async with httpx.AsyncClient(
+        headers={"User-Agent": USER_AGENT},
+        timeout=REQUEST_TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=max(1, concurrency)),
+    ) as client, IpoRepository() as repo:
+        crawler = Crawler(client, concurrency=concurrency, interval=interval)
+        written = await backfill(repo, crawler, years, since, chunk_size, restart)
+    if written:
+        await notify_read_api()
+
+
+def serve_fixtures(directory, port):
+    """Serve saved pages over HTTP (with Last-Modified / 304 support) for offline runs"""
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    logger.info(f"Serving {directory} on http://127.0.0.1:{port}/")
+    server.serve_forever()
+
+
+def main():
+    today = date.today()
+    retain_from = months_before(today, RETENTION_MONTHS)
+
+    parser = argparse.ArgumentParser(description="Backfill historical GMP from archived report pages")
+    parser.add_argument("--years", type=int, nargs="+", help="report years to crawl (default: every year since --since)")
+    parser.add_argument("--since", type=date.fromisoformat, default=retain_from,
+                        help=f"skip IPOs that closed before this date (default: retention start, {retain_from})")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="requests in flight")
+    parser.add_argument("--interval", type=float, default=HOST_INTERVAL, help="seconds between requests to one host")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and write every IPO again")
+    parser.add_argument("--serve-fixtures", metavar="DIR", help="serve DIR over HTTP instead of crawling")
+    parser.add_argument("--port", type=int, default=8765, help="port for --serve-fixtures")
+    args = parser.parse_args()
+
+    if args.serve_fixtures:
+        serve_fixtures(args.serve_fixtures, args.port)
+        return
+
+    years = args.years or list(range(args.since.year, today.year + 1))
+    logger.info(f"=== GMP Backfill Started ({years}) ===")
+    asyncio.run(run(years, args.since, args.chunk_size, args.restart, args.concurrency, args.interval))
+    log_summary()
+    logger.info("=== GMP Backfill Finished ===")
+
+
+if __name__ == "__main__":
+    main()
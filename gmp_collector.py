@@ -1,13 +1,16 @@
-import os
-import re
+import asyncio
 import logging
+import argparse
 from datetime import datetime
-from supabase import create_client, Client
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
+import scraper
+import profiling
+import gmp_watch
+import name_index
+import notifiers
+import alert_templates
+from db import IpoRepository
+from read_api import notify_read_api
+from stages import stage, log_summary
 
 # Setup logging
 logging.basicConfig(
@@ -16,110 +19,113 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Supabase config
-SUPABASE_URL = os.getenv("SUPABASE_URL", "https://ofcngucvrrmzvihjgjvz.supabase.co")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Preferred match when several scraped rows resolve to the same IPO
+MATCH_RANK = {"alias": 0, "key": 1, "fuzzy": 2}
 
-def get_supabase() -> Client:
-    """Get Supabase client"""
-    if not SUPABASE_KEY:
-        raise ValueError("SUPABASE_KEY environment variable not set!")
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+async def send_move_alerts(moves):
+    """One Telegram alert per GMP move, all through one HTTP client"""
+    if not moves:
+        return
+    async with notifiers.open_client() as client:
+        await asyncio.gather(*(
+            notifiers.dispatch(["telegram"], notifiers.Alert(alert_templates.render_move(move)), f"{move.name} move", client)
+            for move in moves
+        ))
 
 
 def scrape_current_gmps():
-    """Scrape current GMP values for all IPOs"""
+    """Scrape current GMP values for all IPOs (None if only stale data is available)"""
     logger.info("Scraping current GMP values")
+    result = scraper.scrape_ipo_records()
 
-    options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-
-    driver = webdriver.Chrome(options=options)
-    wait = WebDriverWait(driver, 30)
-
-    try:
-        driver.get("https://www.investorgain.com/report/live-ipo-gmp/331/all/")
-        table = wait.until(EC.presence_of_element_located((By.ID, "report_table")))
-        rows = table.find_elements(By.TAG_NAME, "tr")
-
-        gmp_data = {}
-
-        for row in rows[1:]:
-            cols = row.find_elements(By.TAG_NAME, "td")
-            if len(cols) > 8:
-                name = cols[0].text.strip()
-                gmp_text = cols[1].text.strip()
-
-                # Extract GMP percentage
-                match = re.search(r"\(([\d\.]+)%\)", gmp_text)
-                gmp_value = float(match.group(1)) if match else 0
-
-                gmp_data[name] = gmp_value
-
-    finally:
-        driver.quit()
+    if result.stale:
+        logger.warning(f"Only stale GMP data available (from {result.fetched_at}) - not recording")
+        return None
 
+    gmp_data = {record.name: record.gmp for record in result}
     logger.info(f"Collected GMP for {len(gmp_data)} IPOs")
     return gmp_data
 
 
-def collect_daily_gmps():
+async def collect_daily_gmps(repo, today=None, current_gmps=None):
     """Collect daily GMP for all tracked IPOs"""
-    supabase = get_supabase()
-    today = str(datetime.today().date())
+    today = str(today or datetime.today().date())
     
     # Get all tracking IPOs
-    result = supabase.table('ipos').select('id, name').eq('status', 'tracking').execute()
+    with stage("collector.load"):
+        tracked = await repo.tracked_ipos()
     
-    if not result.data:
+    if not tracked:
         logger.info("No IPOs currently being tracked")
-        return
+        return 0
+    
+    ids = [ipo['id'] for ipo in tracked]
+    logger.info(f"Found {len(tracked)} IPOs to track")
+    
+    # Scrape current GMPs while the known aliases load
+    with stage("collector.scrape"):
+        if current_gmps is None:
+            current_gmps, aliases = await asyncio.gather(asyncio.to_thread(scrape_current_gmps), repo.ipo_aliases(ids))
+        else:
+            aliases = await repo.ipo_aliases(ids)
+    if current_gmps is None:
+        return 0
     
-    tracked_ipos = {ipo['name']: ipo['id'] for ipo in result.data}
-    logger.info(f"Found {len(tracked_ipos)} IPOs to track")
+    # Match every scraped row to a tracked IPO - a renamed row still resolves
+    names = {ipo['id']: ipo['name'] for ipo in tracked}
+    matcher = name_index.NameMatcher(tracked, [a for a in aliases if a['ipo_id'] in names])
+    matched = {}
+    for scraped_name, gmp in current_gmps.items():
+        ipo_id, how = matcher.match(scraped_name)
+        if ipo_id is None:
+            continue
+        rank = MATCH_RANK[how]
+        if ipo_id not in matched or rank < matched[ipo_id][0]:
+            matched[ipo_id] = (rank, gmp, scraped_name)
+        if how == "fuzzy":
+            logger.info(f"Matched '{scraped_name}' to tracked IPO '{names[ipo_id]}' (fuzzy)")
     
-    # Scrape current GMPs
-    current_gmps = scrape_current_gmps()
+    # Large swings alert right away instead of waiting for the closing windows; keyed by
+    # IPO so a renamed row keeps its baseline
+    with stage("collector.watch"):
+        snapshot = {ipo_id: gmp for ipo_id, (_, gmp, _) in matched.items()}
+        moves = await asyncio.to_thread(gmp_watch.watch_snapshot, snapshot, names)
+        await send_move_alerts(moves)
     
-    # Record GMP for each tracked IPO
-    recorded_count = 0
-    for name, ipo_id in tracked_ipos.items():
-        if name in current_gmps:
-            try:
-                # Check if already recorded today
-                existing = supabase.table('gmp_history').select('id').eq('ipo_id', ipo_id).eq('recorded_at', today).execute()
-                
-                if not existing.data:
-                    supabase.table('gmp_history').insert({
-                        'ipo_id': ipo_id,
-                        'gmp': current_gmps[name],
-                        'recorded_at': today
-                    }).execute()
-                    logger.info(f"Recorded GMP {current_gmps[name]}% for {name}")
-                    recorded_count += 1
-                else:
-                    # Update existing record
-                    supabase.table('gmp_history').update({
-                        'gmp': current_gmps[name]
-                    }).eq('ipo_id', ipo_id).eq('recorded_at', today).execute()
-                    logger.info(f"Updated GMP {current_gmps[name]}% for {name}")
-                    
-            except Exception as e:
-                logger.error(f"Error recording GMP for {name}: {e}")
+    # Record GMP for each tracked IPO - today's sample is inserted or overwritten
+    rows = []
+    for ipo_id, name in names.items():
+        if ipo_id in matched:
+            _, gmp, _ = matched[ipo_id]
+            rows.append({'ipo_id': ipo_id, 'gmp': gmp, 'recorded_at': today})
+            logger.info(f"Recording GMP {gmp}% for {name}")
         else:
             logger.warning(f"GMP not found for tracked IPO: {name}")
     
-    logger.info(f"Recorded GMP for {recorded_count} IPOs")
+    with stage("collector.store"):
+        await asyncio.gather(repo.upsert_gmp(rows), repo.add_aliases(matcher.new_aliases))
+    
+    logger.info(f"Recorded GMP for {len(rows)} IPOs")
+    return len(rows)
+
+
+async def run():
+    async with IpoRepository() as repo:
+        if await collect_daily_gmps(repo):
+            await notify_read_api()
 
 
 def main():
     """Main function to collect daily GMPs"""
+    parser = argparse.ArgumentParser(description="Record today's GMP for tracked IPOs")
+    parser.add_argument("--profile", action="store_true", help="write CPU and memory profiles per stage (or PROFILE=1)")
+    args = parser.parse_args()
+    profiling.configure("gmp_collector", args.profile)
+
     logger.info("=== GMP Collector Started ===")
-    collect_daily_gmps()
+    asyncio.run(run())
+    log_summary()
     logger.info("=== GMP Collector Finished ===")
 
 
@@ -0,0 +1,279 @@
+"""
+Bulk import of historical GMP from spreadsheets or CSV files.
+
+    python gmp_import.py TestData/IPO_GMP.xlsx
+    python gmp_import.py history.csv --chunk-size 1000 --year 2024
+
+Rows are streamed (openpyxl read-only mode for .xlsx, csv.reader for .csv),
+normalised with the shared ipo_parser rules and written in chunks: one
+insert for the chunk's IPOs, one lookup of their ids and one upsert of the
+GMP samples. A checkpoint next to the source file records how many rows are
+committed, so a rerun after a failure resumes where it stopped; upserts are
+idempotent, so replaying a partly written chunk is harmless.
+
+Expected columns (header names are matched case-insensitively):
+IPO Name, GMP, Start Date, End Date, Subscription, [Price], [Recorded At]
+Without a Recorded At column, the sample is dated on the IPO's end date.
+"""
+import os
+import csv
+import json
+import time
+import asyncio
+import logging
+import argparse
+from datetime import date, datetime
+import ipo_parser
+from db import IpoRepository, DatabaseError
+from read_api import notify_read_api
+
+# Setup logging
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+MAX_RETRIES = 3
+
+# Header text -> field name
+HEADERS = {
+    "ipo name": "name",
+    "name": "name",
+    "ipo": "name",
+    "gmp": "gmp",
+    "start date": "start_date",
+    "open date": "start_date",
+    "end date": "end_date",
+    "close date": "end_date",
+    "subscription": "subscription",
+    "price": "price",
+    "recorded at": "recorded_at",
+    "date": "recorded_at",
+    "gmp date": "recorded_at",
+}
+
+
+# ---------------- READERS ----------------
+
+def read_xlsx(path):
+    """Yield each row of the first worksheet as a tuple of cell values"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.reader(f)
+
+
+def read_rows(path):
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        return read_xlsx(path)
+    return read_csv(path)
+
+
+# ---------------- NORMALISATION ----------------
+
+def to_date(value, year=None):
+    """Cell value -> date, using `year` for 'DD-Mon' texts without one"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value)
+    parsed = ipo_parser.parse_full_date(text)
+    if parsed is None and year:
+        parsed = ipo_parser.parse_date(text, date(year, 7, 1))
+    return parsed
+
+
+def to_gmp(value):
+    """Cell value -> GMP percent ('₹20 (14.81%)', '14.81%', 14.81)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value or "")
+    if ipo_parser.GMP_PATTERN.search(text):
+        return ipo_parser.parse_gmp(text)
+    number = ipo_parser.parse_number(text)
+    if number is None:
+        return None
+    return -number if text.strip().startswith("-") else number
+
+
+def normalize_row(columns, row, year=None):
+    """Map a raw row to a sample dict, or None if it lacks a name, end date or GMP"""
+    values = {field: row[i] if i < len(row) else None for i, field in columns.items()}
+    name = ipo_parser.clean_name(str(values.get("name") or ""))
+    end_date = to_date(values.get("end_date"), year)
+    gmp = to_gmp(values.get("gmp"))
+    if not name or not end_date or gmp is None:
+        return None
+
+    return {
+        "name": name,
+        "price": str(values["price"]) if values.get("price") is not None else None,
+        "subscription": str(values["subscription"]) if values.get("subscription") is not None else None,
+        "start_date": to_date(values.get("start_date"), year),
+        "end_date": end_date,
+        "gmp": gmp,
+        "recorded_at": to_date(values.get("recorded_at"), year) or end_date,
+    }
+
+
+def map_header(header):
+    columns = {}
+    for i, cell in enumerate(header):
+        field = HEADERS.get(str(cell or "").strip().lower())
+        if field and field not in columns.values():
+            columns[i] = field
+    missing = {"name", "gmp", "end_date"} - set(columns.values())
+    if missing:
+        raise ValueError(f"Missing required columns: {sorted(missing)}")
+    return columns
+
+
+# ---------------- WRITER ----------------
+
+async def upsert_samples(repo, samples, today=None):
+    """Write a chunk of normalised samples: IPOs first, then their GMP history"""
+    today = today or date.today()
+
+    ipos = {}
+    for s in samples:
+        key = (s["name"], str(s["end_date"]))
+        if key not in ipos:
+            ipos[key] = {
+                "name": s["name"],
+                "price": s["price"],
+                "subscription": s["subscription"],
+                "start_date": str(s["start_date"]) if s["start_date"] else None,
+                "end_date": str(s["end_date"]),
+                "status": "expired" if s["end_date"] < today else "tracking",
+            }
+
+    await repo.insert_ipos(list(ipos.values()))
+    ids = await repo.ipos_by_keys(list(ipos))
+
+    # Last value wins when a chunk holds the same IPO and day twice
+    history = {}
+    for s in samples:
+        ipo_id = ids.get((s["name"], str(s["end_date"])))
+        if ipo_id:
+            history[(ipo_id, str(s["recorded_at"]))] = {"ipo_id": ipo_id, "gmp": s["gmp"], "recorded_at": str(s["recorded_at"])}
+    if history:
+        # Old samples get their own monthly partitions instead of piling up in the default one
+        days = [row["recorded_at"] for row in history.values()]
+        await repo.create_gmp_partitions(min(days), max(days))
+    await repo.upsert_gmp(list(history.values()))
+    return len(history)
+
+
+async def write_with_retry(repo, chunk):
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            return await upsert_samples(repo, chunk)
+        except (DatabaseError, OSError) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            logger.warning(f"Chunk write failed (attempt {attempt}): {e} - retrying")
+            await asyncio.sleep(2 ** attempt)
+
+
+# ---------------- CHECKPOINT ----------------
+
+def checkpoint_path(path):
+    return path + ".import.json"
+
+
+def load_checkpoint(path):
+    """Rows already committed for this exact source file"""
+    try:
+        with open(checkpoint_path(path), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    stat = os.stat(path)
+    if data.get("size") != stat.st_size or data.get("mtime") != stat.st_mtime:
+        logger.info("Source file changed since last checkpoint - starting over")
+        return 0
+    return data.get("rows_done", 0)
+
+
+def save_checkpoint(path, rows_done):
+    stat = os.stat(path)
+    with open(checkpoint_path(path), "w", encoding="utf-8") as f:
+        json.dump({"size": stat.st_size, "mtime": stat.st_mtime, "rows_done": rows_done}, f)
+
+
+# ---------------- RUN ----------------
+
+async def import_file(path, chunk_size=CHUNK_SIZE, year=None, restart=False):
+    rows_done = 0 if restart else load_checkpoint(path)
+    if rows_done:
+        logger.info(f"Resuming {path} after {rows_done} committed rows")
+
+    rows = read_rows(path)
+    columns = map_header(next(rows))
+
+    started = time.perf_counter()
+    row_number = 0
+    written = skipped = 0
+    chunk = []
+
+    async with IpoRepository() as repo:
+
+        async def flush():
+            nonlocal written, chunk
+            written += await write_with_retry(repo, chunk)
+            chunk = []
+            save_checkpoint(path, row_number)
+            elapsed = time.perf_counter() - started
+            logger.info(f"{row_number} rows read, {written} samples written ({written / elapsed:.0f} samples/s)")
+
+        for row in rows:
+            row_number += 1
+            if row_number <= rows_done:
+                continue
+            sample = normalize_row(columns, row, year)
+            if sample is None:
+                skipped += 1
+                continue
+            chunk.append(sample)
+            if len(chunk) >= chunk_size:
+                await flush()
+
+        if chunk:
+            await flush()
+        else:
+            save_checkpoint(path, row_number)
+
+    if written:
+        await notify_read_api()
+    elapsed = time.perf_counter() - started
+    logger.info(f"Import finished: {written} samples from {row_number - rows_done} rows in {elapsed:.1f}s ({skipped} rows skipped)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import historical GMP from .xlsx or .csv files")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--year", type=int, help="year for dates written without one (e.g. '21-Jan')")
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints and import from the first row")
+    args = parser.parse_args()
+
+    for path in args.files:
+        asyncio.run(import_file(path, args.chunk_size, args.year, args.restart))
+
+
+if __name__ == "__main__":
+    main()
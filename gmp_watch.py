@@ -0,0 +1,164 @@
+"""
+Streaming detector for large GMP moves between snapshots.
+
+Every scrape is fed in as {ipo_id: gmp}, after the scraped names have been
+matched to tracked IPOs, so a renamed row keeps its state; each IPO keeps a
+few numbers of rolling state, so a snapshot costs O(1) per IPO and history
+is never re-read. A move is measured against a slow EWMA baseline:
+
+- it counts as crossed when it reaches GMP_MOVE_ABS points or GMP_MOVE_REL
+  of the baseline (either one; 0 disables it)
+- it must stay crossed for GMP_MOVE_DEBOUNCE consecutive snapshots before
+  an alert fires, and GMP_MOVE_COOLDOWN seconds must separate alerts. The
+  debounce is meant for frequent polling (the daemon); a snapshot taken
+  GMP_MOVE_DEBOUNCE_WINDOW seconds or more after the previous one confirms
+  the move on its own, so the twice-daily cron alerts on the run that sees
+  it instead of one run (up to 16h) later
+- a pending move is only dropped once it falls back inside the hysteresis
+  band (below (1 - GMP_MOVE_HYSTERESIS) of the threshold), so a value
+  hovering at the threshold does not flap
+- after an alert the baseline jumps to the new level; the next alert needs
+  another full move from there
+
+State is persisted in .cache/gmp_watch.json between runs.
+"""
+import os
+import json
+import time
+import logging
+from dataclasses import dataclass
+import scraper
+
+logger = logging.getLogger(__name__)
+
+MOVE_ABS = float(os.getenv("GMP_MOVE_ABS", "10"))        # percentage points
+MOVE_REL = float(os.getenv("GMP_MOVE_REL", "0.5"))       # fraction of the baseline
+HYSTERESIS = float(os.getenv("GMP_MOVE_HYSTERESIS", "0.3"))
+DEBOUNCE = int(os.getenv("GMP_MOVE_DEBOUNCE", "2"))      # consecutive snapshots
+DEBOUNCE_WINDOW = float(os.getenv("GMP_MOVE_DEBOUNCE_WINDOW", str(2 * 60 * 60)))  # seconds; a wider gap skips the debounce
+COOLDOWN = float(os.getenv("GMP_MOVE_COOLDOWN", str(60 * 60)))
+EWMA_ALPHA = float(os.getenv("GMP_MOVE_ALPHA", "0.3"))
+REL_FLOOR = 5.0  # relative moves are measured against at least a 5% baseline, so 0.8 -> 3% is not a 275% move
+
+STATE_FILE = os.path.join(scraper.CACHE_DIR, "gmp_watch.json")
+
+
+@dataclass(slots=True)
+class MoveState:
+    last: float
+    baseline: float
+    pending: int = 0
+    direction: int = 0
+    alerted_at: float = 0.0
+    seen_at: float = 0.0
+
+
+@dataclass(slots=True)
+class GmpMove:
+    name: str
+    baseline: float
+    last: float
+    value: float
+
+    @property
+    def change(self):
+        return self.value - self.baseline
+
+
+class GmpMoveDetector:
+    """Per-IPO rolling state and the move/debounce/hysteresis rules"""
+
+    def __init__(self, states=None, abs_threshold=MOVE_ABS, rel_threshold=MOVE_REL,
+                 hysteresis=HYSTERESIS, debounce=DEBOUNCE, cooldown=COOLDOWN, alpha=EWMA_ALPHA,
+                 debounce_window=DEBOUNCE_WINDOW):
+        self.states = states or {}
+        self.abs_threshold = abs_threshold
+        self.rel_threshold = rel_threshold
+        self.hysteresis = hysteresis
+        self.debounce = debounce
+        self.debounce_window = debounce_window
+        self.cooldown = cooldown
+        self.alpha = alpha
+
+    def level(self, move, baseline):
+        """How far a move is towards the threshold (>= 1 means crossed)"""
+        levels = []
+        if self.abs_threshold:
+            levels.append(abs(move) / self.abs_threshold)
+        if self.rel_threshold:
+            levels.append(abs(move) / max(abs(baseline), REL_FLOOR) / self.rel_threshold)
+        return max(levels, default=0.0)
+
+    def update(self, key, value, now=None, name=None):
+        """Feed one sample for IPO `key`; returns a GmpMove (labelled `name`) when an alert should fire"""
+        now = now or time.time()
+        state = self.states.get(key)
+        if state is None:
+            self.states[key] = MoveState(last=value, baseline=value, seen_at=now)
+            return None
+
+        move = value - state.baseline
+        level = self.level(move, state.baseline)
+        alert = None
+        if level >= 1:
+            direction = 1 if move > 0 else -1
+            if direction != state.direction:
+                state.pending = 0
+            state.direction = direction
+            state.pending += 1
+            # A sparse run has nothing to debounce against, so its sample stands on its own
+            confirmed = state.pending >= self.debounce or now - state.seen_at >= self.debounce_window
+            # Baseline is frozen while a move is pending so it is not averaged away
+            if confirmed and now - state.alerted_at >= self.cooldown:
+                alert = GmpMove(name or key, state.baseline, state.last, value)
+                state.baseline = value
+                state.pending = 0
+                state.alerted_at = now
+        elif level < 1 - self.hysteresis:
+            state.pending = 0
+            state.baseline += self.alpha * (value - state.baseline)
+        state.last = value
+        state.seen_at = now
+        return alert
+
+    def observe(self, snapshot, now=None, names=None):
+        """Feed a whole {ipo_id: gmp} snapshot, `names` giving display names; IPOs no longer listed are forgotten"""
+        now = now or time.time()
+        names = names or {}
+        moves = [move for key, gmp in snapshot.items() if (move := self.update(key, gmp, now, names.get(key)))]
+        for key in self.states.keys() - snapshot.keys():
+            del self.states[key]
+        return moves
+
+    def to_dict(self):
+        return {key: [s.last, s.baseline, s.pending, s.direction, s.alerted_at, s.seen_at] for key, s in self.states.items()}
+
+    @classmethod
+    def from_dict(cls, data, **options):
+        return cls({key: MoveState(*values) for key, values in data.items()}, **options)
+
+
+def load_detector():
+    try:
+        with open(STATE_FILE, encoding="utf-8") as f:
+            return GmpMoveDetector.from_dict(json.load(f))
+    except (OSError, ValueError, TypeError):
+        return GmpMoveDetector()
+
+
+def save_detector(detector):
+    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
+    tmp = STATE_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(detector.to_dict(), f)
+    os.replace(tmp, STATE_FILE)
+
+
+def watch_snapshot(snapshot, names=None):
+    """Run one {ipo_id: gmp} snapshot through the persisted detector; returns the moves to alert on"""
+    detector = load_detector()
+    moves = detector.observe(snapshot, names=names)
+    save_detector(detector)
+    for move in moves:
+        logger.info(f"GMP move for {move.name}: {move.baseline:.2f}% -> {move.value:.2f}%")
+    return moves
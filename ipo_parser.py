@@ -0,0 +1,214 @@
+"""
+Shared parsing for investorgain's live IPO GMP table.
+
+All scrapers turn a table row into a list of cell texts and hand it to
+parse_row(), which returns a compact IpoRecord with numeric GMP, price and
+subscription values alongside the raw texts shown to users.
+"""
+import re
+from urllib.parse import urljoin
+from html.parser import HTMLParser
+from dataclasses import dataclass, asdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+GMP_PATTERN = re.compile(r"\((-?[\d\.]+)%\)")
+DATE_PATTERN = re.compile(r"\d{1,2}-[A-Za-z]{3}")
+NUMBER_PATTERN = re.compile(r"\d[\d,]*(?:\.\d+)?")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Column positions in the report table
+COL_NAME = 0
+COL_GMP = 1
+COL_PRICE = 2
+COL_SUBSCRIPTION = 3
+COL_START = 7
+COL_END = 8
+
+# Formats accepted for dates that include the year (imports, archives)
+FULL_DATE_FORMATS = ("%Y-%m-%d", "%d-%b-%Y", "%d-%b-%y", "%d-%m-%Y", "%d/%m/%Y", "%d %b %Y",
+                     "%a, %b %d, %Y", "%b %d, %Y")
+
+# Dates are shown without a year; anything further than this from today
+# belongs to the neighbouring year (e.g. "02-Jan" scraped on 28-Dec)
+ROLLOVER_DAYS = 180
+
+
+@dataclass(slots=True)
+class IpoRecord:
+    """One row of the live IPO GMP table"""
+    name: str
+    gmp: float
+    price: Optional[float]
+    subscription: Optional[float]
+    start_date: Optional[date]
+    end_date: Optional[date]
+    gmp_text: str = ""
+    price_text: str = ""
+    subscription_text: str = ""
+    start_raw: str = ""
+    end_raw: str = ""
+    detail_url: str = ""  # the IPO's own page, linked from the name cell
+
+    def to_dict(self):
+        """JSON-friendly dict (dates as ISO strings)"""
+        data = asdict(self)
+        for key in ("start_date", "end_date"):
+            if data[key]:
+                data[key] = data[key].isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        for key in ("start_date", "end_date"):
+            if data.get(key):
+                data[key] = date.fromisoformat(data[key])
+        return cls(**data)
+
+
+def clean_name(text):
+    """Collapse whitespace in an IPO name"""
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def parse_gmp(text):
+    """Extract the GMP percentage from text like '₹20 (14.81%)'"""
+    match = GMP_PATTERN.search(text)
+    return float(match.group(1)) if match else 0.0
+
+
+def parse_number(text):
+    """Extract the largest number from text like '₹135', '₹95-100' or '69.74x'"""
+    numbers = [float(n.replace(",", "")) for n in NUMBER_PATTERN.findall(text)]
+    return max(numbers) if numbers else None
+
+
+def parse_date(text, today):
+    """Parse a 'DD-Mon' date, picking the year closest to today"""
+    match = DATE_PATTERN.search(text)
+    if not match:
+        return None
+    try:
+        parsed = datetime.strptime(f"{match.group()}-{today.year}", "%d-%b-%Y").date()
+    except ValueError:
+        return None
+
+    if parsed < today - timedelta(days=ROLLOVER_DAYS):
+        return _replace_year(parsed, today.year + 1)
+    if parsed > today + timedelta(days=ROLLOVER_DAYS):
+        return _replace_year(parsed, today.year - 1)
+    return parsed
+
+
+def parse_full_date(text):
+    """Parse a date that carries its own year ('2024-01-21', '21-Jan-2024', '21/01/2024')"""
+    text = text.strip()
+    for fmt in FULL_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _replace_year(parsed, year):
+    try:
+        return parsed.replace(year=year)
+    except ValueError:  # 29-Feb outside a leap year
+        return None
+
+
+def parse_row(cells, today):
+    """Build an IpoRecord from a row's cell texts, or None for short rows"""
+    if len(cells) <= COL_END:
+        return None
+
+    cells = [cell.strip() for cell in cells]
+    return IpoRecord(
+        name=clean_name(cells[COL_NAME]),
+        gmp=parse_gmp(cells[COL_GMP]),
+        price=parse_number(cells[COL_PRICE]),
+        subscription=parse_number(cells[COL_SUBSCRIPTION]),
+        start_date=parse_date(cells[COL_START], today),
+        end_date=parse_date(cells[COL_END], today),
+        gmp_text=cells[COL_GMP],
+        price_text=cells[COL_PRICE],
+        subscription_text=cells[COL_SUBSCRIPTION],
+        start_raw=cells[COL_START],
+        end_raw=cells[COL_END],
+    )
+
+
+def parse_rows(rows, today):
+    """Parse an iterable of cell-text lists, skipping rows that are not IPOs"""
+    records = []
+    for cells in rows:
+        record = parse_row(cells, today)
+        if record is not None:
+            records.append(record)
+    return records
+
+
+class _TableParser(HTMLParser):
+    """Collect the text of every <td> cell (and <th> with header_cells), grouped by <tr>"""
+
+    def __init__(self, header_cells=False):
+        super().__init__()
+        self.header_cells = header_cells
+        self.rows = []
+        self.links = []  # first href of each row, aligned with rows
+        self._row = None
+        self._link = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self._row = []
+            self._link = None
+        elif tag in ("td", "th") and self._row is not None:
+            self._cell = []
+        elif tag == "br" and self._cell is not None:
+            self._cell.append(" ")
+        elif tag == "a" and self._cell is not None and self._link is None:
+            self._link = dict(attrs).get("href")
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "th") and self._cell is not None:
+            if tag == "td" or self.header_cells:
+                self._row.append(WHITESPACE_PATTERN.sub(" ", "".join(self._cell)).strip())
+            self._cell = None
+        elif tag == "tr" and self._row is not None:
+            if self._row:
+                self.rows.append(self._row)
+                self.links.append(self._link)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def _parse_tables(html, header_cells=False):
+    parser = _TableParser(header_cells)
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+def table_rows(html, header_cells=False):
+    """Return the cell texts of each data row in an HTML table"""
+    return _parse_tables(html, header_cells).rows
+
+
+def parse_table_html(html, today, base_url=None):
+    """Parse the report table's outerHTML into IpoRecords in one pass"""
+    parsed = _parse_tables(html)
+    records = []
+    for cells, link in zip(parsed.rows, parsed.links):
+        record = parse_row(cells, today)
+        if record is not None:
+            if link:
+                record.detail_url = urljoin(base_url, link) if base_url else link
+            records.append(record)
+    return records
@@ -0,0 +1,180 @@
+"""
+Load test for the bot in webhook mode.
+
+Starts a stub Telegram Bot API, launches `bot.py --webhook` against it, then
+replays synthetic /start and /help updates from many chats. Handler latency
+is measured from posting an update to the stub receiving the bot's reply for
+that chat, and reported as percentiles.
+
+    python loadtest_bot.py --updates 2000 --chats 50 --concurrency 100
+"""
+import os
+import sys
+import time
+import json
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import defaultdict, deque
+from aiohttp import web, ClientSession, ClientError
+
+TOKEN = "123456:LOADTEST"
+COMMANDS = ["/start", "/help"]
+
+
+class StubBotApi:
+    """Answers Bot API calls and timestamps every reply per chat"""
+
+    def __init__(self):
+        self.pending = defaultdict(deque)  # chat_id -> send times of unanswered updates
+        self.latencies = []
+        self.calls = defaultdict(int)
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        self.calls[method] += 1
+
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+
+        if method == "getMe":
+            return self.ok({"id": 1, "is_bot": True, "first_name": "Stub", "username": "stub_bot"})
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(params.get("chat_id", 0))
+            if self.pending[chat_id]:
+                self.latencies.append(time.perf_counter() - self.pending[chat_id].popleft())
+            return self.ok({"message_id": 1, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")})
+        return self.ok(True)
+
+    @staticmethod
+    def ok(result):
+        return web.json_response({"ok": True, "result": result})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+
+def synthetic_update(update_id, chat_id):
+    """Build a private-chat command update like the ones Telegram sends"""
+    command = random.choice(COMMANDS)
+    user = {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            "text": command,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        },
+    }
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def wait_for_bot(session, url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    return
+        except ClientError:
+            pass
+        await asyncio.sleep(0.25)
+    raise TimeoutError(f"Bot did not come up at {url}")
+
+
+async def run(args):
+    stub = StubBotApi()
+    runner = web.AppRunner(stub.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.stub_port).start()
+
+    bot_url = f"http://127.0.0.1:{args.bot_port}"
+    process = None
+    if not args.no_spawn:
+        env = dict(os.environ,
+                   TG_BOT_TOKEN=TOKEN,
+                   TG_API_BASE_URL=f"http://127.0.0.1:{args.stub_port}/bot",
+                   WEBHOOK_URL=bot_url,
+                   WEBHOOK_HOST="127.0.0.1",
+                   WEBHOOK_PORT=str(args.bot_port),
+                   BOT_CONCURRENCY=str(args.bot_concurrency))
+        env.pop("WEBHOOK_SECRET", None)
+        process = subprocess.Popen([sys.executable, "bot.py", "--webhook"], env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    try:
+        async with ClientSession() as session:
+            await wait_for_bot(session, f"{bot_url}/healthz")
+
+            semaphore = asyncio.Semaphore(args.concurrency)
+            errors = 0
+
+            async def post(update_id):
+                nonlocal errors
+                chat_id = 1000 + update_id % args.chats
+                async with semaphore:
+                    stub.pending[chat_id].append(time.perf_counter())
+                    try:
+                        async with session.post(f"{bot_url}/telegram", data=json.dumps(synthetic_update(update_id, chat_id)),
+                                                headers={"Content-Type": "application/json"}) as response:
+                            if response.status != 200:
+                                errors += 1
+                    except ClientError:
+                        errors += 1
+
+            print(f"Replaying {args.updates} updates from {args.chats} chats (client concurrency {args.concurrency})")
+            started = time.perf_counter()
+            await asyncio.gather(*(post(i) for i in range(1, args.updates + 1)))
+
+            # Wait for the bot to answer everything it accepted
+            deadline = time.monotonic() + args.drain_timeout
+            while len(stub.latencies) < args.updates - errors and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            elapsed = time.perf_counter() - started
+    finally:
+        if process:
+            process.terminate()
+            process.wait(timeout=30)
+        await runner.cleanup()
+
+    latencies = sorted(stub.latencies)
+    print(f"\n{'=' * 50}")
+    print(f"Updates sent: {args.updates} | Answered: {len(latencies)} | Errors: {errors}")
+    print(f"Wall time: {elapsed:.2f}s | Throughput: {len(latencies) / elapsed:.1f} updates/s")
+    for pct in (50, 90, 95, 99):
+        print(f"p{pct}: {percentile(latencies, pct) * 1000:.1f} ms")
+    if latencies:
+        print(f"max: {latencies[-1] * 1000:.1f} ms")
+    print(f"Bot API calls: {dict(stub.calls)}")
+    print(f"{'=' * 50}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay synthetic updates against a local webhook bot")
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--chats", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=50, help="concurrent client POSTs")
+    parser.add_argument("--bot-concurrency", type=int, default=32, help="BOT_CONCURRENCY for the spawned bot")
+    parser.add_argument("--bot-port", type=int, default=8443)
+    parser.add_argument("--stub-port", type=int, default=8081)
+    parser.add_argument("--drain-timeout", type=float, default=60)
+    parser.add_argument("--no-spawn", action="store_true", help="use an already running bot on --bot-port")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
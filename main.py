@@ -1,75 +1,24 @@
 import os
-import re
 import requests
-from datetime import datetime, timedelta
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
+import alert_rules
+import scraper
+from alert_templates import LIVE_ALERT
+from datetime import datetime
 
 # ---------------- FETCH IPO DATA ----------------
 
 def get_ipos():
     print("-- Starting IPO data extraction")
-    today = datetime.today().date()
-
-    options = Options()
-    options.add_argument("--headless=new")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-
-    print("-- Launching Chrome WebDriver in headless mode")
-    driver = webdriver.Chrome(options=options)
-    wait = WebDriverWait(driver, 30)
-
-    print("-- Navigating to IPO GMP report page")
-    driver.get("https://www.investorgain.com/report/live-ipo-gmp/331/all/")
-
-    print("-- Waiting for IPO table to load")
-    table = wait.until(EC.presence_of_element_located((By.ID, "report_table")))
-    rows = table.find_elements(By.TAG_NAME, "tr")
-
-    ipo_data = []
-    print("-- Extracting IPO rows")
-
-    for row in rows[1:]:  # skip header
-        cols = row.find_elements(By.TAG_NAME, "td")
-        if len(cols) > 8:
-            name = cols[0].text.strip()
-            gmp_text = cols[1].text.strip()
-            sub = cols[3].text.strip()
-            start = cols[7].text.strip()
-            end = cols[8].text.strip()
-
-            print(f"-- Processing IPO: {name}")
+    result = scraper.scrape_ipo_records()
 
-            # Extract GMP percentage
-            match = re.search(r"\(([\d\.]+)%\)", gmp_text)
-            gmp_value = float(match.group(1)) if match else 0
+    for record in result:
+        print(f"-- Processing IPO: {record.name}")
+        print(f"-- Extracted dates: Start={record.start_date}, End={record.end_date}")
 
-            try:
-                def extract_date(text, today):
-                    match = re.search(r"\d{1,2}-[A-Za-z]{3}", text)
-                    if match:
-                        return datetime.strptime(match.group(), "%d-%b").date().replace(year=today.year)
-                    return None
-
-                start_date = extract_date(start, today)
-                end_date = extract_date(end, today)
-                print(f"-- Extracted dates: Start={start_date}, End={end_date}")
-
-            except Exception as e:
-                print("-- Date extraction failed:", e)
-                continue
-
-            ipo_data.append((name, gmp_value, start_date, end_date, sub))
-
-    driver.quit()
-    print(f"-- IPO data extraction complete. Total IPOs found: {len(ipo_data)}")
-    return ipo_data
+    if result.stale:
+        print(f"-- Using stale snapshot from {result.fetched_at}")
+    print(f"-- IPO data extraction complete. Total IPOs found: {len(result)}")
+    return result
 
 # ---------------- TELEGRAM ----------------
 
@@ -94,42 +43,38 @@ def process_ipos(ipos):
     today = datetime.today().date()
     print(f"-- Today date: {today}")
 
-    for name, gmp, start, end, sub in ipos:
+    rules = alert_rules.load_rules("live")
+    candidates = []
 
-        if not end:
-            print(f"-- Skipping IPO {name} due to missing end date")
-            continue
+    for ipo in ipos:
 
-        # 🔹 Check ONLY if today is closing day OR one day before closing
-        if today == end or today == (end - timedelta(days=1)):
-            print(f"-- IPO in alert window: {name}, End={end}, GMP={gmp}")
+        if not ipo.end_date:
+            print(f"-- Skipping IPO {ipo.name} due to missing end date")
+            continue
 
-            try:
-                if float(gmp) >= 30:   # ✅ Your rule
-                    print(f"-- GMP PASSED for {name}, GMP={gmp}")
+        candidates.append({"name": ipo.name, "gmps": [ipo.gmp], "start_date": ipo.start_date, "end_date": ipo.end_date, "subscription": ipo.subscription_text})
 
-                    day_text = "Closing Today" if today == end else "Closing Tomorrow"
+    # 🔹 Rules only look at IPOs closing today OR one day before closing
+    for ipo, window, fired in alert_rules.evaluate(rules, candidates, today):
+        name, gmp = ipo["name"], ipo["gmps"][0]
+        print(f"-- IPO in alert window: {name}, End={ipo['end_date']}, GMP={gmp}")
 
-                    message = (
-                        f"🚀 IPO PROCEED ALERT ({day_text})\n\n"
-                        f"Name: {name}\n"
-                        f"GMP: {gmp}%\n"
-                        f"Subscription: {sub}\n"
-                        f"Start Date: {start}\n"
-                        f"End Date: {end}\n\n"
-                        f"Status: PROCEED"
-                    )
+        if not fired:
+            print(f"-- GMP below threshold for {name}, GMP={gmp}")
+            continue
 
-                    send_telegram_message(message)
+        print(f"-- GMP PASSED for {name}, GMP={gmp}, rules={[r.name for r in fired]}")
 
-                else:
-                    print(f"-- GMP below threshold for {name}, GMP={gmp}")
+        day_text = "Closing Today" if window == "closing_today" else "Closing Tomorrow"
 
-            except Exception as e:
-                print(f"-- Error processing GMP for {name}: {e}")
+        message = LIVE_ALERT.substitute(
+            day_text=day_text, name=name, gmp=gmp, subscription=ipo['subscription'],
+            start_date=ipo['start_date'], end_date=ipo['end_date'],
+        )
+        if ipos.stale:
+            message += f"\n\n⚠️ Stale data from {ipos.fetched_at:%d-%b %H:%M}"
 
-        else:
-            print(f"-- IPO {name} not in closing window (Today={today}, End={end}), skipping")
+        send_telegram_message(message)
 
 
 # ---------------- RUN DAILY ----------------
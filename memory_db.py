@@ -0,0 +1,397 @@
+"""
+In-memory stand-in for the Supabase PostgREST API.
+
+MemoryClient has the same interface as db.PostgrestClient, so
+IpoRepository(MemoryClient(...)) runs the real repository code - filters,
+batching, pagination, RPCs - without a network. It understands the subset
+of PostgREST the repository uses and mimics two server behaviours that
+matter at scale: a per-request round-trip latency and the max-rows cap
+(Supabase returns at most 1000 rows per request unless the caller pages).
+
+    client = MemoryClient(latency=0.02)
+    client.load("ipos", rows)
+    async with IpoRepository(client) as repo:
+        ...
+    client.request_count, client.truncated
+"""
+import re
+import uuid
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from db import DatabaseError, DB_CONCURRENCY
+
+MAX_ROWS = 1000
+
+# Table -> unique key columns (the on_conflict targets used by the repository)
+KEYS = {
+    "ipos": ("name", "end_date"),
+    "gmp_history": ("ipo_id", "recorded_at"),
+    "ipo_aliases": ("ipo_id", "alias"),
+    "subscribers": ("chat_id",),
+    "subscriptions": ("chat_id", "alert_window"),
+}
+
+PRIMARY = {"ipos": "id", "subscribers": "chat_id"}
+
+# ipos columns written by apply_ipo_details
+DETAIL_COLUMNS = ("detail_url", "lot_size", "issue_size_cr", "listing_date",
+                  "subscription_qib", "subscription_nii", "subscription_retail")
+
+# Child table -> (foreign key column, parent table); deletes cascade
+PARENTS = {
+    "gmp_history": ("ipo_id", "ipos"),
+    "ipo_aliases": ("ipo_id", "ipos"),
+    "subscriptions": ("chat_id", "subscribers"),
+}
+
+QUOTED_PATTERN = re.compile(r'"((?:[^"\\]|\\.)*)"|([^,]+)')
+EMBED_PATTERN = re.compile(r"^(\w+)(!inner)?\((.*)\)$")
+
+
+def text(value):
+    """A stored value as PostgREST compares it in filters"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return "" if value is None else str(value)
+
+
+def split_top(expr):
+    """Split on commas that are not inside parentheses"""
+    parts, depth, current = [], 0, []
+    for ch in expr:
+        if ch == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        depth += (ch == "(") - (ch == ")")
+        current.append(ch)
+    if current:
+        parts.append("".join(current).strip())
+    return [p for p in parts if p]
+
+
+def compare(value, op, operand):
+    """Evaluate one PostgREST operator against a row value"""
+    value = text(value)
+    if op == "eq":
+        return value == operand
+    if op == "neq":
+        return value != operand
+    try:
+        value, operand = float(value), float(operand)
+    except ValueError:
+        pass
+    if op == "lt":
+        return value < operand
+    if op == "lte":
+        return value <= operand
+    if op == "gt":
+        return value > operand
+    if op == "gte":
+        return value >= operand
+    raise DatabaseError(f"Unsupported operator {op}")
+
+
+def predicate(column, op, operand):
+    """Compile one filter; `in` lists are parsed once, not per row"""
+    if op == "in":
+        values = {q.replace('\\"', '"') if q else bare.strip() for q, bare in QUOTED_PATTERN.findall(operand.strip("()"))}
+        return lambda row: text(row.get(column)) in values
+    return lambda row: compare(row.get(column), op, operand)
+
+
+def condition(expr):
+    """'col.op.value', 'and(...)' or 'or(...)' -> predicate over a row"""
+    for logic, combine in (("and(", all), ("or(", any)):
+        if expr.startswith(logic):
+            parts = [condition(p) for p in split_top(expr[len(logic):-1])]
+            return lambda row: combine(p(row) for p in parts)
+    column, op, operand = expr.split(".", 2)
+    return predicate(column, op, operand)
+
+
+def sorter(order):
+    """'a.asc,b.desc' -> list of (column, descending)"""
+    keys = []
+    for part in order.split(","):
+        column, _, direction = part.strip().partition(".")
+        keys.append((column, direction.startswith("desc")))
+    return keys
+
+
+def sort_value(value):
+    """Sort key keeping numbers numeric and NULLs last"""
+    if value is None:
+        return (1, 0, "")
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value, "")
+    return (0, 0, text(value))
+
+
+def sort_rows(rows, order):
+    # Stable sorts applied from the last key to the first
+    for column, descending in reversed(sorter(order)):
+        rows.sort(key=lambda row: sort_value(row.get(column)), reverse=descending)
+    return rows
+
+
+class MemoryClient:
+    """PostgREST-compatible client backed by dicts"""
+
+    def __init__(self, latency=0.0, max_rows=MAX_ROWS, concurrency=DB_CONCURRENCY):
+        self.latency = latency
+        self.max_rows = max_rows
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.tables = {table: {} for table in KEYS}  # table -> {unique key: row}
+        self.ids = {"ipos": {}, "gmp_history": {}}  # primary key index, as the real tables have
+        self.partitions = set()  # gmp_history months ("YYYY_MM") created by create_gmp_partitions
+        self.request_count = 0
+        self.truncated = 0  # requests that hit max_rows without paging
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    # ---------------- storage ----------------
+
+    def key(self, table, row):
+        return tuple(text(row.get(column)) for column in KEYS[table])
+
+    def with_defaults(self, table, row):
+        row = dict(row)
+        if table in ("ipos", "gmp_history"):
+            row.setdefault("id", str(uuid.uuid4()))
+        if table == "ipos":
+            row.setdefault("status", "tracking")
+            row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+            for column in ("claimed_from", "claimed_by", "claimed_at", "price", "subscription", "start_date",
+                           "enriched_at", *DETAIL_COLUMNS):
+                row.setdefault(column, None)
+        if table == "subscribers":
+            row.setdefault("active", True)
+        return row
+
+    def store(self, table, row):
+        self.tables[table][self.key(table, row)] = row
+        if table in self.ids:
+            self.ids[table][row["id"]] = row
+        return row
+
+    def remove(self, table, row):
+        del self.tables[table][self.key(table, row)]
+        if table in self.ids:
+            del self.ids[table][row["id"]]
+
+    def load(self, table, rows):
+        """Bulk-load rows without counting requests (test fixtures)"""
+        for row in rows:
+            self.store(table, self.with_defaults(table, row))
+
+    def count(self, table):
+        return len(self.tables[table])
+
+    # ---------------- request plumbing ----------------
+
+    async def round_trip(self, work):
+        async with self.semaphore:
+            self.request_count += 1
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return work()
+
+    def matching(self, table, params):
+        """Rows of `table` passing every column filter in params"""
+        filters = []
+        rows = self.tables[table].values()
+        for name, value in (params or {}).items():
+            if name in ("select", "order", "limit", "offset", "on_conflict") or "." in name:
+                continue
+            if name in ("or", "and"):
+                filters.append(condition(f"{name}{value}"))
+            else:
+                op, _, operand = value.partition(".")
+                filters.append(predicate(name, op, operand))
+                # Primary key lookups use the index instead of a scan
+                if name == "id" and table in self.ids and op in ("eq", "in"):
+                    wanted = [operand] if op == "eq" else [q or bare.strip() for q, bare in QUOTED_PATTERN.findall(operand.strip("()"))]
+                    rows = [self.ids[table][i] for i in wanted if i in self.ids[table]]
+        return [row for row in rows if all(f(row) for f in filters)]
+
+    def project(self, table, rows, columns, params):
+        """Apply the select list, including embedded child/parent tables"""
+        plain, embeds = [], []
+        for column in split_top(columns):
+            embed = EMBED_PATTERN.match(column)
+            if embed:
+                embeds.append(embed.groups())
+            else:
+                plain.append(column)
+
+        result = [dict(row) if "*" in plain else {c: row.get(c) for c in plain} for row in rows]
+        for child, inner, child_columns in embeds:
+            child_columns = [c.strip() for c in child_columns.split(",")]
+            if PARENTS.get(child, (None, None))[1] == table:
+                # One-to-many: attach the list of child rows
+                fk, _ = PARENTS[child]
+                pk = PRIMARY[table]
+                grouped = {}
+                wanted = {row[pk] for row in rows}
+                for row in self.tables[child].values():
+                    if row[fk] in wanted:
+                        grouped.setdefault(row[fk], []).append({c: row.get(c) for c in child_columns})
+                order = params.get(f"{child}.order")
+                for out, row in zip(result, rows):
+                    children = grouped.get(row[pk], [])
+                    out[child] = sort_rows(children, order) if order else children
+            else:
+                # Many-to-one: attach the parent row, filtered by child.column params
+                fk, parent = PARENTS[table]
+                parents = {text(r[PRIMARY[parent]]): r for r in self.tables[parent].values()}
+                filters = [(name.split(".", 1)[1], value) for name, value in params.items() if name.startswith(f"{child}.")]
+                kept = []
+                for out, row in zip(result, rows):
+                    parent_row = parents.get(text(row[fk]))
+                    if parent_row and all(compare(parent_row.get(c), *v.split(".", 1)) for c, v in filters):
+                        out[child] = {c: parent_row.get(c) for c in child_columns}
+                        kept.append(out)
+                    elif not inner:
+                        out[child] = None
+                        kept.append(out)
+                result = kept
+        return result
+
+    # ---------------- PostgREST verbs ----------------
+
+    async def select(self, table, columns="*", params=None, headers=None):
+        params = params or {}
+
+        def work():
+            rows = self.matching(table, params)
+            if "order" in params:
+                rows = sort_rows(rows, params["order"])
+            rows = self.project(table, rows, columns, params)
+            offset = int(params.get("offset", 0))
+            limit = int(params["limit"]) if "limit" in params else None
+            page = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            if len(page) > self.max_rows:
+                self.truncated += 1
+                page = page[:self.max_rows]
+            return page
+
+        return await self.round_trip(work)
+
+    async def insert(self, table, rows, on_conflict=None, merge=False, ignore_duplicates=False):
+        def work():
+            written = []
+            for row in rows:
+                key = self.key(table, row)
+                existing = self.tables[table].get(key)
+                if existing is None:
+                    existing = self.store(table, self.with_defaults(table, row))
+                elif not on_conflict:
+                    raise DatabaseError(f"POST /{table} failed (409): duplicate key {key}")
+                elif merge:
+                    existing.update(row)
+                else:
+                    continue
+                written.append(dict(existing))
+            return written
+
+        return await self.round_trip(work)
+
+    async def update(self, table, values, params):
+        def work():
+            updated = []
+            for row in self.matching(table, params):
+                row.update(values)
+                updated.append(dict(row))
+            return updated
+
+        return await self.round_trip(work)
+
+    async def delete(self, table, params):
+        def work():
+            deleted = self.matching(table, params)
+            for row in deleted:
+                self.remove(table, row)
+            self.cascade(table, deleted)
+            return [dict(row) for row in deleted]
+
+        return await self.round_trip(work)
+
+    def cascade(self, table, deleted):
+        for child, (fk, parent) in PARENTS.items():
+            if parent != table:
+                continue
+            gone = {text(row[PRIMARY[table]]) for row in deleted}
+            orphans = [row for row in self.tables[child].values() if text(row[fk]) in gone]
+            for row in orphans:
+                self.remove(child, row)
+            self.cascade(child, orphans)
+
+    async def rpc(self, function, args=None):
+        handler = getattr(self, f"rpc_{function}", None)
+        if handler is None:
+            raise DatabaseError(f"POST /rpc/{function} failed (404): unknown function")
+        return await self.round_trip(lambda: handler(**(args or {})))
+
+    # ---------------- functions from schema.sql ----------------
+
+    def rpc_claim_ipos(self, p_ids, p_statuses, p_worker, p_stale_seconds=900):
+        now = datetime.now(timezone.utc)
+        stale_before = (now - timedelta(seconds=p_stale_seconds)).isoformat()
+        statuses = set(p_statuses)
+        won = []
+        for row in filter(None, map(self.ids["ipos"].get, set(p_ids))):
+            stale = row["status"] == "alerting" and row["claimed_from"] in statuses and (row["claimed_at"] or "") < stale_before
+            if row["status"] in statuses or stale:
+                if row["status"] != "alerting":
+                    row["claimed_from"] = row["status"]
+                row.update(status="alerting", claimed_by=p_worker, claimed_at=now.isoformat())
+                won.append(dict(row))
+        return won
+
+    def rpc_create_gmp_partitions(self, p_from, p_to):
+        start, end = date.fromisoformat(p_from), date.fromisoformat(p_to)
+        created = []
+        month = date(start.year, start.month, 1)
+        while month <= end:
+            name = f"{month:%Y_%m}"
+            if name not in self.partitions:
+                self.partitions.add(name)
+                created.append(f"gmp_history_{name}")
+            month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+        return created
+
+    def rpc_drop_gmp_partitions(self, p_before, p_detach_only=False):
+        # Rows outside any created partition live in the default one and are kept, as in Postgres
+        before = date.fromisoformat(p_before)
+        months = {m for m in self.partitions
+                  if date(int(m[:4]) + int(m[5:]) // 12, int(m[5:]) % 12 + 1, 1) <= before}
+        for row in [r for r in self.tables["gmp_history"].values() if text(r["recorded_at"])[:7].replace("-", "_") in months]:
+            self.remove("gmp_history", row)
+        self.partitions -= months
+        return [f"gmp_history_{m}" for m in sorted(months)]
+
+    def rpc_apply_alert_statuses(self, p_ids, p_statuses, p_worker=None):
+        wanted = dict(zip(p_ids, p_statuses))
+        updated = 0
+        for row in filter(None, map(self.ids["ipos"].get, wanted)):
+            if p_worker is None or row["claimed_by"] == p_worker:
+                row.update(status=wanted[row["id"]], claimed_from=None, claimed_by=None, claimed_at=None)
+                updated += 1
+        return updated
+
+    def rpc_apply_ipo_details(self, p_details):
+        now = datetime.now(timezone.utc).isoformat()
+        updated = 0
+        for details in p_details:
+            row = self.ids["ipos"].get(details["id"])
+            if row is None:
+                continue
+            row.update({c: details[c] for c in DETAIL_COLUMNS if details.get(c) is not None}, enriched_at=now)
+            updated += 1
+        return updated
@@ -0,0 +1,82 @@
+"""
+Prometheus metrics for the long-running bot.
+
+    METRICS_PORT=9464 python bot.py      # curl localhost:9464/metrics
+
+The endpoint listens on METRICS_HOST (loopback by default) in its own
+thread, so it answers in polling and webhook mode alike; METRICS_PORT=0
+turns it off. Besides the bot metrics below the default registry exports
+process_resident_memory_bytes, process_cpu_seconds_total and
+process_open_fds.
+
+Cache hit ratio:
+    rate(bot_snapshot_requests_total{result="hit"}[5m])
+      / rate(bot_snapshot_requests_total[5m])
+"""
+import os
+import time
+import logging
+import functools
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+logger = logging.getLogger(__name__)
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+
+# Cached answers take milliseconds, a cache miss waits for a Chrome scrape
+HANDLER_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SCRAPE_BUCKETS = (1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180)
+
+HANDLER_SECONDS = Histogram(
+    "bot_handler_seconds", "Time to handle an update, per command or filter button",
+    ["handler"], buckets=HANDLER_BUCKETS,
+)
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handlers that raised", ["handler"])
+
+SCRAPE_SECONDS = Histogram("bot_scrape_seconds", "Duration of snapshot scrapes", buckets=SCRAPE_BUCKETS)
+SCRAPES = Counter(
+    "bot_scrapes_total", "Snapshot scrapes by outcome (stale: every attempt failed, cached data served)",
+    ["outcome"],
+)
+SNAPSHOT_REQUESTS = Counter(
+    "bot_snapshot_requests_total", "Snapshot lookups served from cache (hit) or by scraping (miss)",
+    ["result"],
+)
+DATA_AGE = Gauge("bot_data_age_seconds", "Age of the IPO data being served (-1 before the first scrape)")
+SNAPSHOT_IPOS = Gauge("bot_snapshot_ipos", "IPOs in the current snapshot")
+BROWSER_SESSIONS = Gauge("bot_browser_sessions", "Chrome sessions currently open for scraping")
+
+for outcome in ("ok", "stale", "empty"):
+    SCRAPES.labels(outcome)
+for result in ("hit", "miss"):
+    SNAPSHOT_REQUESTS.labels(result)
+
+
+def serve():
+    """Start the /metrics endpoint unless METRICS_PORT is 0"""
+    if not METRICS_PORT:
+        return
+    start_http_server(METRICS_PORT, addr=METRICS_HOST)
+    logger.info(f"Metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+
+def timed(handler):
+    """
+    Decorator for async update handlers: observe latency under `handler`,
+    or under handler(update) when the label depends on the update.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(update, context):
+            label = handler(update) if callable(handler) else handler
+            started = time.perf_counter()
+            try:
+                return await func(update, context)
+            except Exception:
+                HANDLER_ERRORS.labels(label).inc()
+                raise
+            finally:
+                HANDLER_SECONDS.labels(label).observe(time.perf_counter() - started)
+        return wrapper
+    return decorate
@@ -0,0 +1,117 @@
+"""
+Match scraped IPO names to tracked IPOs.
+
+The source site renames rows freely ("KRM Ayurveda NSE SME" one day,
+"KRM Ayurveda Ltd IPO" the next), so lookups go through three levels:
+
+1. aliases   - scraped names matched before, exact dict hit
+2. key       - normalised name (no listing suffixes, punctuation or case)
+3. fuzzy     - trigram index; candidates are only the IPOs sharing one of the
+               query's rarest trigrams, scored by Dice similarity against a cutoff
+
+    index = NameMatcher(tracked, aliases)
+    ipo_id, how = index.match("KRM Ayurveda Ltd IPO")   # -> ("…", "key")
+"""
+import os
+import re
+import math
+from search_index import tokenize
+
+MATCH_CUTOFF = float(os.getenv("NAME_MATCH_CUTOFF", "0.75"))
+
+# Tokens that say where or how an IPO lists, not what it is
+# ("and" because the site mixes "&" and "and")
+NOISE_TOKENS = {"ipo", "nse", "bse", "sme", "emerge", "ltd", "limited", "the", "pvt", "private", "and"}
+
+INITIALS_PATTERN = re.compile(r"\b(?:[A-Za-z]\.){2,}")
+
+
+def normalize(name):
+    """'KRM Ayurveda Ltd. NSE SME' -> 'krm ayurveda', 'F.M.C.G.' -> 'fmcg'"""
+    name = INITIALS_PATTERN.sub(lambda m: m.group(0).replace(".", ""), name)
+    tokens = [t for t in tokenize(name) if t not in NOISE_TOKENS]
+    return " ".join(tokens) or " ".join(tokenize(name))
+
+
+def trigrams(key):
+    """Character trigrams of a key, padded so short words still produce some"""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameMatcher:
+    """Alias, normalised-key and trigram lookup from scraped names to IPO ids"""
+
+    def __init__(self, ipos=(), aliases=(), cutoff=MATCH_CUTOFF):
+        self.cutoff = cutoff
+        self.aliases = {}
+        self.keys = {}
+        self.grams = {}
+        self.postings = {}
+        self.new_aliases = {}
+        for ipo in ipos:
+            self.add(ipo['id'], ipo['name'])
+        for alias in aliases:
+            self.aliases[alias['alias']] = alias['ipo_id']
+
+    def add(self, ipo_id, name):
+        key = normalize(name)
+        self.aliases[name] = ipo_id
+        # Two tracked IPOs normalising to the same key are ambiguous: the key
+        # resolves to neither, and both stay in the trigram index so fuzzy()
+        # sees them tie instead of picking whichever came first
+        self.keys[key] = ipo_id if self.keys.get(key, ipo_id) == ipo_id else None
+        grams = trigrams(key)
+        self.grams[ipo_id] = grams
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(ipo_id)
+
+    def fuzzy(self, key):
+        """Best (ipo_id, score) above the cutoff, or (None, best score) when none or a tie"""
+        query = trigrams(key)
+
+        # Dice >= cutoff needs at least `needed` shared trigrams, so any match
+        # contains one of the query's rarest len - needed + 1 trigrams; common
+        # trigrams ("ind", "ent") never have to be walked
+        needed = math.ceil(self.cutoff * len(query) / (2 - self.cutoff))
+        rarest = sorted(query, key=lambda gram: len(self.postings.get(gram, ())))
+        candidates = set()
+        for gram in rarest[:len(query) - needed + 1]:
+            candidates.update(self.postings.get(gram, ()))
+
+        best, best_score, tie = None, 0.0, False
+        for ipo_id in candidates:
+            grams = self.grams[ipo_id]
+            score = 2 * len(query & grams) / (len(query) + len(grams))
+            if score > best_score:
+                best, best_score, tie = ipo_id, score, False
+            elif score == best_score:
+                tie = True
+        if tie or best_score < self.cutoff:
+            return None, best_score
+        return best, best_score
+
+    def match(self, name):
+        """Return (ipo_id, how) with how in alias/key/fuzzy, or (None, None)"""
+        ipo_id = self.aliases.get(name)
+        if ipo_id:
+            return ipo_id, "alias"
+
+        key = normalize(name)
+        if key in self.keys and self.keys[key] is None:
+            return None, None  # ambiguous between tracked IPOs
+        ipo_id = self.keys.get(key)
+        how = "key"
+        if ipo_id is None:
+            ipo_id, _ = self.fuzzy(key)
+            how = "fuzzy"
+        if ipo_id is None:
+            return None, None
+
+        # Remember the spelling so the next run is a dict hit
+        self.aliases[name] = ipo_id
+        self.new_aliases[name] = ipo_id
+        return ipo_id, how
+
+    def __len__(self):
+        return len(self.grams)
@@ -0,0 +1,306 @@
+"""
+Alert delivery channels.
+
+Every channel is a Notifier with a name (the one alert rules list under
+"channels"), a timeout and an async deliver(). dispatch() sends one alert
+to all requested channels at once, each under its own timeout, so a slow
+or dead channel never holds up the others, and returns a DeliveryReport
+with the outcome per channel.
+
+    async with open_client() as client:   # one per run, shared by every dispatch
+        report = await dispatch(["telegram", "n8n"], Alert(message, data, window), client=client)
+    report.ok, report.summary()
+
+Channels and their settings:
+    telegram  TG_BOT_TOKEN, TG_CHANNEL_ID
+    n8n       N8N_WEBHOOK_URL, N8N_PHONES (comma separated) - WhatsApp via n8n
+    webhook   ALERT_WEBHOOK_URL - the alert as JSON to any endpoint
+    email     ALERT_EMAIL_TO, ALERT_EMAIL_FROM, SMTP_HOST/SMTP_PORT
+              (localhost:1025 by default, e.g. `python -m aiosmtpd -n`)
+A channel without its settings reports "not configured" instead of sending.
+
+"kind:target" names another destination of the same kind, e.g.
+"telegram:@IPO_SME" (a second chat), "webhook:https://..." or
+"email:a@x.in,b@y.in"; each is built on first use with the default
+settings otherwise.
+"""
+import os
+import time
+import json
+import asyncio
+import logging
+import smtplib
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+import httpx
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_TIMEOUT = float(os.getenv("NOTIFY_TIMEOUT", "10"))  # seconds per channel and alert
+
+TG_BOT_TOKEN = os.getenv("TG_BOT_TOKEN")
+TG_CHANNEL_ID = os.getenv("TG_CHANNEL_ID")  # e.g., "@IPO_GMB_Tracker"
+N8N_WEBHOOK_URL = os.getenv("N8N_WEBHOOK_URL", "https://n8n-n1cx.onrender.com/webhook/e19013f2-871d-497f-9446-733282cfbb7c")
+N8N_PHONES = os.getenv("N8N_PHONES", "919884872483,917604925112,919884972483")
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL")
+SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "1025"))
+ALERT_EMAIL_FROM = os.getenv("ALERT_EMAIL_FROM", "ipo-alerts@localhost")
+ALERT_EMAIL_TO = os.getenv("ALERT_EMAIL_TO")
+
+
+class NotifierError(Exception):
+    """A channel refused or failed to deliver an alert"""
+
+
+@dataclass(slots=True)
+class Alert:
+    message: str = None   # rendered Telegram/Markdown text (None for structured-only sends)
+    data: dict = None     # alert_sender.webhook_data() payload
+    window: str = None    # "closing_tomorrow", "closing_today", ...
+
+    @property
+    def title(self):
+        return f"IPO alert: {self.data['name']}" if self.data else "IPO alerts"
+
+
+@dataclass(slots=True)
+class Delivery:
+    channel: str
+    ok: bool
+    seconds: float = 0.0
+    error: str = None
+
+
+@dataclass(slots=True)
+class DeliveryReport:
+    label: str
+    deliveries: list = field(default_factory=list)
+
+    @property
+    def ok(self):
+        """True if any channel delivered"""
+        return any(d.ok for d in self.deliveries)
+
+    @property
+    def failed(self):
+        return [d for d in self.deliveries if not d.ok]
+
+    def summary(self):
+        return ", ".join(f"{d.channel} {'ok' if d.ok else d.error} ({d.seconds:.2f}s)" for d in self.deliveries)
+
+
+# ---------------- CHANNELS ----------------
+
+class Notifier:
+    """One delivery channel; subclasses implement configured and deliver()"""
+    name = None
+
+    def __init__(self, timeout=NOTIFY_TIMEOUT):
+        self.timeout = timeout
+
+    @property
+    def configured(self):
+        return True
+
+    async def deliver(self, client, alert):
+        raise NotImplementedError
+
+    async def send(self, client, alert):
+        """deliver() under this channel's timeout, never raising"""
+        started = time.perf_counter()
+        if not self.configured:
+            return Delivery(self.name, False, 0.0, "not configured")
+        try:
+            await asyncio.wait_for(self.deliver(client, alert), self.timeout)
+            return Delivery(self.name, True, time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            error = f"timed out after {self.timeout:g}s"
+        except Exception as e:
+            # Any failure is this channel's alone; the other sends carry on
+            error = str(e) or type(e).__name__
+        return Delivery(self.name, False, time.perf_counter() - started, error)
+
+
+class TelegramNotifier(Notifier):
+    name = "telegram"
+
+    def __init__(self, token=TG_BOT_TOKEN, chat_id=TG_CHANNEL_ID, timeout=NOTIFY_TIMEOUT):
+        super().__init__(timeout)
+        self.token = token
+        self.chat_id = chat_id
+
+    @property
+    def configured(self):
+        return bool(self.token and self.chat_id)
+
+    async def deliver(self, client, alert):
+        if not alert.message:
+            raise NotifierError("no message text")
+        response = await client.post(
+            f"https://api.telegram.org/bot{self.token}/sendMessage",
+            data={"chat_id": self.chat_id, "text": alert.message, "parse_mode": "Markdown"},
+        )
+        if response.status_code != 200:
+            raise NotifierError(f"Telegram API error {response.status_code}: {response.text[:200]}")
+
+
+class N8nNotifier(Notifier):
+    """One n8n webhook call per phone number (n8n forwards to WhatsApp); ok if any got through"""
+    name = "n8n"
+
+    def __init__(self, url=N8N_WEBHOOK_URL, phones=N8N_PHONES, timeout=15.0):
+        super().__init__(timeout)
+        self.url = url
+        self.phones = [p.strip() for p in phones.split(",") if p.strip()] if isinstance(phones, str) else list(phones)
+
+    @property
+    def configured(self):
+        return bool(self.url and self.phones)
+
+    async def deliver(self, client, alert):
+        if not alert.data:
+            raise NotifierError("no IPO data")
+
+        async def post(phone):
+            payload = {
+                "alert_type": alert.window,
+                "phone": phone,
+                "ipo_name": alert.data.get("name"),
+                "price": alert.data.get("price"),
+                "subscription": alert.data.get("subscription"),
+                "start_date": alert.data.get("start_date"),
+                "end_date": alert.data.get("end_date"),
+                "avg_gmp": alert.data.get("avg_gmp"),
+                "gmp_history": alert.data.get("gmp_history"),
+                "recommendation": "PROCEED",
+            }
+            response = await client.post(self.url, json=payload)
+            if response.status_code != 200:
+                raise NotifierError(f"n8n error {response.status_code} for {phone}")
+
+        results = await asyncio.gather(*(post(phone) for phone in self.phones), return_exceptions=True)
+        failed = [r for r in results if isinstance(r, Exception)]
+        for error in failed:
+            logger.error(f"N8N webhook failed: {error}")
+        if len(failed) == len(results):
+            raise NotifierError(f"all {len(results)} n8n webhooks failed")
+
+
+class WebhookNotifier(Notifier):
+    """The alert as one JSON document to a generic endpoint"""
+    name = "webhook"
+
+    def __init__(self, url=ALERT_WEBHOOK_URL, timeout=NOTIFY_TIMEOUT):
+        super().__init__(timeout)
+        self.url = url
+
+    @property
+    def configured(self):
+        return bool(self.url)
+
+    async def deliver(self, client, alert):
+        response = await client.post(self.url, json={"window": alert.window, "message": alert.message, "ipo": alert.data})
+        if response.status_code >= 300:
+            raise NotifierError(f"webhook returned {response.status_code}")
+
+
+class EmailNotifier(Notifier):
+    """Plain-text mail through an SMTP relay; smtplib runs in a worker thread"""
+    name = "email"
+
+    def __init__(self, recipients=ALERT_EMAIL_TO, sender=ALERT_EMAIL_FROM, host=SMTP_HOST, port=SMTP_PORT,
+                 timeout=NOTIFY_TIMEOUT):
+        super().__init__(timeout)
+        self.recipients = [r.strip() for r in (recipients or "").split(",") if r.strip()]
+        self.sender = sender
+        self.host = host
+        self.port = port
+
+    @property
+    def configured(self):
+        return bool(self.recipients)
+
+    async def deliver(self, client, alert):
+        mail = EmailMessage()
+        mail["Subject"] = alert.title
+        mail["From"] = self.sender
+        mail["To"] = ", ".join(self.recipients)
+        mail.set_content(alert.message or json.dumps(alert.data, indent=2, default=str))
+        await asyncio.to_thread(self.send_mail, mail)
+
+    def send_mail(self, mail):
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(mail)
+
+
+# ---------------- DISPATCH ----------------
+
+_registry = None
+
+
+def get_notifiers():
+    """Channel name -> Notifier, built once from the environment"""
+    global _registry
+    if _registry is None:
+        _registry = {n.name: n for n in (TelegramNotifier(), N8nNotifier(), WebhookNotifier(), EmailNotifier())}
+    return _registry
+
+
+# Kind -> factory for "kind:target" channel names
+TARGETED = {
+    "telegram": lambda target: TelegramNotifier(chat_id=target),
+    "webhook": lambda target: WebhookNotifier(url=target),
+    "email": lambda target: EmailNotifier(recipients=target),
+}
+
+
+def resolve(channel):
+    """The Notifier for a channel name, building "kind:target" ones on first use; None if unknown"""
+    registry = get_notifiers()
+    if channel not in registry:
+        kind, _, target = channel.partition(":")
+        if kind not in TARGETED or not target:
+            return None
+        notifier = TARGETED[kind](target)
+        notifier.name = channel
+        registry[channel] = notifier
+    return registry[channel]
+
+
+def is_text_channel(channel):
+    """Channels that take the rendered message rather than the structured payload (digest-able)"""
+    return channel.partition(":")[0] == "telegram"
+
+
+def open_client():
+    """The HTTP client a run shares across all its dispatches; close it once, at the end of the run"""
+    return httpx.AsyncClient()
+
+
+def register(notifier):
+    """Add or replace a channel (custom channels, tests, the scaling suite)"""
+    get_notifiers()[notifier.name] = notifier
+
+
+async def dispatch(channels, alert, label="alert", client=None):
+    """
+    Send `alert` to every channel concurrently; returns the DeliveryReport.
+    Pass the run's `client` (open_client()); without one, a client is opened
+    for this dispatch alone.
+    """
+    report = DeliveryReport(label)
+    if not channels:
+        return report
+    if client is None:
+        async with open_client() as own_client:
+            return await dispatch(channels, alert, label, own_client)
+
+    notifiers = {c: resolve(c) for c in channels}
+    known = [n for n in notifiers.values() if n is not None]
+    report.deliveries = list(await asyncio.gather(*(n.send(client, alert) for n in known)))
+    report.deliveries.extend(Delivery(c, False, 0.0, "unknown channel") for c, n in notifiers.items() if n is None)
+    for delivery in report.failed:
+        logger.warning(f"{delivery.channel} delivery failed for {label}: {delivery.error}")
+    return report
+
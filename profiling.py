@@ -0,0 +1,215 @@
+"""
+Opt-in profiling for pipeline stages.
+
+    PROFILE=1 python gmp_collector.py       # CPU and memory
+    PROFILE=cpu python ipo_tracker.py       # CPU only
+    python alert_sender.py --profile
+
+When enabled, every stages.stage() block also writes, under
+PROFILE_DIR/<script>-<timestamp>/:
+
+    <stage>.pstats      cProfile of the calling thread (snakeviz, pstats)
+    <stage>.collapsed   sampled stacks of every thread, one "a;b;c count" line
+                        per stack (flamegraph.pl, speedscope)
+    <stage>.memory.txt  allocations made during the stage, top lines first
+
+Allocation tracing slows allocation-heavy code several times over (CPU
+profiles and stage timings included), so PROFILE=cpu or PROFILE=memory
+records just one side.
+cProfile only sees the thread it runs in, so Chrome driving and Telegram
+sends made from worker threads show up in the collapsed stacks only. Time a
+stage spends awaiting Supabase appears as the event loop's select().
+
+A long-running process can call install_memory_signal() instead: each
+SIGUSR1 then writes a tracemalloc snapshot and the growth since the last one.
+"""
+import os
+import sys
+import signal
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))  # seconds between stack samples
+TRACE_FRAMES = int(os.getenv("PROFILE_TRACE_FRAMES", "10"))
+TOP_ALLOCATIONS = 40
+
+_run_dir = None
+_cpu = _memory = False
+_cprofile_busy = False  # only one cProfile can run at a time
+_stage_runs = Counter()  # repeated stages (bot, daemon) get numbered files
+
+
+def enabled():
+    return _run_dir is not None
+
+
+def configure(script, flag=False):
+    """Turn profiling on for this process if --profile or PROFILE is set"""
+    mode = os.getenv("PROFILE", "").lower()
+    if mode in ("cpu", "memory"):
+        enable(script, cpu=mode == "cpu", memory=mode == "memory")
+    elif flag or mode in ("1", "true", "yes"):
+        enable(script)
+
+
+def enable(script, cpu=True, memory=True):
+    global _run_dir, _cpu, _memory
+    _run_dir = os.path.join(PROFILE_DIR, f"{script}-{datetime.now():%Y%m%d-%H%M%S}")
+    os.makedirs(_run_dir, exist_ok=True)
+    _cpu, _memory = cpu, memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start(TRACE_FRAMES)
+    logger.info(f"Profiling {' and '.join(k for k, on in (('CPU', cpu), ('memory', memory)) if on)}, writing to {_run_dir}")
+    return _run_dir
+
+
+def output_path(name, suffix):
+    return os.path.join(_run_dir, f"{name.replace('/', '_')}{suffix}")
+
+
+# ---------------- STACK SAMPLER ----------------
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples every thread's stack into collapsed-stack counts"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def sample(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.counts[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+# ---------------- STAGE PROFILE ----------------
+
+def write_allocations(path, snapshot, baseline=None, title=""):
+    """Top allocation sites, as growth against `baseline` when given"""
+    own = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    snapshot = snapshot.filter_traces(own)
+    if baseline is not None:
+        stats = snapshot.compare_to(baseline.filter_traces(own), "lineno")
+    else:
+        stats = snapshot.statistics("lineno")
+    current, peak = tracemalloc.get_traced_memory()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{title}traced now {current / 2**20:.1f} MB, peak {peak / 2**20:.1f} MB\n\n")
+        for stat in stats[:TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+
+
+class StageProfile:
+    """CPU profile, stack samples and allocation diff for one stage"""
+
+    def __init__(self, name):
+        global _cprofile_busy
+        self.name = name
+        _stage_runs[name] += 1
+        self.label = name if _stage_runs[name] == 1 else f"{name}.{_stage_runs[name]}"
+        self.profiler = self.sampler = self.baseline = None
+        if _cpu and not _cprofile_busy:
+            try:
+                self.profiler = cProfile.Profile()
+                self.profiler.enable()
+                _cprofile_busy = True
+            except ValueError:
+                # Another profiler (a debugger, coverage) owns the hook
+                self.profiler = None
+        if _cpu:
+            self.sampler = StackSampler()
+            self.sampler.start()
+        if _memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            self.baseline = tracemalloc.take_snapshot()
+
+    def stop(self):
+        global _cprofile_busy
+        if self.profiler is not None:
+            self.profiler.disable()
+            _cprofile_busy = False
+        if self.sampler is not None:
+            self.sampler.stop()
+        try:
+            if self.profiler is not None:
+                self.profiler.dump_stats(output_path(self.label, ".pstats"))
+            if self.sampler is not None:
+                self.sampler.write(output_path(self.label, ".collapsed"))
+            if self.baseline is not None:
+                write_allocations(output_path(self.label, ".memory.txt"), tracemalloc.take_snapshot(),
+                                  self.baseline, title=f"stage {self.label}: ")
+        except OSError as e:
+            logger.warning(f"Could not write profile for stage '{self.name}': {e}")
+
+
+def start_stage(name):
+    """A running StageProfile, or None when profiling is off"""
+    return StageProfile(name) if enabled() else None
+
+
+# ---------------- ON-DEMAND MEMORY SNAPSHOTS ----------------
+
+def install_memory_signal(script):
+    """
+    SIGUSR1 writes a memory snapshot: the first signal starts tracing (unless
+    profiling already did), later ones dump the top allocations and the
+    growth since the previous signal to PROFILE_DIR.
+    """
+    state = {"previous": None, "count": 0}
+    folder = _run_dir or os.path.join(PROFILE_DIR, f"{script}-memory")
+
+    def dump(signum, frame):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            logger.info("Memory tracing started; send SIGUSR1 again to write a snapshot")
+            return
+        state["count"] += 1
+        snapshot = tracemalloc.take_snapshot()
+        try:
+            os.makedirs(folder, exist_ok=True)
+            stamp = f"{datetime.now():%Y%m%d-%H%M%S}-{state['count']}"
+            snapshot.dump(os.path.join(folder, f"memory-{stamp}.snapshot"))
+            path = os.path.join(folder, f"memory-{stamp}.txt")
+            write_allocations(path, snapshot, state["previous"],
+                              title=f"snapshot {state['count']}{' (growth since previous)' if state['previous'] else ''}: ")
+            logger.info(f"Memory snapshot written to {path}")
+        except OSError as e:
+            logger.warning(f"Could not write memory snapshot: {e}")
+        state["previous"] = snapshot
+
+    signal.signal(signal.SIGUSR1, dump)
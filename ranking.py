@@ -0,0 +1,87 @@
+"""
+Top-K selection over the bot's in-memory IPO snapshot.
+
+    top_ipos(snapshot.ipos, "subscription", k=5, filters=["sme", "week"])
+
+heapq.nlargest keeps a k-sized heap while streaming the records once, so a
+request costs O(n log k) and never re-scrapes. IPOs missing the ranking
+value (no subscription figure yet, no close date) are left out rather than
+ranked last.
+"""
+import os
+import math
+import heapq
+from datetime import date, timedelta
+
+TOP_DEFAULT = 10
+TOP_MAX = 25
+# Subscription runs from ~0.5x to several hundred x, so the combined score
+# adds it on a log scale: 100x subscribed is worth ~33 GMP points at 5
+SCORE_SUBSCRIPTION_WEIGHT = float(os.getenv("TOP_SCORE_SUBSCRIPTION_WEIGHT", "5"))
+
+SME_TOKENS = ("SME", "EMERGE")
+
+
+def is_sme_name(name):
+    """SME listings are tagged in the name ('... NSE SME', '... BSE SME')"""
+    return any(token in name.upper().split() for token in SME_TOKENS)
+
+
+def is_sme(ipo):
+    return is_sme_name(ipo.name)
+
+
+def days_to_close(ipo, today):
+    return (ipo.end_date - today).days if ipo.end_date else None
+
+
+def combined_score(ipo):
+    return ipo.gmp + SCORE_SUBSCRIPTION_WEIGHT * math.log2(1 + (ipo.subscription or 0))
+
+
+# Key -> (label, value(ipo, today) or None when unrankable, formatter for the value)
+RANK_KEYS = {
+    "gmp": ("GMP", lambda ipo, today: ipo.gmp, lambda v: f"{v:g}%"),
+    "subscription": ("Subscription", lambda ipo, today: ipo.subscription, lambda v: f"{v:g}x"),
+    "score": ("Score", lambda ipo, today: combined_score(ipo), lambda v: f"{v:.1f}"),
+    # Soonest first: nlargest over the negated day count
+    "closing": ("Closes in", lambda ipo, today: -d if (d := days_to_close(ipo, today)) is not None and d >= 0 else None,
+                lambda v: "today" if v == 0 else f"{-v:g}d"),
+}
+KEY_ALIASES = {"sub": "subscription", "subs": "subscription", "close": "closing", "days": "closing"}
+
+FILTERS = {
+    "sme": lambda ipo, today: is_sme(ipo),
+    "main": lambda ipo, today: not is_sme(ipo),
+    # Still open and closing by Sunday
+    "week": lambda ipo, today: ipo.end_date is not None
+                               and today <= ipo.end_date <= today + timedelta(days=6 - today.weekday()),
+}
+FILTER_ALIASES = {"mainboard": "main"}
+
+
+def parse_top_args(args):
+    """'/top sub 5 sme week' args -> (key, k, filters); raises ValueError on unknown words"""
+    key, k, filters = "gmp", TOP_DEFAULT, []
+    for arg in (a.lower() for a in args):
+        if arg.isdigit():
+            k = max(1, min(int(arg), TOP_MAX))
+        elif KEY_ALIASES.get(arg, arg) in RANK_KEYS:
+            key = KEY_ALIASES.get(arg, arg)
+        elif FILTER_ALIASES.get(arg, arg) in FILTERS:
+            filters.append(FILTER_ALIASES.get(arg, arg))
+        else:
+            raise ValueError(arg)
+    return key, k, filters
+
+
+def top_ipos(ipos, key="gmp", k=TOP_DEFAULT, filters=(), today=None):
+    """The k best IPOs by `key` as (value, ipo) pairs, best first"""
+    today = today or date.today()
+    value = RANK_KEYS[key][1]
+    checks = [FILTERS[f] for f in filters]
+    candidates = (
+        (v, ipo) for ipo in ipos
+        if all(check(ipo, today) for check in checks) and (v := value(ipo, today)) is not None
+    )
+    return heapq.nlargest(k, candidates, key=lambda pair: pair[0])
@@ -0,0 +1,177 @@
+"""
+Local read API for cached IPO snapshots and GMP history.
+
+    python read_api.py            # serves on READ_API_HOST:READ_API_PORT
+
+GET  /snapshot               recent IPOs (READ_API_DAYS) with their latest GMP
+GET  /ipos/{id}/history      GMP history of one IPO
+POST /invalidate             reload from the database (sent by the collector)
+GET  /healthz
+
+Every response body is rendered once per cache version, then served from
+memory with a precompressed gzip variant and an ETag, so a client polling
+with If-None-Match gets a 304 until the data changes.
+"""
+import os
+import gzip
+import json
+import asyncio
+import hashlib
+import logging
+import httpx
+from datetime import datetime, timedelta
+from aiohttp import web
+from db import IpoRepository, gte
+
+# Setup logging
+logging.basicConfig(
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Config
+READ_API_HOST = os.getenv("READ_API_HOST", "127.0.0.1")
+READ_API_PORT = int(os.getenv("READ_API_PORT", "8090"))
+READ_API_URL = os.getenv("READ_API_URL")  # set for writers, e.g. http://127.0.0.1:8090
+READ_API_TOKEN = os.getenv("READ_API_TOKEN")  # required on /invalidate when set
+REFRESH_INTERVAL = int(os.getenv("READ_API_REFRESH", "900"))  # safety net if an invalidation is missed
+RECENT_DAYS = int(os.getenv("READ_API_DAYS", "14"))  # IPOs closed longer ago stay in the database but are not served
+
+
+class Payload:
+    """A rendered JSON body with its gzip variant and ETag"""
+    __slots__ = ("body", "gzipped", "etag")
+
+    def __init__(self, data):
+        self.body = json.dumps(data, separators=(",", ":"), default=str).encode()
+        self.gzipped = gzip.compress(self.body, compresslevel=6)
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+
+
+class SnapshotCache:
+    """In-memory snapshot and per-IPO history, rebuilt on invalidation"""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.snapshot = None
+        self.history = {}
+        self.loaded_at = None
+        self.version = 0
+        self._lock = asyncio.Lock()
+
+    async def reload(self):
+        """Rebuild every payload from one embedded query, then swap them in"""
+        async with self._lock:
+            rows = await self.repo.client.select(
+                "ipos", "id, name, price, subscription, start_date, end_date, status, gmp_history(gmp, recorded_at)",
+                {"end_date": gte(datetime.today().date() - timedelta(days=RECENT_DAYS)), "order": "end_date.desc"},
+            )
+
+            ipos = []
+            history = {}
+            for row in rows:
+                samples = sorted(row.pop("gmp_history") or [], key=lambda s: s["recorded_at"])
+                row["latest_gmp"] = samples[-1]["gmp"] if samples else None
+                row["latest_recorded_at"] = samples[-1]["recorded_at"] if samples else None
+                ipos.append(row)
+                history[row["id"]] = Payload({"id": row["id"], "name": row["name"], "history": samples})
+
+            self.loaded_at = datetime.now()
+            self.version += 1
+            self.snapshot = Payload({"version": self.version, "loaded_at": self.loaded_at, "ipos": ipos})
+            self.history = history
+            logger.info(f"Read cache v{self.version} loaded: {len(ipos)} IPOs")
+
+
+def respond(request, payload):
+    """Serve a payload, honouring If-None-Match and Accept-Encoding"""
+    use_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
+    etag = f'"{payload.etag}-gz"' if use_gzip else f'"{payload.etag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+    # Either representation of the same body counts as a match
+    tags = {t.strip().removeprefix("W/").strip('"').removesuffix("-gz") for t in request.headers.get("If-None-Match", "").split(",")}
+    if payload.etag in tags or "*" in tags:
+        return web.Response(status=304, headers=headers)
+
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return web.Response(body=payload.gzipped, content_type="application/json", headers=headers)
+    return web.Response(body=payload.body, content_type="application/json", headers=headers)
+
+
+def build_app(cache):
+    async def snapshot(request):
+        return respond(request, cache.snapshot)
+
+    async def ipo_history(request):
+        payload = cache.history.get(request.match_info["ipo_id"])
+        if payload is None:
+            raise web.HTTPNotFound()
+        return respond(request, payload)
+
+    async def invalidate(request):
+        if READ_API_TOKEN and request.headers.get("Authorization") != f"Bearer {READ_API_TOKEN}":
+            raise web.HTTPForbidden()
+        await cache.reload()
+        return web.json_response({"version": cache.version})
+
+    async def health(request):
+        return web.json_response({"version": cache.version, "loaded_at": str(cache.loaded_at)})
+
+    app = web.Application()
+    app.router.add_get("/snapshot", snapshot)
+    app.router.add_get("/ipos/{ipo_id}/history", ipo_history)
+    app.router.add_post("/invalidate", invalidate)
+    app.router.add_get("/healthz", health)
+    return app
+
+
+async def refresh_periodically(cache):
+    while True:
+        await asyncio.sleep(REFRESH_INTERVAL)
+        try:
+            await cache.reload()
+        except Exception as e:
+            logger.error(f"Periodic cache refresh failed: {e}")
+
+
+async def notify_read_api():
+    """Tell a running read API that the data changed (best effort, no-op if unset)"""
+    if not READ_API_URL:
+        return
+    headers = {"Authorization": f"Bearer {READ_API_TOKEN}"} if READ_API_TOKEN else {}
+    try:
+        async with httpx.AsyncClient(timeout=5) as client:
+            await client.post(f"{READ_API_URL.rstrip('/')}/invalidate", headers=headers)
+        logger.info("Read API cache invalidated")
+    except httpx.HTTPError as e:
+        logger.warning(f"Could not invalidate read API cache: {e}")
+
+
+async def serve():
+    async with IpoRepository() as repo:
+        cache = SnapshotCache(repo)
+        await cache.reload()
+
+        runner = web.AppRunner(build_app(cache))
+        await runner.setup()
+        await web.TCPSite(runner, READ_API_HOST, READ_API_PORT).start()
+        logger.info(f"Read API listening on {READ_API_HOST}:{READ_API_PORT}")
+
+        try:
+            await refresh_periodically(cache)
+        finally:
+            await runner.cleanup()
+
+
+def main():
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
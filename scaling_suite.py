@@ -0,0 +1,185 @@
+"""
+Scaling regression suite: run the pipeline stages against synthetic data
+at growing sizes and report how time, database requests and memory grow.
+
+    python scaling_suite.py                          # 1x, 10x, 100x, 1000x
+    python scaling_suite.py --scales 1 10 100 --latency 0.02
+    python scaling_suite.py --max-exponent 1.3       # exit 1 on super-linear stages
+
+The suite also exits 1 when any read hit memory_db's max-rows cap, since
+that read silently lost rows.
+
+Each stage runs the real module code (ipo_parser, ipo_tracker,
+gmp_collector, alert_sender, cleanup) on an IpoRepository backed by
+memory_db.MemoryClient; every alert channel and subscriber send is
+replaced by a counter. The exponent column is the log-log slope between consecutive
+scales: ~1 is linear, ~0 constant, anything near 2 is quadratic.
+"""
+import os
+import sys
+import math
+import time
+import asyncio
+import logging
+import argparse
+import tempfile
+import tracemalloc
+import ipo_parser
+import ipo_tracker
+import gmp_collector
+import gmp_watch
+import alert_sender
+import notifiers
+import subscriptions
+import cleanup
+import synthetic_data
+from db import IpoRepository
+from memory_db import MemoryClient
+
+SENT = {"channel": 0, "subscriber": 0}
+
+
+def offline_senders():
+    """Count messages instead of sending them"""
+    class Counting(notifiers.Notifier):
+        def __init__(self, name):
+            super().__init__()
+            self.name = name
+
+        async def deliver(self, client, alert):
+            SENT["channel"] += 1
+
+    def fan_out(chat_ids, message, rate=None, session=None):
+        SENT["subscriber"] += len(chat_ids)
+        return len(chat_ids), []
+
+    for name in list(notifiers.get_notifiers()):
+        notifiers.register(Counting(name))
+    # Keep synthetic IPOs out of the real move detector state
+    gmp_watch.STATE_FILE = os.path.join(tempfile.mkdtemp(), "gmp_watch.json")
+    subscriptions.fan_out = fan_out
+
+
+def seed(data, latency):
+    client = MemoryClient(latency=latency)
+    client.load("ipos", data.ipos)
+    client.load("gmp_history", data.gmp_history)
+    client.load("subscribers", data.subscribers)
+    client.load("subscriptions", data.subscriptions)
+    return client
+
+
+async def run_scale(data, latency, trace_memory=False):
+    """
+    Run every stage once; returns [(stage, seconds, requests, peak bytes, truncated)].
+    tracemalloc slows allocation-heavy code several times over, so timings are
+    only meaningful from a run with trace_memory off.
+    """
+    client = seed(data, latency)
+    html = synthetic_data.render_table(data.table_rows)
+    results = []
+    records = []
+
+    async def parse(repo):
+        records.extend(ipo_parser.parse_table_html(html, data.today))
+
+    async def track(repo):
+        await ipo_tracker.add_new_ipos_to_db(repo, [r for r in records if r.end_date], today=data.today)
+
+    async def collect(repo):
+        await gmp_collector.collect_daily_gmps(repo, data.today, {r.name: r.gmp for r in records})
+
+    async def alert(repo):
+        await alert_sender.check_and_send_alerts(repo, data.today)
+
+    async def clean(repo):
+        await cleanup.cleanup_old_data(repo, data.today)
+
+    async with IpoRepository(client) as repo:
+        for name, step in (("parse", parse), ("tracker", track), ("collector", collect),
+                           ("alerts", alert), ("cleanup", clean)):
+            requests, truncated = client.request_count, client.truncated
+            if trace_memory:
+                tracemalloc.reset_peak()
+                base, _ = tracemalloc.get_traced_memory()
+            started = time.perf_counter()
+            await step(repo)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] - base if trace_memory else 0
+            results.append((name, elapsed, client.request_count - requests, peak, client.truncated - truncated))
+    return results
+
+
+def exponent(small, large, scale_small, scale_large):
+    """log-log slope between two measurements (None when either is ~0)"""
+    if small <= 1e-4 or large <= 1e-4:
+        return None
+    return math.log(large / small) / math.log(scale_large / scale_small)
+
+
+def report(runs, max_exponent):
+    """Print one table per metric; returns the stages over max_exponent"""
+    scales = sorted(runs)
+    stages = [name for name, *_ in runs[scales[0]]]
+    flagged = []
+    metrics = [("time", 1, "s"), ("requests", 2, "")]
+    if any(stage[3] for stage in runs[scales[0]]):
+        metrics.append(("peak memory", 3, "MB"))
+    for label, column, unit in metrics:
+        print(f"\n{label}")
+        print(f"{'stage':<12}" + "".join(f"{f'{s}x':>12}" for s in scales) + f"{'exponent':>10}")
+        for i, name in enumerate(stages):
+            values = [runs[s][i][column] for s in scales]
+            shown = [v / 2 ** 20 if unit == "MB" else v for v in values]
+            cells = "".join(f"{v:>12.3f}" if isinstance(v, float) else f"{v:>12}" for v in shown)
+            slopes = [exponent(values[j], values[j + 1], scales[j], scales[j + 1]) for j in range(len(scales) - 1)]
+            slopes = [s for s in slopes if s is not None]
+            worst = max(slopes) if slopes else None
+            print(f"{name:<12}{cells}{worst:>10.2f}" if worst is not None else f"{name:<12}{cells}{'-':>10}")
+            if worst is not None and max_exponent and worst > max_exponent and label != "peak memory":
+                flagged.append(f"{name} {label} (exponent {worst:.2f})")
+
+    # A read cut at the cap silently drops rows, which is a bug at any exponent
+    truncated = [f"{name} at {s}x" for s in scales for name, *_, t in runs[s] if t]
+    if truncated:
+        flagged.append(f"rows cut at the max-rows limit ({', '.join(truncated)})")
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling regression suite for the IPO pipeline")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per database round trip")
+    parser.add_argument("--max-exponent", type=float, help="fail when time or requests grow faster than scale**N")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-memory", action="store_true", help="skip the (slower) tracemalloc pass")
+    args = parser.parse_args()
+
+    # The pipeline modules log every IPO; keep the report readable
+    logging.disable(logging.WARNING)
+    offline_senders()
+
+    runs = {}
+    for scale in args.scales:
+        data = synthetic_data.generate(scale, seed=args.seed)
+        SENT.update(channel=0, subscriber=0)
+        runs[scale] = asyncio.run(run_scale(data, args.latency))
+        print(f"scale {scale}x: {len(data.ipos)} IPOs, {len(data.gmp_history)} GMP rows, {len(data.table_rows)} table rows, "
+              f"{SENT['channel']} channel and {SENT['subscriber']} subscriber messages")
+        if not args.no_memory:
+            # Same data again (regenerated, the first pass wrote to it) with allocation tracing
+            data = synthetic_data.generate(scale, seed=args.seed)
+            tracemalloc.start()
+            traced = asyncio.run(run_scale(data, args.latency, trace_memory=True))
+            tracemalloc.stop()
+            runs[scale] = [(*timed[:3], memory[3], timed[4]) for timed, memory in zip(runs[scale], traced)]
+        del data
+
+    flagged = report(runs, args.max_exponent)
+    if flagged:
+        print(f"\nFailed: {'; '.join(flagged)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
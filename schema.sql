@@ -9,29 +9,322 @@ CREATE TABLE IF NOT EXISTS ipos (
     start_date DATE,
     end_date DATE NOT NULL,
     subscription TEXT,
-    status TEXT DEFAULT 'tracking' CHECK (status IN ('tracking', 'alerted_tomorrow', 'alerted_today', 'expired')),
+    status TEXT DEFAULT 'tracking' CHECK (status IN ('tracking', 'alerting', 'alerted_tomorrow', 'alerted_today', 'expired')),
+    claimed_from TEXT,  -- status before an alert worker claimed the row ('alerting')
+    claimed_by TEXT,
+    claimed_at TIMESTAMP WITH TIME ZONE,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     UNIQUE(name, end_date)
 );
 
--- Table: gmp_history
+-- Alert claims: tables created before them get the columns and the
+-- 'alerting' status too (the inline CHECK above is named ipos_status_check)
+ALTER TABLE ipos
+    ADD COLUMN IF NOT EXISTS claimed_from TEXT,
+    ADD COLUMN IF NOT EXISTS claimed_by TEXT,
+    ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE ipos DROP CONSTRAINT IF EXISTS ipos_status_check;
+ALTER TABLE ipos ADD CONSTRAINT ipos_status_check
+    CHECK (status IN ('tracking', 'alerting', 'alerted_tomorrow', 'alerted_today', 'expired'));
+
+-- Detail-page fields filled in by enrichment.py (added to existing tables too)
+ALTER TABLE ipos
+    ADD COLUMN IF NOT EXISTS detail_url TEXT,
+    ADD COLUMN IF NOT EXISTS lot_size INTEGER,
+    ADD COLUMN IF NOT EXISTS issue_size_cr NUMERIC,
+    ADD COLUMN IF NOT EXISTS listing_date DATE,
+    ADD COLUMN IF NOT EXISTS subscription_qib FLOAT,
+    ADD COLUMN IF NOT EXISTS subscription_nii FLOAT,
+    ADD COLUMN IF NOT EXISTS subscription_retail FLOAT,
+    ADD COLUMN IF NOT EXISTS enriched_at TIMESTAMP WITH TIME ZONE;
+
+-- Upgrading from the unpartitioned gmp_history: move it aside (its rows are
+-- copied into the partitions further down, then it is dropped)
+DO $$
+DECLARE
+    con RECORD;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_class WHERE oid = to_regclass('gmp_history') AND relkind = 'r') THEN
+        ALTER TABLE gmp_history RENAME TO gmp_history_unpartitioned;
+        -- Free the index names (gmp_history_pkey, ...) for the new table
+        FOR con IN SELECT conname FROM pg_constraint
+                   WHERE conrelid = 'gmp_history_unpartitioned'::regclass AND contype IN ('p', 'u') LOOP
+            EXECUTE format('ALTER TABLE gmp_history_unpartitioned RENAME CONSTRAINT %I TO %I', con.conname, con.conname || '_old');
+        END LOOP;
+        DROP INDEX IF EXISTS idx_gmp_history_ipo_id;
+    END IF;
+END $$;
+
+-- Table: gmp_history, one partition per month (gmp_history_YYYY_MM).
+-- Retention drops whole partitions (drop_gmp_partitions) instead of
+-- deleting rows; the default partition only catches dates that have no
+-- partition yet and is emptied when one is created.
 CREATE TABLE IF NOT EXISTS gmp_history (
-    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    id UUID DEFAULT gen_random_uuid(),
     ipo_id UUID REFERENCES ipos(id) ON DELETE CASCADE,
     gmp FLOAT NOT NULL,
-    recorded_at DATE DEFAULT CURRENT_DATE,
+    recorded_at DATE NOT NULL DEFAULT CURRENT_DATE,
+    PRIMARY KEY (id, recorded_at),
     UNIQUE(ipo_id, recorded_at)
+) PARTITION BY RANGE (recorded_at);
+
+CREATE TABLE IF NOT EXISTS gmp_history_default PARTITION OF gmp_history DEFAULT;
+
+-- Table: ipo_aliases (scraped spellings matched to a tracked IPO)
+CREATE TABLE IF NOT EXISTS ipo_aliases (
+    ipo_id UUID REFERENCES ipos(id) ON DELETE CASCADE,
+    alias TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (ipo_id, alias)
+);
+
+-- Table: subscribers (bot users who opted in to alerts)
+CREATE TABLE IF NOT EXISTS subscribers (
+    chat_id BIGINT PRIMARY KEY,
+    username TEXT,
+    active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Table: subscriptions (one row per subscriber and alert window)
+CREATE TABLE IF NOT EXISTS subscriptions (
+    chat_id BIGINT REFERENCES subscribers(chat_id) ON DELETE CASCADE,
+    alert_window TEXT NOT NULL CHECK (alert_window IN ('closing_tomorrow', 'closing_today')),
+    min_gmp FLOAT NOT NULL DEFAULT 0,
+    PRIMARY KEY (chat_id, alert_window)
 );
 
 -- Index for faster queries
 CREATE INDEX IF NOT EXISTS idx_ipos_end_date ON ipos(end_date);
 CREATE INDEX IF NOT EXISTS idx_ipos_status ON ipos(status);
-CREATE INDEX IF NOT EXISTS idx_gmp_history_ipo_id ON gmp_history(ipo_id);
+-- Samples arrive in date order, so a BRIN index keeps date-range scans cheap
+-- at a few pages per partition; ipo_id lookups use the unique index
+CREATE INDEX IF NOT EXISTS idx_gmp_history_recorded_at ON gmp_history USING brin (recorded_at);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_window_gmp ON subscriptions(alert_window, min_gmp);
+CREATE INDEX IF NOT EXISTS idx_subscribers_active ON subscribers(active) WHERE active;
+
+-- Claim IPOs for alerting: moves rows whose status is in p_statuses to
+-- 'alerting' and returns only the rows this worker won. Claims older than
+-- p_stale_seconds (a crashed worker) can be taken over.
+CREATE OR REPLACE FUNCTION claim_ipos(p_ids UUID[], p_statuses TEXT[], p_worker TEXT, p_stale_seconds INTEGER DEFAULT 900)
+RETURNS SETOF ipos
+LANGUAGE sql
+AS $$
+    UPDATE ipos SET
+        status = 'alerting',
+        claimed_from = CASE WHEN status = 'alerting' THEN claimed_from ELSE status END,
+        claimed_by = p_worker,
+        claimed_at = NOW()
+    WHERE id = ANY(p_ids)
+      AND (status = ANY(p_statuses)
+           OR (status = 'alerting' AND claimed_from = ANY(p_statuses)
+               AND claimed_at < NOW() - make_interval(secs => p_stale_seconds)))
+    RETURNING *;
+$$;
+
+-- The two-argument version predates claims; left in place it would make
+-- calls without p_worker ambiguous
+DROP FUNCTION IF EXISTS apply_alert_statuses(UUID[], TEXT[]);
+
+-- Apply per-IPO statuses in one transaction and release the claims; with
+-- p_worker set, only rows still claimed by that worker are touched
+CREATE OR REPLACE FUNCTION apply_alert_statuses(p_ids UUID[], p_statuses TEXT[], p_worker TEXT DEFAULT NULL)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE ipos SET status = u.status, claimed_from = NULL, claimed_by = NULL, claimed_at = NULL
+        FROM unnest(p_ids, p_statuses) AS u(id, status)
+        WHERE ipos.id = u.id
+          AND (p_worker IS NULL OR ipos.claimed_by = p_worker)
+        RETURNING 1
+    )
+    SELECT count(*)::INTEGER FROM updated;
+$$;
+
+-- Write detail-page fields for many IPOs in one statement; p_details is a
+-- JSON array of {"id": ..., "lot_size": ..., ...}. Missing or null fields
+-- keep their stored value. Returns the number of IPOs updated.
+CREATE OR REPLACE FUNCTION apply_ipo_details(p_details JSONB)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE ipos SET
+            detail_url = COALESCE(d.detail_url, ipos.detail_url),
+            lot_size = COALESCE(d.lot_size, ipos.lot_size),
+            issue_size_cr = COALESCE(d.issue_size_cr, ipos.issue_size_cr),
+            listing_date = COALESCE(d.listing_date, ipos.listing_date),
+            subscription_qib = COALESCE(d.subscription_qib, ipos.subscription_qib),
+            subscription_nii = COALESCE(d.subscription_nii, ipos.subscription_nii),
+            subscription_retail = COALESCE(d.subscription_retail, ipos.subscription_retail),
+            enriched_at = NOW()
+        FROM jsonb_to_recordset(p_details) AS d(
+            id UUID, detail_url TEXT, lot_size INTEGER, issue_size_cr NUMERIC, listing_date DATE,
+            subscription_qib FLOAT, subscription_nii FLOAT, subscription_retail FLOAT
+        )
+        WHERE ipos.id = d.id
+        RETURNING 1
+    )
+    SELECT count(*)::INTEGER FROM updated;
+$$;
+
+-- Create or replace a bot user's subscription in one transaction: the
+-- subscriber is (re)activated, windows outside p_windows are removed and
+-- the rest upserted with p_min_gmp, so a failure never leaves a user with
+-- no windows. Returns the number of windows subscribed.
+CREATE OR REPLACE FUNCTION save_subscription(p_chat_id BIGINT, p_username TEXT, p_min_gmp FLOAT, p_windows TEXT[])
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO subscribers (chat_id, username, active)
+    VALUES (p_chat_id, p_username, TRUE)
+    ON CONFLICT (chat_id) DO UPDATE SET username = EXCLUDED.username, active = TRUE;
+
+    DELETE FROM subscriptions WHERE chat_id = p_chat_id AND alert_window <> ALL(p_windows);
+
+    INSERT INTO subscriptions (chat_id, alert_window, min_gmp)
+    SELECT p_chat_id, w, p_min_gmp FROM unnest(p_windows) AS w
+    ON CONFLICT (chat_id, alert_window) DO UPDATE SET min_gmp = EXCLUDED.min_gmp;
+
+    RETURN cardinality(p_windows);
+END;
+$$;
+
+-- Create the monthly gmp_history partitions covering p_from..p_to that do
+-- not exist yet; rows already in the default partition for a month are
+-- moved into it. Run daily by cleanup.py (a few months ahead) and by the
+-- importers for the dates they load. Returns the partitions created.
+CREATE OR REPLACE FUNCTION create_gmp_partitions(p_from DATE DEFAULT CURRENT_DATE, p_to DATE DEFAULT CURRENT_DATE + 90)
+RETURNS TEXT[]
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_from)::DATE;
+    month_end DATE;
+    part TEXT;
+    created TEXT[] := '{}';
+BEGIN
+    WHILE month_start <= p_to LOOP
+        month_end := (month_start + INTERVAL '1 month')::DATE;
+        part := 'gmp_history_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass(part) IS NOT NULL THEN
+            -- A table of that name that is not attached would leave the month's rows in the default partition
+            IF NOT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(part) AND inhparent = 'gmp_history'::regclass) THEN
+                RAISE EXCEPTION '% exists but is not a gmp_history partition (an archive from before archives were renamed?) - rename it to %_archived', part, part;
+            END IF;
+        ELSE
+            EXECUTE format('CREATE TABLE %I (LIKE gmp_history INCLUDING DEFAULTS)', part);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM gmp_history_default WHERE recorded_at >= %L AND recorded_at < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved', month_start, month_end, part);
+            EXECUTE format('ALTER TABLE gmp_history ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', part, month_start, month_end);
+            -- Reads go through gmp_history; keep the partition itself closed to the API
+            EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', part);
+            created := created || part;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+
+-- Retention: detach every monthly partition that ends on or before
+-- p_before and drop it, or keep it as a standalone archive table
+-- gmp_history_YYYY_MM_archived with p_detach_only. The archive is renamed so
+-- create_gmp_partitions can still create and attach that month if the
+-- importers write to it again. Returns the partitions removed.
+CREATE OR REPLACE FUNCTION drop_gmp_partitions(p_before DATE, p_detach_only BOOLEAN DEFAULT FALSE)
+RETURNS TEXT[]
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    part RECORD;
+    fk RECORD;
+    archive TEXT;
+    removed TEXT[] := '{}';
+BEGIN
+    FOR part IN
+        SELECT c.relname::TEXT AS name, to_date(right(c.relname, 7), 'YYYY_MM') AS month_start
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'gmp_history'::regclass AND c.relname ~ '^gmp_history_[0-9]{4}_[0-9]{2}$'
+        ORDER BY 2
+    LOOP
+        EXIT WHEN (part.month_start + INTERVAL '1 month')::DATE > p_before;
+        EXECUTE format('ALTER TABLE gmp_history DETACH PARTITION %I', part.name);
+        IF p_detach_only THEN
+            -- An archived month must not vanish when cleanup later deletes its IPOs
+            FOR fk IN SELECT conname FROM pg_constraint WHERE conrelid = part.name::regclass AND contype = 'f' LOOP
+                EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', part.name, fk.conname);
+            END LOOP;
+            -- A month detached before keeps its first archive; later ones get a timestamp
+            archive := part.name || '_archived';
+            IF to_regclass(archive) IS NOT NULL THEN
+                archive := archive || '_' || to_char(clock_timestamp(), 'YYYYMMDD_HH24MISS');
+            END IF;
+            EXECUTE format('ALTER TABLE %I RENAME TO %I', part.name, archive);
+        ELSE
+            EXECUTE format('DROP TABLE %I', part.name);
+        END IF;
+        removed := removed || part.name;
+    END LOOP;
+    RETURN removed;
+END;
+$$;
+
+-- Archives detached before they were renamed still hold their month's
+-- partition name; move them aside so the month can be attached again
+DO $$
+DECLARE
+    old RECORD;
+BEGIN
+    FOR old IN
+        SELECT c.relname::TEXT AS name FROM pg_class c
+        WHERE c.relkind = 'r' AND c.relnamespace = 'public'::regnamespace
+          AND c.relname ~ '^gmp_history_[0-9]{4}_[0-9]{2}$'
+          AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)
+          AND to_regclass(c.relname || '_archived') IS NULL
+    LOOP
+        EXECUTE format('ALTER TABLE %I RENAME TO %I', old.name, old.name || '_archived');
+    END LOOP;
+END $$;
+
+-- Partitions for the current and next months, plus every month an upgraded
+-- unpartitioned gmp_history still has rows for
+SELECT create_gmp_partitions(CURRENT_DATE, CURRENT_DATE + 90);
+
+DO $$
+BEGIN
+    IF to_regclass('gmp_history_unpartitioned') IS NOT NULL THEN
+        PERFORM create_gmp_partitions(min(recorded_at), max(recorded_at))
+        FROM gmp_history_unpartitioned WHERE recorded_at IS NOT NULL;
+        INSERT INTO gmp_history (id, ipo_id, gmp, recorded_at)
+        SELECT id, ipo_id, gmp, COALESCE(recorded_at, CURRENT_DATE) FROM gmp_history_unpartitioned;
+        DROP TABLE gmp_history_unpartitioned;
+    END IF;
+END $$;
 
 -- Enable Row Level Security (optional, for public access)
 ALTER TABLE ipos ENABLE ROW LEVEL SECURITY;
 ALTER TABLE gmp_history ENABLE ROW LEVEL SECURITY;
+ALTER TABLE gmp_history_default ENABLE ROW LEVEL SECURITY;
+ALTER TABLE ipo_aliases ENABLE ROW LEVEL SECURITY;
+ALTER TABLE subscribers ENABLE ROW LEVEL SECURITY;
+ALTER TABLE subscriptions ENABLE ROW LEVEL SECURITY;
 
--- Allow all operations for now (you can restrict later)
+-- Allow all operations for now (you can restrict later); re-runnable for upgrades
+DROP POLICY IF EXISTS "Allow all for ipos" ON ipos;
 CREATE POLICY "Allow all for ipos" ON ipos FOR ALL USING (true) WITH CHECK (true);
+DROP POLICY IF EXISTS "Allow all for gmp_history" ON gmp_history;
 CREATE POLICY "Allow all for gmp_history" ON gmp_history FOR ALL USING (true) WITH CHECK (true);
+DROP POLICY IF EXISTS "Allow all for ipo_aliases" ON ipo_aliases;
+CREATE POLICY "Allow all for ipo_aliases" ON ipo_aliases FOR ALL USING (true) WITH CHECK (true);
+DROP POLICY IF EXISTS "Allow all for subscribers" ON subscribers;
+CREATE POLICY "Allow all for subscribers" ON subscribers FOR ALL USING (true) WITH CHECK (true);
+DROP POLICY IF EXISTS "Allow all for subscriptions" ON subscriptions;
+CREATE POLICY "Allow all for subscriptions" ON subscriptions FOR ALL USING (true) WITH CHECK (true);
@@ -0,0 +1,257 @@
+"""
+Deadline-aware scraping of the live IPO GMP table.
+
+scrape_ipo_records() works within a total time budget (SCRAPE_BUDGET):
+- each attempt gets a short timeout adapted to recent page-load times
+- failed attempts are retried with exponential backoff and jitter
+- a source that keeps failing trips a circuit breaker and is skipped
+  until its cooldown passes
+- when the budget runs out, the most recent cached snapshot is returned
+  with stale=True instead of failing the run
+
+Successful scrapes are written to the snapshot cache; breaker state and
+load times are persisted alongside it so they survive between runs.
+"""
+import os
+import json
+import time
+import random
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import WebDriverException, TimeoutException
+import ipo_parser
+
+logger = logging.getLogger(__name__)
+
+# Sources tried in order
+SOURCES = [
+    ("investorgain", "https://www.investorgain.com/report/live-ipo-gmp/331/all/"),
+]
+
+# Scrape policy
+SCRAPE_BUDGET = float(os.getenv("SCRAPE_BUDGET", "120"))  # seconds for the whole scrape
+MIN_ATTEMPT_TIMEOUT = 8.0
+MAX_ATTEMPT_TIMEOUT = 30.0
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 20.0
+BREAKER_THRESHOLD = 3  # consecutive failures before a source is skipped
+BREAKER_COOLDOWN = 30 * 60  # seconds a tripped source stays skipped
+LOAD_TIME_SAMPLES = 10
+
+# Cache files
+CACHE_DIR = os.getenv("SCRAPE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+SNAPSHOT_FILE = os.path.join(CACHE_DIR, "snapshot.json")
+STATE_FILE = os.path.join(CACHE_DIR, "scrape_state.json")
+
+
+@dataclass
+class ScrapeResult:
+    """Records from one scrape, or from the cached snapshot when stale"""
+    records: List[ipo_parser.IpoRecord] = field(default_factory=list)
+    fetched_at: datetime = None
+    source: str = None
+    stale: bool = False
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __len__(self):
+        return len(self.records)
+
+
+class ScrapeError(Exception):
+    """Raised when a single scrape attempt fails"""
+
+
+# ---------------- CACHE & STATE ----------------
+
+def _read_json(path, default):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def save_snapshot(result):
+    """Persist a fresh scrape as the fallback snapshot"""
+    _write_json(SNAPSHOT_FILE, {
+        "fetched_at": result.fetched_at.isoformat(),
+        "source": result.source,
+        "records": [record.to_dict() for record in result.records],
+    })
+
+
+def load_snapshot():
+    """Return the cached snapshot flagged as stale, or an empty stale result"""
+    data = _read_json(SNAPSHOT_FILE, None)
+    if not data:
+        return ScrapeResult(stale=True)
+    return ScrapeResult(
+        records=[ipo_parser.IpoRecord.from_dict(r) for r in data["records"]],
+        fetched_at=datetime.fromisoformat(data["fetched_at"]),
+        source=data["source"],
+        stale=True,
+    )
+
+
+class SourceState:
+    """Circuit breaker and load-time history for one source"""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.failures = data.get("failures", 0)
+        self.open_until = data.get("open_until", 0)
+        self.load_times = data.get("load_times", [])
+
+    def to_dict(self):
+        return {"failures": self.failures, "open_until": self.open_until, "load_times": self.load_times}
+
+    def is_open(self):
+        return time.time() < self.open_until
+
+    def attempt_timeout(self):
+        """Allow about twice the slowest recent load, within the min/max bounds"""
+        if not self.load_times:
+            return MAX_ATTEMPT_TIMEOUT / 2
+        return min(MAX_ATTEMPT_TIMEOUT, max(MIN_ATTEMPT_TIMEOUT, 2 * max(self.load_times)))
+
+    def record_success(self, load_time):
+        self.failures = 0
+        self.open_until = 0
+        self.load_times = (self.load_times + [round(load_time, 2)])[-LOAD_TIME_SAMPLES:]
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= BREAKER_THRESHOLD:
+            self.open_until = time.time() + BREAKER_COOLDOWN
+            logger.warning(f"Circuit breaker open for {BREAKER_COOLDOWN}s after {self.failures} failures")
+
+
+# ---------------- BROWSER ----------------
+
+def launch_driver():
+    """Launch headless Chrome"""
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+
+    logger.info("Launching Chrome WebDriver in headless mode")
+    return webdriver.Chrome(options=options)
+
+
+def quit_driver(driver):
+    """Quit a browser session that may already be dead"""
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.warning(f"Could not quit Chrome WebDriver: {e}")
+
+
+def driver_failed(error):
+    """True if the browser session itself broke (crash, invalid session id), not just a slow page"""
+    cause = error.__cause__ if isinstance(error, ScrapeError) else error
+    return isinstance(cause, WebDriverException) and not isinstance(cause, TimeoutException)
+
+
+def fetch_table_html(driver, url, timeout):
+    """Load the report page and return the table's outerHTML within `timeout` seconds"""
+    driver.set_page_load_timeout(timeout)
+    started = time.monotonic()
+    try:
+        driver.get(url)
+        remaining = max(1.0, timeout - (time.monotonic() - started))
+        table = WebDriverWait(driver, remaining).until(EC.presence_of_element_located((By.ID, "report_table")))
+        # One round trip for the whole table instead of one per cell
+        return table.get_attribute("outerHTML")
+    except Exception as e:
+        raise ScrapeError(f"{type(e).__name__}: {e}") from e
+
+
+# ---------------- CONTROLLER ----------------
+
+def scrape_ipo_records(budget=SCRAPE_BUDGET, driver=None):
+    """
+    Scrape the live IPO table within `budget` seconds.
+    Pass a running `driver` to reuse it; otherwise one is launched and quit here.
+    """
+    deadline = time.monotonic() + budget
+    today = datetime.today().date()
+    states = {name: SourceState(data) for name, data in _read_json(STATE_FILE, {}).items()}
+    own_driver = driver is None
+
+    try:
+        for name, url in SOURCES:
+            state = states.setdefault(name, SourceState())
+            if state.is_open():
+                logger.warning(f"Skipping {name}: circuit breaker open")
+                continue
+
+            attempt = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining < MIN_ATTEMPT_TIMEOUT / 2:
+                    break
+                timeout = min(state.attempt_timeout(), remaining)
+                attempt += 1
+                logger.info(f"Scraping {name} (attempt {attempt}, timeout {timeout:.0f}s)")
+
+                started = time.monotonic()
+                try:
+                    if driver is None:
+                        driver = launch_driver()
+                    html = fetch_table_html(driver, url, timeout)
+                    records = ipo_parser.parse_table_html(html, today, base_url=url)
+                    if not records:
+                        raise ScrapeError("report table has no IPO rows")
+                except Exception as e:
+                    state.record_failure()
+                    logger.warning(f"Scrape of {name} failed: {e}")
+                    if own_driver and driver is not None and driver_failed(e):
+                        # A dead session fails every later attempt; relaunch on the next one
+                        quit_driver(driver)
+                        driver = None
+                    if state.is_open():
+                        break
+                    # Back off before retrying, but never past the deadline
+                    backoff = min(BACKOFF_MAX, BACKOFF_BASE ** attempt) * random.uniform(0.5, 1.0)
+                    if time.monotonic() + backoff >= deadline:
+                        break
+                    time.sleep(backoff)
+                    continue
+
+                state.record_success(time.monotonic() - started)
+                result = ScrapeResult(records, datetime.now(), name)
+                save_snapshot(result)
+                logger.info(f"IPO data extraction complete. Total IPOs found: {len(records)}")
+                return result
+
+        result = load_snapshot()
+        if result.fetched_at:
+            logger.warning(f"Scrape budget exhausted - using stale snapshot from {result.fetched_at:%Y-%m-%d %H:%M} ({len(result)} IPOs)")
+        else:
+            logger.error("Scrape budget exhausted and no cached snapshot available")
+        return result
+
+    finally:
+        _write_json(STATE_FILE, {name: state.to_dict() for name, state in states.items()})
+        if own_driver and driver is not None:
+            quit_driver(driver)
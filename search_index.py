@@ -0,0 +1,57 @@
+"""
+In-memory prefix/token index over IPO names.
+
+Every name is split into lowercase tokens and each token prefix maps to the
+set of entries containing it, so a lookup is a few dict hits and a set
+intersection - no scan over the names.
+
+    index = NameIndex(ipos, key=lambda ipo: ipo.name)
+    index.search("krm ayur")   # -> [<KRM Ayurveda NSE SME>]
+"""
+import re
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class NameIndex:
+    """Prefix index mapping every token prefix to the entries that contain it"""
+
+    def __init__(self, items=(), key=str):
+        self.key = key
+        self.items = []
+        self.prefixes = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        """Index a single item under every prefix of every token in its name"""
+        position = len(self.items)
+        self.items.append(item)
+        for token in set(tokenize(self.key(item))):
+            for end in range(1, len(token) + 1):
+                self.prefixes.setdefault(token[:end], set()).add(position)
+
+    def search(self, query, limit=None):
+        """Return items whose name has a token starting with every query token"""
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        # Intersect smallest sets first
+        postings = sorted((self.prefixes.get(token, ()) for token in tokens), key=len)
+        matches = set(postings[0])
+        for posting in postings[1:]:
+            if not matches:
+                break
+            matches &= posting
+
+        results = [self.items[position] for position in sorted(matches)]
+        return results[:limit] if limit else results
+
+    def __len__(self):
+        return len(self.items)
@@ -0,0 +1,40 @@
+"""
+Wall-clock timing for pipeline stages.
+
+    with stage("load"):
+        ...
+    log_summary()
+
+Each stage is logged as it finishes and accumulated in TIMINGS so a run can
+print one summary line per stage at the end. With profiling enabled (see
+profiling.py) each stage is also profiled.
+"""
+import time
+import logging
+from contextlib import contextmanager
+import profiling
+
+logger = logging.getLogger(__name__)
+
+TIMINGS = {}  # stage name -> total seconds in this process
+
+
+@contextmanager
+def stage(name):
+    """Time a block and record it under `name`"""
+    profile = profiling.start_stage(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if profile:
+            profile.stop()
+        TIMINGS[name] = TIMINGS.get(name, 0.0) + elapsed
+        logger.info(f"Stage '{name}' took {elapsed:.2f}s")
+
+
+def log_summary():
+    """Log the accumulated time of every stage"""
+    if TIMINGS:
+        logger.info("Stage timings: " + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in TIMINGS.items()))
@@ -0,0 +1,138 @@
+"""
+Per-user alert subscriptions.
+
+Users subscribe from the bot with their own minimum GMP and alert windows
+('closing_tomorrow' / 'closing_today'). alert_sender loads all active
+subscriptions once per run (db.IpoRepository.active_subscriptions) into a
+SubscriberIndex - one threshold-sorted list per window - so finding who
+wants an alert is a bisect plus a slice, O(log n + matches). Delivery goes through fan_out(), which paces sends
+under Telegram's broadcast limit and honours 429 retry_after.
+"""
+import os
+import time
+import bisect
+import logging
+import requests
+from supabase import create_client, Client
+
+logger = logging.getLogger(__name__)
+
+# Config
+SUPABASE_URL = os.getenv("SUPABASE_URL", "https://ofcngucvrrmzvihjgjvz.supabase.co")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+TG_BOT_TOKEN = os.getenv("TG_BOT_TOKEN")
+FANOUT_RATE = float(os.getenv("FANOUT_RATE", "25"))  # messages per second, Telegram allows ~30
+
+WINDOWS = ("closing_tomorrow", "closing_today")
+
+
+def get_supabase() -> Client:
+    """Get Supabase client"""
+    if not SUPABASE_KEY:
+        raise ValueError("SUPABASE_KEY environment variable not set!")
+    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+
+# ---------------- STORAGE ----------------
+
+def save_subscription(supabase, chat_id, username, min_gmp, windows):
+    """Create or replace a user's subscription for the given windows (one transaction, see schema.sql)"""
+    supabase.rpc('save_subscription', {
+        'p_chat_id': chat_id,
+        'p_username': username,
+        'p_min_gmp': min_gmp,
+        'p_windows': list(windows),
+    }).execute()
+
+
+def remove_subscription(supabase, chat_id):
+    """Deactivate a user; their subscription rows are kept for re-subscribing"""
+    supabase.table('subscribers').update({'active': False}).eq('chat_id', chat_id).execute()
+
+
+def get_subscription(supabase, chat_id):
+    """Return the user's active subscription rows"""
+    subscriber = supabase.table('subscribers').select('active').eq('chat_id', chat_id).execute()
+    if not subscriber.data or not subscriber.data[0]['active']:
+        return []
+    result = supabase.table('subscriptions').select('alert_window, min_gmp').eq('chat_id', chat_id).execute()
+    return result.data or []
+
+
+# ---------------- INDEX ----------------
+
+class SubscriberIndex:
+    """Per-window subscriber lists sorted by min_gmp for O(log n + matches) lookups"""
+
+    def __init__(self, rows=()):
+        by_window = {}
+        for row in rows:
+            by_window.setdefault(row['alert_window'], []).append((float(row['min_gmp']), row['chat_id']))
+
+        self.thresholds = {}
+        self.chat_ids = {}
+        for window, entries in by_window.items():
+            entries.sort()
+            self.thresholds[window] = [threshold for threshold, _ in entries]
+            self.chat_ids[window] = [chat_id for _, chat_id in entries]
+
+    def matching(self, window, gmp):
+        """Return chat ids in `window` whose min_gmp is at or below `gmp`"""
+        thresholds = self.thresholds.get(window)
+        if not thresholds:
+            return []
+        return self.chat_ids[window][:bisect.bisect_right(thresholds, gmp)]
+
+    def __len__(self):
+        return sum(len(ids) for ids in self.chat_ids.values())
+
+
+# ---------------- FAN-OUT ----------------
+
+def fan_out(chat_ids, message, rate=FANOUT_RATE, session=None):
+    """
+    Send `message` to every chat, paced at `rate` messages per second.
+    Returns (sent_count, dead_chat_ids) - dead chats blocked the bot or were deleted.
+    """
+    if not chat_ids:
+        return 0, []
+    if not TG_BOT_TOKEN:
+        logger.error("TG_BOT_TOKEN not set!")
+        return 0, []
+
+    url = f"https://api.telegram.org/bot{TG_BOT_TOKEN}/sendMessage"
+    session = session or requests.Session()
+    interval = 1.0 / rate
+    next_send = time.monotonic()
+    sent = 0
+    dead = []
+
+    for chat_id in chat_ids:
+        for attempt in range(3):
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_send = max(next_send, time.monotonic()) + interval
+
+            try:
+                response = session.post(url, data={"chat_id": chat_id, "text": message, "parse_mode": "Markdown"}, timeout=10)
+            except Exception as e:
+                logger.error(f"Failed to send alert to {chat_id}: {e}")
+                break
+
+            if response.status_code == 200:
+                sent += 1
+                break
+            if response.status_code == 429:
+                # Flood limit - back off for as long as Telegram asks, then retry
+                retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+                logger.warning(f"Rate limited, pausing fan-out for {retry_after}s")
+                next_send = time.monotonic() + retry_after
+                continue
+            if response.status_code == 403 or 'chat not found' in response.text:
+                dead.append(chat_id)
+            logger.error(f"Telegram API error for {chat_id}: {response.text}")
+            break
+
+    logger.info(f"Fan-out delivered {sent}/{len(chat_ids)} messages")
+    return sent, dead
@@ -0,0 +1,184 @@
+"""
+Synthetic investorgain tables and database contents at a multiple of
+today's size (a few dozen live IPOs, two weeks of GMP history).
+
+    python synthetic_data.py --scale 100 --out TestData/synthetic
+
+writes, per scale:
+    report_table.html     the live GMP table as the scraper sees it
+    ipos.jsonl            ipos rows
+    gmp_history.jsonl     gmp_history rows
+    subscriptions.jsonl   subscribers with their alert windows
+
+The data is deterministic for a given seed. End dates are spread around
+today so every pipeline stage has work: new IPOs for the tracker, tracked
+ones for the collector, IPOs closing today/tomorrow for the alert pass and
+old ones for cleanup. A share of the table rows is renamed the way the
+site does it ("Ltd", "NSE SME" suffixes) to exercise name matching.
+"""
+import os
+import json
+import uuid
+import random
+import argparse
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+BASE_IPOS = 40          # IPOs in the database today
+BASE_SUBSCRIBERS = 50
+HISTORY_DAYS = 14
+NEW_SHARE = 0.25        # new table rows per IPO already in the database
+RENAME_SHARE = 0.1      # table rows whose name differs from the stored one
+
+WORDS = [
+    "Shreeji", "Global", "Denta", "Water", "Infra", "KRM", "Ayurveda", "Laxmi", "Dental", "Stallion",
+    "India", "Fluorochemicals", "Quadrant", "Future", "Tek", "Rexpro", "Enterprises", "Indobell",
+    "Insulation", "Sat", "Kartar", "Technical", "Textiles", "Capital", "Numbers", "Infotech",
+    "Leo", "Dry", "Fruits", "Spices", "Barflex", "Polyfilms", "Royal", "Arcade", "Sundrex", "Oil",
+    "Kabra", "Jewels", "Parmeshwar", "Metal", "Anya", "Polytech", "Fertilizers", "Unimech", "Aerospace",
+]
+SUFFIXES = ["", " NSE SME", " BSE SME", " IPO"]
+RENAMES = [" Ltd", " Limited", " IPO", " NSE SME"]
+
+
+@dataclass
+class Dataset:
+    scale: int
+    today: date
+    ipos: list = field(default_factory=list)
+    gmp_history: list = field(default_factory=list)
+    subscribers: list = field(default_factory=list)
+    subscriptions: list = field(default_factory=list)
+    table_rows: list = field(default_factory=list)  # cell texts, investorgain column order
+
+
+def ipo_name(rng, i):
+    """(base name, listing suffix); the index keeps names unique at any scale"""
+    words = rng.sample(WORDS, rng.randint(2, 3))
+    return f"{' '.join(words)} {i}", rng.choice(SUFFIXES)
+
+
+def table_row(rng, name, price, percent, subscription, start_date, end_date):
+    """Cells in the live table's column order (see ipo_parser COL_*)"""
+    return [
+        name,
+        f"₹{round(price * percent / 100)} ({percent}%)",
+        f"{price}",
+        f"{subscription}x",
+        f"₹{round(price * (1 + percent / 100))}",     # estimated listing
+        f"{rng.randint(10, 500)}.{rng.randint(0, 99):02d}",  # issue size (cr)
+        f"{rng.choice([1000, 1200, 1600, 2000])}",  # lot
+        start_date.strftime("%d-%b"),
+        end_date.strftime("%d-%b"),
+        (end_date + timedelta(days=1)).strftime("%d-%b"),  # allotment
+        (end_date + timedelta(days=3)).strftime("%d-%b"),  # listing
+    ]
+
+
+def generate(scale, today=None, seed=42):
+    """Build a Dataset `scale` times today's size"""
+    rng = random.Random(seed)
+    today = today or date.today()
+    data = Dataset(scale=scale, today=today)
+
+    stored = BASE_IPOS * scale
+    for i in range(stored):
+        # Ended up to three weeks ago (cleanup) through ten days ahead
+        end_date = today + timedelta(days=rng.randint(-21, 10))
+        start_date = end_date - timedelta(days=rng.randint(2, 4))
+        price = rng.randint(50, 900)
+        subscription = round(rng.uniform(0.5, 250), 2)
+        base, suffix = ipo_name(rng, i)
+        ipo = {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": base + suffix,
+            "price": str(price),
+            "subscription": f"{subscription}x",
+            "start_date": str(start_date),
+            "end_date": str(end_date),
+            "status": "expired" if end_date < today else "tracking",
+        }
+        data.ipos.append(ipo)
+
+        # One sample per day since tracking started, up to yesterday
+        first = max(start_date - timedelta(days=10), today - timedelta(days=HISTORY_DAYS + 21))
+        percent = rng.gauss(12, 15)
+        day = first
+        while day < min(end_date + timedelta(days=1), today):
+            percent += rng.gauss(0, 2)
+            data.gmp_history.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "ipo_id": ipo["id"],
+                "gmp": round(percent, 2),
+                "recorded_at": str(day),
+            })
+            day += timedelta(days=1)
+
+        if end_date >= today:
+            name = ipo["name"]
+            if rng.random() < RENAME_SHARE:
+                name = base + rng.choice([r for r in RENAMES if r != suffix])
+            data.table_rows.append(table_row(rng, name, price, round(percent, 2), subscription, start_date, end_date))
+
+    # IPOs the tracker has not seen yet
+    for i in range(stored, stored + int(stored * NEW_SHARE)):
+        end_date = today + timedelta(days=rng.randint(3, 10))
+        start_date = end_date - timedelta(days=rng.randint(2, 4))
+        price = rng.randint(50, 900)
+        percent = round(rng.gauss(12, 15), 2)
+        data.table_rows.append(table_row(rng, "".join(ipo_name(rng, i)), price, percent, round(rng.uniform(0, 5), 2), start_date, end_date))
+    rng.shuffle(data.table_rows)
+
+    for i in range(BASE_SUBSCRIBERS * scale):
+        chat_id = 100000000 + i
+        data.subscribers.append({"chat_id": chat_id, "username": f"user{i}", "active": rng.random() > 0.05})
+        for window in rng.sample(["closing_tomorrow", "closing_today"], rng.randint(1, 2)):
+            data.subscriptions.append({"chat_id": chat_id, "alert_window": window, "min_gmp": rng.choice([0, 5, 10, 20, 30])})
+
+    return data
+
+
+def render_table(rows):
+    """The live report table's HTML, as returned by the scraper's outerHTML read"""
+    header = ("<thead><tr><th>IPO</th><th>GMP</th><th>Price</th><th>Sub</th><th>Est Listing</th>"
+              "<th>IPO Size</th><th>Lot</th><th>Open</th><th>Close</th><th>BoA Dt</th><th>Listing</th></tr></thead>")
+    body = "".join("<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows)
+    return f'<table id="report_table">{header}<tbody>{body}</tbody></table>'
+
+
+def write_jsonl(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def write(data, out):
+    folder = os.path.join(out, f"scale_{data.scale}")
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "report_table.html"), "w", encoding="utf-8") as f:
+        f.write(render_table(data.table_rows))
+    write_jsonl(os.path.join(folder, "ipos.jsonl"), data.ipos)
+    write_jsonl(os.path.join(folder, "gmp_history.jsonl"), data.gmp_history)
+    subscribers = {s["chat_id"]: {**s, "windows": []} for s in data.subscribers}
+    for s in data.subscriptions:
+        subscribers[s["chat_id"]]["windows"].append({"alert_window": s["alert_window"], "min_gmp": s["min_gmp"]})
+    write_jsonl(os.path.join(folder, "subscriptions.jsonl"), subscribers.values())
+    return folder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic IPO tables and database rows")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--out", default=os.path.join("TestData", "synthetic"))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for scale in args.scale:
+        data = generate(scale, seed=args.seed)
+        folder = write(data, args.out)
+        print(f"scale {scale}: {len(data.ipos)} IPOs, {len(data.gmp_history)} GMP rows, "
+              f"{len(data.table_rows)} table rows -> {folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ Test script with updated settings: 5% threshold, 2 days GMP
 import os
 import requests
 from datetime import datetime, timedelta
+from alert_templates import render_alert
 
 TG_BOT_TOKEN = os.getenv("TG_BOT_TOKEN")
 TG_CHANNEL_ID = os.getenv("TG_CHANNEL_ID", "@IPO_GMB_Tracker")
@@ -31,26 +32,13 @@ def main():
     ]
     avg_gmp = sum([g[1] for g in gmp_history]) / len(gmp_history)
     
-    gmp_lines = "\n".join([f"  • {date}: {gmp}%" for date, gmp in gmp_history])
-    
+    ipo = {"name": ipo_name, "price": price, "subscription": subscription, "start_date": start_date, "end_date": end_date}
+    history = [{"recorded_at": date, "gmp": gmp} for date, gmp in gmp_history]
+
     print("=== Sending 'Closing Tomorrow' Alert (5% threshold, 2 days) ===")
-    
-    message1 = (
-        f"🟡 *IPO ALERT - CLOSING TOMORROW*\n\n"
-        f"📌 *{ipo_name}*\n"
-        f"━━━━━━━━━━━━━━━━\n"
-        f"💰 Price: {price}\n"
-        f"📊 Subscription: {subscription}\n"
-        f"📅 Start: {start_date}\n"
-        f"📅 End: {end_date}\n"
-        f"━━━━━━━━━━━━━━━━\n"
-        f"📈 *GMP History (Last 2 days):*\n{gmp_lines}\n"
-        f"━━━━━━━━━━━━━━━━\n"
-        f"⭐ *Average GMP: {avg_gmp:.2f}%*\n\n"
-        f"⏰ *Closing Tomorrow - Apply Today!*\n\n"
-        f"✅ *Recommendation: PROCEED*"
-    )
-    
+
+    message1 = render_alert(ipo, "closing_tomorrow", avg_gmp, history, days=2)
+
     if send_telegram_message(message1):
         print("✅ 'Closing Tomorrow' alert sent!")
     
@@ -59,22 +47,8 @@ def main():
     
     print("=== Sending 'Closing Today' Alert ===")
     
-    message2 = (
-        f"🔴 *IPO ALERT - CLOSING TODAY*\n\n"
-        f"📌 *{ipo_name}*\n"
-        f"━━━━━━━━━━━━━━━━\n"
-        f"💰 Price: {price}\n"
-        f"📊 Subscription: {subscription}\n"
-        f"📅 Start: {start_date}\n"
-        f"📅 End: {end_date}\n"
-        f"━━━━━━━━━━━━━━━━\n"
-        f"📈 *GMP History (Last 2 days):*\n{gmp_lines}\n"
-        f"━━━━━━━━━━━━━━━━\n"
-        f"⭐ *Average GMP: {avg_gmp:.2f}%*\n\n"
-        f"🚨 *LAST CHANCE - Closing Today!*\n\n"
-        f"✅ *Recommendation: PROCEED*"
-    )
-    
+    message2 = render_alert(ipo, "closing_today", avg_gmp, history, days=2)
+
     if send_telegram_message(message2):
         print("✅ 'Closing Today' alert sent!")
     
@@ -0,0 +1,60 @@
+"""
+Ordering and fairness of PerChatUpdateProcessor.
+
+    python test_bot_server.py      (or pytest test_bot_server.py)
+"""
+import time
+import asyncio
+from telegram import Chat, Message, Update
+from bot_server import PerChatUpdateProcessor
+
+
+def make_update(update_id, chat_id):
+    chat = Chat(chat_id, Chat.PRIVATE)
+    return Update(update_id, message=Message(update_id, None, chat, text="/start"))
+
+
+async def run_updates(processor, updates, seconds):
+    """Process (update, seconds) pairs concurrently; returns {update_id: (started, finished)}"""
+    started = time.perf_counter()
+    times = {}
+
+    async def handle(update, duration):
+        begin = time.perf_counter() - started
+        await asyncio.sleep(duration)
+        times[update.update_id] = (begin, time.perf_counter() - started)
+
+    await asyncio.gather(*(processor.process_update(u, handle(u, d)) for u, d in zip(updates, seconds)))
+    return times
+
+
+def test_busy_chat_does_not_delay_others():
+    processor = PerChatUpdateProcessor(4)
+    # Chat A queues six slow updates before chat B's instant one
+    updates = [make_update(i, 1) for i in range(6)] + [make_update(100, 2)]
+    times = asyncio.run(run_updates(processor, updates, [0.2] * 6 + [0]))
+    assert times[100][1] < 0.1, times[100]
+
+
+def test_updates_of_one_chat_run_in_order():
+    processor = PerChatUpdateProcessor(4)
+    updates = [make_update(i, 1) for i in range(4)]
+    times = asyncio.run(run_updates(processor, updates, [0.05, 0.01, 0.03, 0]))
+    order = sorted(times, key=lambda update_id: times[update_id][0])
+    assert order == [0, 1, 2, 3], order
+    assert all(times[i][1] <= times[i + 1][0] for i in range(3)), times
+
+
+def test_concurrency_is_bounded():
+    processor = PerChatUpdateProcessor(2)
+    updates = [make_update(i, i) for i in range(4)]
+    times = asyncio.run(run_updates(processor, updates, [0.1] * 4))
+    # Four different chats, two slots: two rounds
+    assert sorted(round(begin, 1) for begin, _ in times.values()) == [0.0, 0.0, 0.1, 0.1], times
+
+
+if __name__ == "__main__":
+    for test in (test_busy_chat_does_not_delay_others, test_updates_of_one_chat_run_in_order,
+                 test_concurrency_is_bounded):
+        test()
+        print(f"{test.__name__}: ok")
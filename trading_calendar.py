@@ -0,0 +1,115 @@
+"""
+Exchange trading calendar: weekdays minus the holidays in
+trading_holidays.json.
+
+Every trading day of the covered years is precomputed once into a sorted
+array of date ordinals, so each lookup is a bisect - O(log n) - instead of
+a day-by-day walk:
+
+    calendar = get_calendar()
+    calendar.next_trading_day(friday)              # the following Monday
+    calendar.trading_days_between(today, end)      # 1 = closes next session
+    calendar.previous_trading_days(end, 2)         # last 2 sessions before end
+
+Alert windows are counted in trading days, so an IPO closing on Monday is
+"closing tomorrow" on the Friday before, and one closing the day after a
+holiday is flagged on the session before the holiday.
+"""
+import os
+import json
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+HOLIDAYS_FILE = os.getenv(
+    "TRADING_HOLIDAYS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "trading_holidays.json"),
+)
+SPAN_YEARS = 10  # years precomputed either side of the holiday list and today
+
+
+class TradingCalendar:
+    """Sorted trading-day ordinals with bisect lookups"""
+
+    def __init__(self, holidays=(), today=None):
+        self.holidays = frozenset(holidays)
+        today = today or date.today()
+        years = [d.year for d in self.holidays] + [today.year]
+        self.first = date(min(years) - SPAN_YEARS, 1, 1)
+        self.last = date(max(years) + SPAN_YEARS, 12, 31)
+        holiday_ordinals = {d.toordinal() for d in self.holidays}
+        self.days = [
+            ordinal for ordinal in range(self.first.toordinal(), self.last.toordinal() + 1)
+            if ordinal % 7 not in (0, 6) and ordinal not in holiday_ordinals  # ordinal % 7: 0 = Sunday, 6 = Saturday
+        ]
+        self.listed_years = {d.year for d in self.holidays}
+
+    def _ordinal(self, day):
+        if not self.first <= day <= self.last:
+            raise ValueError(f"{day} is outside the trading calendar ({self.first} - {self.last})")
+        return day.toordinal()
+
+    def is_trading_day(self, day):
+        ordinal = self._ordinal(day)
+        i = bisect_left(self.days, ordinal)
+        return i < len(self.days) and self.days[i] == ordinal
+
+    def next_trading_day(self, day, n=1):
+        """The n-th trading day strictly after `day`"""
+        i = bisect_right(self.days, self._ordinal(day)) + n - 1
+        if i >= len(self.days):
+            raise ValueError(f"{n} trading days after {day} is outside the trading calendar")
+        return date.fromordinal(self.days[i])
+
+    def previous_trading_day(self, day, n=1):
+        """The n-th trading day strictly before `day`"""
+        i = bisect_left(self.days, self._ordinal(day)) - n
+        if i < 0:
+            raise ValueError(f"{n} trading days before {day} is outside the trading calendar")
+        return date.fromordinal(self.days[i])
+
+    def previous_trading_days(self, day, n):
+        """The last n trading days before `day`, most recent first"""
+        end = bisect_left(self.days, self._ordinal(day))
+        return [date.fromordinal(o) for o in reversed(self.days[max(0, end - n):end])]
+
+    def trading_days_between(self, start, end):
+        """Trading days in (start, end]; negative when end is before start"""
+        if end < start:
+            return -self.trading_days_between(end, start)
+        return bisect_right(self.days, self._ordinal(end)) - bisect_right(self.days, self._ordinal(start))
+
+    def window_dates(self, today, offset):
+        """
+        Every calendar date whose trading-day distance from `today` is
+        `offset` (0 = today and any closed days before the next session)
+        """
+        first = self.next_trading_day(today, offset) if offset else today
+        stop = self.next_trading_day(today, offset + 1)
+        return [first + timedelta(days=i) for i in range((stop - first).days)]
+
+    def has_holidays_for(self, year):
+        return year in self.listed_years
+
+
+def load_holidays(path=None):
+    with open(path or HOLIDAYS_FILE, encoding="utf-8") as f:
+        return [date.fromisoformat(day) for day in json.load(f)["holidays"]]
+
+
+@lru_cache(maxsize=1)
+def get_calendar():
+    """The process-wide calendar built from HOLIDAYS_FILE"""
+    try:
+        holidays = load_holidays()
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Could not read trading holidays from {HOLIDAYS_FILE} ({e}) - only weekends are skipped")
+        holidays = []
+    calendar = TradingCalendar(holidays)
+    year = date.today().year
+    if not calendar.has_holidays_for(year):
+        logger.warning(f"No trading holidays listed for {year} in {HOLIDAYS_FILE} - only weekends are skipped")
+    return calendar